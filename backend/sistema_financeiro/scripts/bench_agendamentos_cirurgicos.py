@@ -0,0 +1,130 @@
+"""
+Benchmark da listagem de agendamentos cirúrgicos: consultas SQL e tempo de
+GET /api/agendamentos-cirurgicos/ conforme o número de linhas cresce. As seis
+relações usadas por to_dict vêm na mesma consulta (joinedload), então o
+número de consultas deve ficar constante.
+
+Uso (a partir de backend/sistema_financeiro):
+    python scripts/bench_agendamentos_cirurgicos.py [--tamanhos 10 100 1000] [--banco URL]
+Sem --banco usa um SQLite em memória novo para cada medição.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, time as horario, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+
+from src.models.paciente import db, Paciente
+
+PASTA_MODELOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'models')
+for arquivo in sorted(os.listdir(PASTA_MODELOS)):
+    if arquivo.endswith('.py'):
+        importlib.import_module('src.models.' + arquivo[:-3])
+
+from src.models.procedimento import Procedimento
+from src.models.equipe import Equipe
+from src.models.local_atendimento import LocalAtendimento
+from src.models.categoria_procedimento import CategoriaProcedimento
+from src.models.refeicao import Refeicao
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.routes.agendamentos_cirurgicos import agendamentos_cirurgicos_bp
+
+
+def criar_app(url_banco):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url_banco
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'chave-jwt-do-benchmark-do-sistema-financeiro'
+    JWTManager(app)
+    db.init_app(app)
+    app.register_blueprint(agendamentos_cirurgicos_bp, url_prefix='/api/agendamentos-cirurgicos')
+    return app
+
+
+@contextmanager
+def banco(url_banco):
+    """Aplicação com as tabelas recriadas, dentro do contexto da aplicação"""
+    app = criar_app(url_banco)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@contextmanager
+def contar_consultas():
+    comandos = []
+
+    def registrar(conexao, cursor, comando, parametros, contexto, executemany):
+        comandos.append(comando)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        yield comandos
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+
+
+def _agendamentos_cirurgicos(quantidade):
+    """Agendamentos com paciente, procedimento, equipe, local, categoria e refeição próprios"""
+    inicio = date(2026, 3, 2)
+    for i in range(quantidade):
+        paciente = Paciente(nome=f'Paciente {i}', cpf=str(i), data_nascimento=date(1990, 1, 1), identificador=f'p{i}')
+        procedimento = Procedimento(nome=f'Procedimento {i}')
+        equipe = Equipe(nome=f'Equipe {i}')
+        local = LocalAtendimento(nome=f'Sala {i}')
+        categoria = CategoriaProcedimento(nome=f'Categoria {i}')
+        refeicao = Refeicao(nome=f'Refeição {i}')
+        db.session.add_all([paciente, procedimento, equipe, local, categoria, refeicao])
+        db.session.flush()
+        db.session.add(AgendamentoCirurgico(
+            paciente_id=paciente.id, data_agendamento=inicio + timedelta(days=i % 30),
+            procedimento_id=procedimento.id, grau_calvicie='I', equipe_id=equipe.id,
+            local_atendimento_id=local.id, horario_inicio=horario(8), horario_fim=horario(12),
+            categoria_id=categoria.id, almoco_escolhido_id=refeicao.id, valor_geral_venda=100
+        ))
+    db.session.commit()
+
+
+def medir_listagem(url_banco, tamanho):
+    with banco(url_banco) as app:
+        _agendamentos_cirurgicos(tamanho)
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+        cliente = app.test_client()
+        db.session.expire_all()
+        with contar_consultas() as comandos:
+            inicio = time.perf_counter()
+            resposta = cliente.get('/api/agendamentos-cirurgicos/', headers=headers)
+            duracao = time.perf_counter() - inicio
+        assert resposta.status_code == 200, resposta.get_json()
+        assert len(resposta.get_json()) == tamanho
+        return duracao, len(comandos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--banco', default='sqlite://', help='URL SQLAlchemy (as tabelas são recriadas)')
+    args = parser.parse_args()
+
+    print('Listagem de agendamentos cirúrgicos')
+    print(f"{'linhas':>8} {'tempo':>16} {'consultas':>16}")
+    for tamanho in args.tamanhos:
+        duracao, consultas = medir_listagem(args.banco, tamanho)
+        print(f"{tamanho:>8} {duracao * 1000:>14.1f}ms {consultas:>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark da gravação dos itens de uma entrada de estoque: linha a linha pelo
+ORM (eventos de saldo e custo por linha) contra inserir_linhas (um
+executemany e a manutenção de saldo e custo em lote). Mede tempo e número de
+comandos SQL.
+
+Uso (a partir de backend/sistema_financeiro):
+    python scripts/bench_movimentos.py [--tamanhos 10 100 1000] [--banco URL]
+Sem --banco usa um SQLite em memória novo para cada medição.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.paciente import db
+
+PASTA_MODELOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'models')
+for arquivo in sorted(os.listdir(PASTA_MODELOS)):
+    if arquivo.endswith('.py'):
+        importlib.import_module('src.models.' + arquivo[:-3])
+
+from src.models.itens import Item
+from src.models.entrada_estoque import EntradaEstoque
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.movimentos_estoque import inserir_linhas
+
+
+def criar_app(url_banco):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url_banco
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+@contextmanager
+def banco(url_banco):
+    """Aplicação com as tabelas recriadas, dentro do contexto da aplicação"""
+    app = criar_app(url_banco)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@contextmanager
+def contar_consultas():
+    comandos = []
+
+    def registrar(conexao, cursor, comando, parametros, contexto, executemany):
+        comandos.append(comando)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        yield comandos
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+
+
+def _entrada_com_itens(quantidade_itens):
+    itens = [Item(nome=f'Item {i}') for i in range(quantidade_itens)]
+    entrada = EntradaEstoque(data_entrada=date(2026, 3, 2))
+    db.session.add_all(itens + [entrada])
+    db.session.commit()
+    return entrada.id, [
+        {'item_id': item.id, 'quantidade': 10, 'preco_unitario': 2.5}
+        for item in itens
+    ]
+
+
+def _gravar_linha_a_linha(entrada_id, linhas):
+    for linha in linhas:
+        db.session.add(ItemEntradaEstoque(entrada_estoque_id=entrada_id, **linha))
+    db.session.commit()
+
+
+def _gravar_em_lote(entrada_id, linhas):
+    inserir_linhas(ItemEntradaEstoque, 'entrada_estoque_id', entrada_id, linhas)
+    db.session.commit()
+
+
+def medir_gravacao(url_banco, tamanho, gravar):
+    with banco(url_banco):
+        entrada_id, linhas = _entrada_com_itens(tamanho)
+        with contar_consultas() as comandos:
+            inicio = time.perf_counter()
+            gravar(entrada_id, linhas)
+            duracao = time.perf_counter() - inicio
+        return duracao, len(comandos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--banco', default='sqlite://', help='URL SQLAlchemy (as tabelas são recriadas)')
+    args = parser.parse_args()
+
+    print('Itens de entrada de estoque')
+    print(f"{'linhas':>8} {'linha a linha':>16} {'em lote':>16} {'consultas':>16}")
+    for tamanho in args.tamanhos:
+        tempo_linhas, consultas_linhas = medir_gravacao(args.banco, tamanho, _gravar_linha_a_linha)
+        tempo_lote, consultas_lote = medir_gravacao(args.banco, tamanho, _gravar_em_lote)
+        print(f"{tamanho:>8} {tempo_linhas * 1000:>14.1f}ms {tempo_lote * 1000:>14.1f}ms "
+              f"{consultas_linhas:>7} -> {consultas_lote:<7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+-- Um número de sessão por pacote (uq_agendamentos_sessao_pacote_numero).
+-- Garantia final contra agendamentos simultâneos do mesmo pacote.
+--
+-- A restrição não é criada enquanto houver números repetidos (gravados antes
+-- da correção). Confira antes e renumere as sessões listadas:
+--
+--   SELECT pacote_tratamento_id, numero_sessao, COUNT(*) AS quantidade
+--   FROM agendamentos_sessao
+--   GROUP BY pacote_tratamento_id, numero_sessao
+--   HAVING COUNT(*) > 1;
+
+ALTER TABLE agendamentos_sessao
+    ADD CONSTRAINT uq_agendamentos_sessao_pacote_numero UNIQUE (pacote_tratamento_id, numero_sessao);
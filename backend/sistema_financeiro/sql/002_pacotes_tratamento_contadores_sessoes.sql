@@ -0,0 +1,11 @@
+-- Contadores de sessões por status em pacotes_tratamento, mantidos pelos
+-- eventos de AgendamentoSessao. Sem estas colunas toda consulta a
+-- PacoteTratamento falha com "Unknown column".
+--
+-- Depois de aplicar, preencha os contadores a partir das sessões existentes:
+--   flask reconstruir-contadores-sessoes
+
+ALTER TABLE pacotes_tratamento
+    ADD COLUMN total_sessoes_agendadas INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN total_sessoes_realizadas INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN total_sessoes_canceladas INTEGER NOT NULL DEFAULT 0;
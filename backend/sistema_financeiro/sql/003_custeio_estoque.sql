@@ -0,0 +1,18 @@
+-- Custeio de estoque (custo médio ou FIFO, ver src/models/custo_estoque.py):
+-- custo consumido por cada linha de saída e estado de custo no saldo do item.
+-- A tabela nova camadas_custo_estoque é criada pelo db.create_all().
+--
+-- Depois de aplicar, custeie os movimentos existentes:
+--   flask recalcular-custos-estoque
+-- (se saldos_estoque ainda não foi preenchida, rode no lugar
+--  flask reconstruir-saldos-estoque, que também refaz o custeio)
+
+ALTER TABLE item_saida_estoque
+    ADD COLUMN custo_unitario FLOAT NULL,
+    ADD COLUMN custo_total FLOAT NULL;
+
+ALTER TABLE saldos_estoque
+    ADD COLUMN valor_total FLOAT NOT NULL DEFAULT 0,
+    ADD COLUMN custo_medio FLOAT NULL,
+    ADD COLUMN data_ultimo_custo DATE NULL,
+    ADD COLUMN ultimo_custo_saida BOOLEAN NOT NULL DEFAULT 0;
@@ -1,72 +1,382 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
 import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine, text
+from flask import has_app_context
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text, select, func, union
+from sqlalchemy.orm import aliased
+from sqlalchemy.pool import QueuePool
 
 # Removendo dependência de dotenv para simplificar
 # from dotenv import load_dotenv
 # load_dotenv()
 
+# Checkouts que esperam mais que isso contam como espera por conexão livre
+LIMIAR_ESPERA_SEGUNDOS = 0.05
+
+_engine_standalone = None
+_lock = threading.Lock()
+_medicao = threading.local()
+_metricas_pool = {
+    'checkouts': 0,
+    'esperas': 0,
+    'tempo_espera_total': 0.0,
+    'tempo_espera_max': 0.0,
+}
+
+def _registrar_checkout(espera):
+    with _lock:
+        _metricas_pool['checkouts'] += 1
+        _metricas_pool['tempo_espera_total'] += espera
+        _metricas_pool['tempo_espera_max'] = max(_metricas_pool['tempo_espera_max'], espera)
+        if espera > LIMIAR_ESPERA_SEGUNDOS:
+            _metricas_pool['esperas'] += 1
+
+class QueuePoolMedido(QueuePool):
+    """
+    QueuePool que mede, em todo checkout, só a espera por uma conexão livre:
+    o tempo de abrir uma conexão nova (overflow) é descontado e o pre-ping
+    acontece depois, fora da medição
+    """
+
+    def _do_get(self):
+        # _do_get se chama recursivamente; mede só a chamada externa
+        if getattr(_medicao, 'ativa', False):
+            return super()._do_get()
+
+        _medicao.ativa = True
+        _medicao.criacao = 0.0
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _medicao.ativa = False
+            _registrar_checkout(time.perf_counter() - inicio - _medicao.criacao)
+
+    def _create_connection(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            _medicao.criacao = getattr(_medicao, 'criacao', 0.0) + time.perf_counter() - inicio
+
+# Configuração do pool de conexões (usada também pelo engine da aplicação)
+OPCOES_POOL = {
+    'poolclass': QueuePoolMedido,
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+    'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': True,
+}
+
 # Configuração da conexão com o banco de dados
 def get_db_connection():
     """
-    Cria e retorna uma conexão com o banco de dados MySQL
+    Retorna o engine compartilhado do banco de dados.
+    Dentro da aplicação reaproveita o engine do Flask-SQLAlchemy; fora dela
+    (execução direta do módulo) cria um único engine com pool configurado.
     """
-    db_user = os.getenv('DB_USERNAME', 'root')
-    db_password = os.getenv('DB_PASSWORD', 'password')
-    db_host = os.getenv('DB_HOST', 'localhost')
-    db_port = os.getenv('DB_PORT', '3306')
-    db_name = os.getenv('DB_NAME', 'mydb')
-    
-    connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    engine = create_engine(connection_string)
-    
+    global _engine_standalone
+
+    if has_app_context():
+        from src.models.paciente import db
+        engine = db.engine
+    else:
+        with _lock:
+            if _engine_standalone is None:
+                db_user = os.getenv('DB_USERNAME', 'root')
+                db_password = os.getenv('DB_PASSWORD', 'password')
+                db_host = os.getenv('DB_HOST', 'localhost')
+                db_port = os.getenv('DB_PORT', '3306')
+                db_name = os.getenv('DB_NAME', 'mydb')
+
+                connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+                _engine_standalone = create_engine(connection_string, **OPCOES_POOL)
+        engine = _engine_standalone
+
     return engine
 
-# Funções para extração de dados para BI
-def get_lancamentos_data():
+@contextmanager
+def conexao_bi():
+    """Empresta uma conexão do pool (a espera é medida pelo QueuePoolMedido)"""
+    engine = get_db_connection()
+    conexao = engine.connect()
+    try:
+        yield conexao
+    finally:
+        conexao.close()
+
+def get_metricas_pool():
     """
-    Extrai dados de lançamentos financeiros para análise
+    Retorna os contadores de uso do pool e o estado atual. Os contadores vêm
+    do QueuePoolMedido e cobrem todos os checkouts do processo (aplicação e
+    BI); com outra classe de pool ficam zerados
     """
     engine = get_db_connection()
-    
-    query = """
-    SELECT 
-        l.id, l.tipo, l.valor, l.data_vencimento, l.data_pagamento, 
-        l.status, l.numero_nota_fiscal, l.observacoes,
-        c.identificador_contrato, c.procedimento, c.data_procedimento,
-        p.nome as paciente_nome, p.cpf as paciente_cpf,
-        f.nome as fornecedor_nome, f.cpf_cnpj as fornecedor_documento
-    FROM lancamento_financeiro l
-    LEFT JOIN contrato c ON l.contrato_id = c.id
-    LEFT JOIN paciente p ON c.paciente_id = p.id
-    LEFT JOIN fornecedor f ON l.fornecedor_id = f.id
+    pool = engine.pool
+
+    with _lock:
+        metricas = dict(_metricas_pool)
+
+    metricas['pool'] = pool.__class__.__name__
+    for nome in ('size', 'checkedout', 'checkedin', 'overflow'):
+        funcao = getattr(pool, nome, None)
+        metricas[nome] = funcao() if callable(funcao) else None
+    metricas['status'] = pool.status()
+    return metricas
+
+# Consultas de BI montadas a partir dos modelos (tabelas e colunas reais)
+def _contratos_alterados(desde):
+    """
+    Ids dos contratos alterados (o próprio contrato ou seu agendamento
+    cirúrgico) a partir da marca. Cada parte usa o índice de data_atualizacao
+    da tabela alterada e chega ao contrato pelo índice da chave estrangeira.
+    """
+    from src.models.contrato import Contrato
+    from src.models.agendamento_cirurgico import AgendamentoCirurgico
+
+    return union(
+        select(Contrato.id).where(Contrato.data_atualizacao >= desde),
+        select(Contrato.id).join(
+            AgendamentoCirurgico, Contrato.agendamento_cirurgico_id == AgendamentoCirurgico.id
+        ).where(AgendamentoCirurgico.data_atualizacao >= desde),
+    )
+
+
+def consulta_lancamentos(desde=None):
+    """
+    Monta a consulta de lançamentos financeiros com contrato, paciente,
+    fornecedor, pacote e natureza.
+    Com 'desde', traz só os lançamentos cuja linha mudou a partir da marca:
+    o próprio lançamento ou o contrato, agendamento ou pacote ligados a ele.
+    """
+    from src.models.lancamento_financeiro import LancamentoFinanceiro
+    from src.models.contrato import Contrato
+    from src.models.paciente import Paciente
+    from src.models.fornecedor import Fornecedor
+    from src.models.pacote_tratamento import PacoteTratamento
+    from src.models.natureza_orcamentaria import Natureza
+    from src.models.agendamento_cirurgico import AgendamentoCirurgico
+    from src.models.procedimento import Procedimento
+
+    paciente_contrato = aliased(Paciente)
+    paciente_pacote = aliased(Paciente)
+
+    consulta = select(
+        LancamentoFinanceiro.id,
+        LancamentoFinanceiro.tipo,
+        LancamentoFinanceiro.valor,
+        LancamentoFinanceiro.data_vencimento,
+        LancamentoFinanceiro.data_pagamento,
+        LancamentoFinanceiro.status,
+        LancamentoFinanceiro.forma_pagamento,
+        LancamentoFinanceiro.numero_nota_fiscal,
+        LancamentoFinanceiro.observacoes,
+        Natureza.nome.label('natureza_nome'),
+        Contrato.identificador_contrato,
+        Procedimento.nome.label('procedimento'),
+        AgendamentoCirurgico.data_agendamento.label('data_procedimento'),
+        PacoteTratamento.descricao.label('pacote_descricao'),
+        func.coalesce(paciente_contrato.nome, paciente_pacote.nome).label('paciente_nome'),
+        func.coalesce(paciente_contrato.cpf, paciente_pacote.cpf).label('paciente_cpf'),
+        Fornecedor.nome.label('fornecedor_nome'),
+        Fornecedor.cpf_cnpj.label('fornecedor_documento'),
+    ).select_from(LancamentoFinanceiro).outerjoin(
+        Natureza, LancamentoFinanceiro.natureza_id == Natureza.id
+    ).outerjoin(
+        Contrato, LancamentoFinanceiro.contrato_id == Contrato.id
+    ).outerjoin(
+        paciente_contrato, Contrato.paciente_id == paciente_contrato.id
+    ).outerjoin(
+        AgendamentoCirurgico, Contrato.agendamento_cirurgico_id == AgendamentoCirurgico.id
+    ).outerjoin(
+        Procedimento, AgendamentoCirurgico.procedimento_id == Procedimento.id
+    ).outerjoin(
+        PacoteTratamento, LancamentoFinanceiro.pacote_tratamento_id == PacoteTratamento.id
+    ).outerjoin(
+        paciente_pacote, PacoteTratamento.paciente_id == paciente_pacote.id
+    ).outerjoin(
+        Fornecedor, LancamentoFinanceiro.fornecedor_id == Fornecedor.id
+    )
+
+    if desde is not None:
+        # União de ids por tabela alterada: cada parte usa o índice de
+        # data_atualizacao (ou da chave estrangeira), ao contrário de um OR
+        # entre tabelas do join
+        alterados = union(
+            select(LancamentoFinanceiro.id).where(LancamentoFinanceiro.data_atualizacao >= desde),
+            select(LancamentoFinanceiro.id).where(
+                LancamentoFinanceiro.contrato_id.in_(_contratos_alterados(desde))
+            ),
+            select(LancamentoFinanceiro.id).where(
+                LancamentoFinanceiro.pacote_tratamento_id.in_(
+                    select(PacoteTratamento.id).where(PacoteTratamento.data_atualizacao >= desde)
+                )
+            ),
+        ).subquery()
+        consulta = consulta.where(LancamentoFinanceiro.id.in_(select(alterados.c.id)))
+
+    return consulta.order_by(LancamentoFinanceiro.id)
+
+def consulta_contratos(desde=None):
+    """
+    Monta a consulta de contratos com paciente e dados do agendamento cirúrgico.
+    Com 'desde', traz só os contratos (ou agendamentos) alterados a partir da marca.
+    """
+    from src.models.contrato import Contrato
+    from src.models.paciente import Paciente
+    from src.models.agendamento_cirurgico import AgendamentoCirurgico
+    from src.models.procedimento import Procedimento
+    from src.models.local_atendimento import LocalAtendimento
+
+    consulta = select(
+        Contrato.id,
+        Contrato.identificador_contrato,
+        Procedimento.nome.label('procedimento'),
+        AgendamentoCirurgico.data_agendamento.label('data_procedimento'),
+        LocalAtendimento.nome.label('local_realizacao'),
+        Contrato.valor_sinal,
+        Contrato.valor_restante,
+        (func.coalesce(Contrato.valor_sinal, 0) + func.coalesce(Contrato.valor_restante, 0)).label('valor_total'),
+        Contrato.status,
+        Paciente.nome.label('paciente_nome'),
+        Paciente.cpf.label('paciente_cpf'),
+    ).select_from(Contrato).join(
+        Paciente, Contrato.paciente_id == Paciente.id
+    ).outerjoin(
+        AgendamentoCirurgico, Contrato.agendamento_cirurgico_id == AgendamentoCirurgico.id
+    ).outerjoin(
+        Procedimento, AgendamentoCirurgico.procedimento_id == Procedimento.id
+    ).outerjoin(
+        LocalAtendimento, AgendamentoCirurgico.local_atendimento_id == LocalAtendimento.id
+    )
+
+    if desde is not None:
+        consulta = consulta.where(Contrato.id.in_(_contratos_alterados(desde)))
+
+    return consulta.order_by(Contrato.id)
+
+def consulta_fluxo_caixa():
+    """
+    Monta a consulta de fluxo de caixa mensal por tipo.
+    Lê a tabela de resumo fluxo_caixa_mensal (uma linha por mês, tipo e
+    natureza), então o custo depende do número de meses e não de lançamentos.
+    """
+    from src.models.fluxo_caixa_mensal import FluxoCaixaMensal
+
+    return select(
+        FluxoCaixaMensal.mes,
+        FluxoCaixaMensal.tipo,
+        func.sum(FluxoCaixaMensal.total).label('total'),
+    ).where(
+        FluxoCaixaMensal.quantidade > 0
+    ).group_by(FluxoCaixaMensal.mes, FluxoCaixaMensal.tipo).order_by(FluxoCaixaMensal.mes, FluxoCaixaMensal.tipo)
+
+# Exportações disponíveis: tipo -> (consulta, nome do arquivo)
+CONSULTAS_EXPORTACAO = {
+    'lancamentos': (consulta_lancamentos, 'lancamentos_financeiros'),
+    'contratos': (consulta_contratos, 'contratos'),
+    'fluxo-caixa': (consulta_fluxo_caixa, 'fluxo_caixa_mensal'),
+}
+
+# Linhas lidas do cursor do banco por vez nas exportações em streaming
+TAMANHO_LOTE_EXPORTACAO = 5000
+
+def iterar_csv(consulta, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """
+    Gera o CSV de uma consulta em blocos de texto, um por lote.
+    A consulta roda com cursor no servidor (stream_results), então no máximo
+    um lote fica em memória, independente do tamanho do resultado.
+    """
+    with conexao_bi() as conexao:
+        conexao = conexao.execution_options(stream_results=True, max_row_buffer=tamanho_lote)
+        cabecalho = True
+        for lote in pd.read_sql(consulta, conexao, chunksize=tamanho_lote):
+            yield lote.to_csv(index=False, header=cabecalho)
+            cabecalho = False
+
+        if cabecalho:
+            # Resultado vazio: devolve ao menos a linha de cabeçalho
+            yield pd.DataFrame(columns=[coluna.name for coluna in consulta.selected_columns]).to_csv(index=False)
+
+# Formatos colunares: formato -> (mimetype, extensão)
+FORMATOS_COLUNARES = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+
+def esquema_arrow(consulta):
+    """
+    Esquema Arrow de uma consulta de BI, a partir dos tipos das colunas:
+    Numeric vira decimal com a mesma precisão/escala, datas viram date32 e
+    timestamps, para que as ferramentas de BI não precisem reinterpretar texto
+    """
+    import pyarrow as pa
+
+    campos = []
+    for coluna in consulta.selected_columns:
+        tipo = coluna.type
+        if isinstance(tipo, sqlalchemy.Float):
+            tipo_arrow = pa.float64()
+        elif isinstance(tipo, sqlalchemy.Numeric):
+            tipo_arrow = pa.decimal128(tipo.precision or 18, tipo.scale if tipo.scale is not None else 2)
+        elif isinstance(tipo, sqlalchemy.Boolean):
+            tipo_arrow = pa.bool_()
+        elif isinstance(tipo, sqlalchemy.Integer):
+            tipo_arrow = pa.int64()
+        elif isinstance(tipo, sqlalchemy.DateTime):
+            tipo_arrow = pa.timestamp('us')
+        elif isinstance(tipo, sqlalchemy.Date):
+            tipo_arrow = pa.date32()
+        else:
+            tipo_arrow = pa.string()
+        campos.append(pa.field(coluna.name, tipo_arrow))
+    return pa.schema(campos)
+
+def exportar_colunar(df, consulta, formato):
+    """
+    Serializa o DataFrame de uma extração em Parquet (snappy) ou Arrow IPC
+    (zstd), com o esquema tipado da consulta. Requer pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = esquema_arrow(consulta)
+    tabela = pa.Table.from_pandas(df, preserve_index=False).select(esquema.names).cast(esquema)
+
+    saida = pa.BufferOutputStream()
+    if formato == 'parquet':
+        pq.write_table(tabela, saida, compression='snappy')
+    else:
+        opcoes = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_file(saida, esquema, options=opcoes) as escritor:
+            escritor.write_table(tabela)
+    return saida.getvalue().to_pybytes()
+
+# Funções para extração de dados para BI
+def get_lancamentos_data(desde=None):
+    """
+    Extrai dados de lançamentos financeiros para análise
     """
-    
     try:
-        df = pd.read_sql(query, engine)
+        with conexao_bi() as conexao:
+            df = pd.read_sql(consulta_lancamentos(desde), conexao)
         return df
     except Exception as e:
         print(f"Erro ao extrair dados de lançamentos: {e}")
         return pd.DataFrame()
 
-def get_contratos_data():
+def get_contratos_data(desde=None):
     """
     Extrai dados de contratos para análise
     """
-    engine = get_db_connection()
-    
-    query = """
-    SELECT 
-        c.id, c.identificador_contrato, c.procedimento, 
-        c.data_procedimento, c.local_realizacao, c.valor_total, c.status,
-        p.nome as paciente_nome, p.cpf as paciente_cpf
-    FROM contrato c
-    JOIN paciente p ON c.paciente_id = p.id
-    """
-    
     try:
-        df = pd.read_sql(query, engine)
+        with conexao_bi() as conexao:
+            df = pd.read_sql(consulta_contratos(desde), conexao)
         return df
     except Exception as e:
         print(f"Erro ao extrair dados de contratos: {e}")
@@ -76,26 +386,91 @@ def get_fluxo_caixa_mensal():
     """
     Gera relatório de fluxo de caixa mensal
     """
-    engine = get_db_connection()
-    
-    query = """
-    SELECT 
-        DATE_FORMAT(data_pagamento, '%Y-%m') as mes,
-        tipo,
-        SUM(valor) as total
-    FROM lancamento_financeiro
-    WHERE status = 'pago' AND data_pagamento IS NOT NULL
-    GROUP BY DATE_FORMAT(data_pagamento, '%Y-%m'), tipo
-    ORDER BY mes
-    """
-    
     try:
-        df = pd.read_sql(query, engine)
+        with conexao_bi() as conexao:
+            df = pd.read_sql(consulta_fluxo_caixa(), conexao)
         return df
     except Exception as e:
         print(f"Erro ao gerar fluxo de caixa: {e}")
         return pd.DataFrame()
 
+def consulta_excluidos(tabela, desde):
+    """
+    Monta a consulta dos ids excluídos de uma tabela a partir da marca
+    (lápides de registros_excluidos)
+    """
+    from src.models.registro_excluido import RegistroExcluido
+
+    return select(RegistroExcluido.registro_id).where(
+        RegistroExcluido.tabela == tabela,
+        RegistroExcluido.data_exclusao >= desde
+    ).distinct().order_by(RegistroExcluido.registro_id)
+
+def get_excluidos(tabela, desde):
+    """
+    Ids excluídos de uma tabela a partir da marca
+    """
+    with conexao_bi() as conexao:
+        return [linha.registro_id for linha in conexao.execute(consulta_excluidos(tabela, desde))]
+
+# Conjuntos com extração incremental: tipo -> (consulta, tabela das lápides)
+EXTRACOES_INCREMENTAIS = {
+    'lancamentos': (consulta_lancamentos, 'lancamentos_financeiros'),
+    'contratos': (consulta_contratos, 'contratos'),
+}
+
+# Recuo aplicado à próxima marca: transações que gravaram data_atualizacao
+# antes do início da extração mas ainda não tinham feito commit aparecem na
+# próxima sincronização (o consumidor deve aplicar as linhas como upsert)
+MARGEM_MARCA_SEGUNDOS = 60
+
+class MarcaForaDaRetencao(Exception):
+    """A marca é anterior à retenção das lápides: é preciso uma carga completa"""
+
+def extrair_delta(tipo, desde):
+    """
+    Extração incremental: linhas alteradas desde a marca, ids excluídos
+    e a marca a usar na próxima chamada (UTC, como data_atualizacao).
+    Erros são propagados: devolver vazio faria o consumidor avançar a marca
+    e perder as alterações. Pelo mesmo motivo, uma marca anterior à retenção
+    das lápides gera MarcaForaDaRetencao.
+    """
+    from src.models.registro_excluido import limite_retencao_excluidos
+
+    consulta, tabela = EXTRACOES_INCREMENTAIS[tipo]
+    inicio = datetime.utcnow()
+    limite = limite_retencao_excluidos(inicio)
+    if desde < limite:
+        raise MarcaForaDaRetencao(
+            f"A marca {desde.isoformat()} é anterior à retenção das exclusões "
+            f"({limite.isoformat()}); refaça a carga completa sem 'since'"
+        )
+
+    with conexao_bi() as conexao:
+        df = pd.read_sql(consulta(desde), conexao)
+    excluidos = get_excluidos(tabela, desde)
+
+    # NaN (colunas de joins externos) não é JSON válido
+    df = df.astype(object).where(df.notna(), None)
+
+    return {
+        'desde': desde.isoformat(),
+        'proxima_marca': max(desde, inicio - timedelta(seconds=MARGEM_MARCA_SEGUNDOS)).isoformat(),
+        'alterados': df.to_dict(orient='records'),
+        'excluidos': excluidos,
+    }
+
+def explicar_consulta(consulta):
+    """
+    Retorna o plano de execução (EXPLAIN) de uma consulta de BI, para
+    conferir o uso de índices no banco em uso (MySQL ou SQLite)
+    """
+    with conexao_bi() as conexao:
+        compilada = consulta.compile(dialect=conexao.dialect, compile_kwargs={'literal_binds': True})
+        prefixo = 'EXPLAIN QUERY PLAN' if conexao.dialect.name == 'sqlite' else 'EXPLAIN'
+        resultado = conexao.execute(text(f"{prefixo} {compilada}"))
+        return [dict(linha._mapping) for linha in resultado]
+
 def export_to_csv(dataframe, filename):
     """
     Exporta um DataFrame para CSV
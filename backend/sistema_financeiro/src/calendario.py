@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from sqlalchemy.orm import joinedload
+from src.models.paciente import db
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.models.agendamento_sessao import AgendamentoSessao
+from src.models.versao_semana_agenda import VersaoSemanaAgenda, inicio_semana
+
+# Semanas guardadas por processo (~10 anos de calendário)
+MAX_SEMANAS_EM_CACHE = 520
+# Nomes de paciente/procedimento/local não versionam a semana: a validade
+# limita por quanto tempo uma alteração neles pode ficar sem aparecer
+VALIDADE_CACHE_SEGUNDOS = 300
+
+_cache = OrderedDict()  # semana -> (versao, instante, eventos)
+_lock = threading.Lock()
+
+
+def evento_cirurgia(ag):
+    return {
+        "id": f"cirurgia-{ag.id}",
+        "title": f"Cirurgia: {ag.paciente.nome} - {ag.procedimento.nome}",
+        "start": f"{ag.data_agendamento.isoformat()}T{ag.horario_inicio.isoformat()}",
+        "end": f"{ag.data_agendamento.isoformat()}T{ag.horario_fim.isoformat()}" if ag.horario_fim else None,
+        "tipo": "cirurgia",
+        "extendedProps": {
+            "paciente": ag.paciente.nome,
+            "procedimento": ag.procedimento.nome,
+            "equipe": ag.equipe.nome,
+            "local": ag.local_atendimento.nome,
+            "valor": ag.valor_geral_venda,
+            "status_pagamento": "Pago" if ag.valor_pago >= ag.valor_geral_venda else "Parcial" if ag.valor_pago > 0 else "Pendente",
+            "status_cirurgia": ag.status_cirurgia
+        }
+    }
+
+
+def evento_sessao(ag):
+    return {
+        "id": f"sessao-{ag.id}",
+        "title": f"Sessão {ag.numero_sessao}: {ag.paciente.nome} - {ag.pacote_tratamento.descricao}",
+        "start": f"{ag.data_agendamento.isoformat()}T{ag.horario_inicio.isoformat()}",
+        "end": f"{ag.data_agendamento.isoformat()}T{ag.horario_fim.isoformat()}" if ag.horario_fim else None,
+        "tipo": "sessao",
+        "extendedProps": {
+            "paciente": ag.paciente.nome,
+            "pacote": ag.pacote_tratamento.descricao,
+            "local": ag.local_atendimento.nome,
+            "numero_sessao": ag.numero_sessao,
+            "status_sessao": ag.status_sessao
+        }
+    }
+
+
+def _eventos_do_banco(inicio, fim):
+    """Eventos (cirurgias e sessões) entre as datas, agrupados pela semana"""
+    agendamentos_cirurgicos = AgendamentoCirurgico.query.filter(
+        AgendamentoCirurgico.data_agendamento >= inicio,
+        AgendamentoCirurgico.data_agendamento <= fim
+    ).options(
+        joinedload(AgendamentoCirurgico.paciente),
+        joinedload(AgendamentoCirurgico.procedimento),
+        joinedload(AgendamentoCirurgico.equipe),
+        joinedload(AgendamentoCirurgico.local_atendimento)
+    ).order_by(AgendamentoCirurgico.data_agendamento, AgendamentoCirurgico.horario_inicio).all()
+
+    agendamentos_sessoes = AgendamentoSessao.query.filter(
+        AgendamentoSessao.data_agendamento >= inicio,
+        AgendamentoSessao.data_agendamento <= fim
+    ).options(
+        joinedload(AgendamentoSessao.paciente),
+        joinedload(AgendamentoSessao.local_atendimento),
+        joinedload(AgendamentoSessao.pacote_tratamento)
+    ).order_by(AgendamentoSessao.data_agendamento, AgendamentoSessao.horario_inicio).all()
+
+    por_semana = {}
+    for ag in agendamentos_cirurgicos:
+        por_semana.setdefault(inicio_semana(ag.data_agendamento), []).append(evento_cirurgia(ag))
+    for ag in agendamentos_sessoes:
+        por_semana.setdefault(inicio_semana(ag.data_agendamento), []).append(evento_sessao(ag))
+    return por_semana
+
+
+def _versoes(semanas):
+    linhas = db.session.query(VersaoSemanaAgenda.semana, VersaoSemanaAgenda.versao).filter(
+        VersaoSemanaAgenda.semana.in_(semanas)
+    ).all()
+    versoes = {semana: 0 for semana in semanas}
+    versoes.update({linha.semana: linha.versao for linha in linhas})
+    return versoes
+
+
+def eventos_periodo(inicio, fim):
+    """
+    Eventos do calendário entre as datas (inclusive), montados por semana.
+    Cada semana fica em cache junto com sua versão; a versão é lida antes dos
+    dados, então uma escrita concorrente no máximo faz a semana ser relida na
+    próxima chamada, nunca deixa o cache desatualizado.
+    """
+    semanas = []
+    semana = inicio_semana(inicio)
+    while semana <= fim:
+        semanas.append(semana)
+        semana += timedelta(days=7)
+
+    versoes = _versoes(semanas)
+    agora = time.monotonic()
+
+    eventos_por_semana = {}
+    faltantes = []
+    with _lock:
+        for semana in semanas:
+            guardado = _cache.get(semana)
+            if guardado and guardado[0] == versoes[semana] and agora - guardado[1] < VALIDADE_CACHE_SEGUNDOS:
+                _cache.move_to_end(semana)
+                eventos_por_semana[semana] = guardado[2]
+            else:
+                faltantes.append(semana)
+
+    if faltantes:
+        lidos = _eventos_do_banco(faltantes[0], faltantes[-1] + timedelta(days=6))
+        with _lock:
+            for semana in faltantes:
+                eventos = lidos.get(semana, [])
+                eventos_por_semana[semana] = eventos
+                _cache[semana] = (versoes[semana], agora, eventos)
+                _cache.move_to_end(semana)
+            while len(_cache) > MAX_SEMANAS_EM_CACHE:
+                _cache.popitem(last=False)
+
+    resultado = []
+    for semana in semanas:
+        for evento in eventos_por_semana[semana]:
+            if inicio.isoformat() <= evento["start"][:10] <= fim.isoformat():
+                resultado.append(evento)
+    return resultado
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
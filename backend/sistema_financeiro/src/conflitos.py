@@ -0,0 +1,296 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from src.models.paciente import db
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.models.agendamento_sessao import AgendamentoSessao
+from src.models.local_atendimento import LocalAtendimento
+from src.models.equipe import Equipe
+
+# Status que não ocupam o local/equipe
+STATUS_INATIVOS = ('cancelada', 'remarcada')
+
+# Ocupação assumida quando o agendamento não tem horário de fim
+DURACAO_PADRAO = {
+    'cirurgia': timedelta(hours=4),
+    'sessao': timedelta(hours=1),
+}
+
+
+def intervalo(tipo, data_agendamento, horario_inicio, horario_fim):
+    """
+    Intervalo [inicio, fim) ocupado pelo agendamento. Um horário de fim
+    anterior ao de início é o dia seguinte (atravessa a meia-noite).
+    """
+    inicio = datetime.combine(data_agendamento, horario_inicio)
+    if horario_fim and horario_fim != horario_inicio:
+        fim = datetime.combine(data_agendamento, horario_fim)
+        if horario_fim < horario_inicio:
+            fim += timedelta(days=1)
+    else:
+        fim = inicio + DURACAO_PADRAO[tipo]
+    return inicio, fim
+
+
+def _atravessa_meia_noite(modelo):
+    """
+    Condição dos agendamentos que podem terminar no dia seguinte: fim anterior
+    ao início, ou sem fim e começando a menos da duração padrão da meia-noite
+    """
+    tipo = 'cirurgia' if modelo is AgendamentoCirurgico else 'sessao'
+    inicio_limite = (datetime.min + (timedelta(days=1) - DURACAO_PADRAO[tipo])).time()
+    return or_(
+        modelo.horario_fim < modelo.horario_inicio,
+        and_(
+            or_(modelo.horario_fim.is_(None), modelo.horario_fim == modelo.horario_inicio),
+            modelo.horario_inicio > inicio_limite
+        )
+    )
+
+
+def _descrever(tipo, agendamento):
+    inicio, fim = intervalo(tipo, agendamento.data_agendamento, agendamento.horario_inicio, agendamento.horario_fim)
+    return {
+        'tipo': tipo,
+        'id': agendamento.id,
+        'data_agendamento': agendamento.data_agendamento.isoformat(),
+        'horario_inicio': inicio.strftime('%H:%M'),
+        'horario_fim': fim.strftime('%H:%M'),
+        'local_atendimento_id': agendamento.local_atendimento_id,
+        'equipe_id': getattr(agendamento, 'equipe_id', None),
+    }
+
+
+def _ativos(modelo, status):
+    return modelo.query.filter(status.notin_(STATUS_INATIVOS))
+
+
+def _candidatos(data_agendamento, fim, local_atendimento_id, equipe_id):
+    """
+    Agendamentos do mesmo local (cirurgias e sessões) ou da mesma equipe que
+    podem cruzar o novo intervalo: os do dia que começam antes do fim, os da
+    véspera que atravessam a meia-noite e, se o novo intervalo termina no dia
+    seguinte, os do dia seguinte que começam antes do fim.
+    Cada consulta é uma busca no índice (recurso, data, horario_inicio): custo
+    logarítmico no total de agendamentos mais os poucos itens do dia.
+    """
+    recursos = []
+    if local_atendimento_id:
+        recursos.append(('cirurgia', AgendamentoCirurgico, AgendamentoCirurgico.status_cirurgia,
+                         AgendamentoCirurgico.local_atendimento_id == local_atendimento_id))
+        recursos.append(('sessao', AgendamentoSessao, AgendamentoSessao.status_sessao,
+                         AgendamentoSessao.local_atendimento_id == local_atendimento_id))
+    if equipe_id:
+        recursos.append(('cirurgia', AgendamentoCirurgico, AgendamentoCirurgico.status_cirurgia,
+                         AgendamentoCirurgico.equipe_id == equipe_id))
+
+    vespera = data_agendamento - timedelta(days=1)
+    candidatos = []
+    for tipo, modelo, status, filtro_recurso in recursos:
+        ativos = _ativos(modelo, status).filter(filtro_recurso)
+
+        query = ativos.filter(modelo.data_agendamento == data_agendamento)
+        if fim.date() == data_agendamento:
+            query = query.filter(modelo.horario_inicio < fim.time())
+        candidatos += [(tipo, ag) for ag in query]
+
+        query = ativos.filter(modelo.data_agendamento == vespera, _atravessa_meia_noite(modelo))
+        candidatos += [(tipo, ag) for ag in query]
+
+        if fim.date() > data_agendamento:
+            query = ativos.filter(
+                modelo.data_agendamento == fim.date(),
+                modelo.horario_inicio < fim.time()
+            )
+            candidatos += [(tipo, ag) for ag in query]
+
+    return candidatos
+
+
+def bloquear_recursos(local_atendimento_id=None, equipe_id=None):
+    """
+    Trava (SELECT ... FOR UPDATE) o local e a equipe até o commit, para que dois
+    agendamentos simultâneos no mesmo recurso sejam verificados em sequência
+    """
+    if local_atendimento_id:
+        db.session.query(LocalAtendimento.id).filter_by(id=local_atendimento_id).with_for_update().first()
+    if equipe_id:
+        db.session.query(Equipe.id).filter_by(id=equipe_id).with_for_update().first()
+
+
+def verificar_conflitos(tipo, agendamento):
+    """
+    Lista os agendamentos que ocupam o mesmo local ou equipe no mesmo horário.
+    'agendamento' pode ainda não estar salvo; ele próprio é ignorado.
+    """
+    status = agendamento.status_cirurgia if tipo == 'cirurgia' else agendamento.status_sessao
+    if status in STATUS_INATIVOS:
+        return []
+
+    inicio, fim = intervalo(tipo, agendamento.data_agendamento, agendamento.horario_inicio, agendamento.horario_fim)
+    equipe_id = agendamento.equipe_id if tipo == 'cirurgia' else None
+
+    with db.session.no_autoflush:
+        candidatos = _candidatos(agendamento.data_agendamento, fim, agendamento.local_atendimento_id, equipe_id)
+
+    conflitos = []
+    vistos = set()
+    for tipo_outro, outro in candidatos:
+        chave = (tipo_outro, outro.id)
+        if chave in vistos or (tipo_outro == tipo and outro.id == agendamento.id):
+            continue
+        vistos.add(chave)
+
+        inicio_outro, fim_outro = intervalo(tipo_outro, outro.data_agendamento, outro.horario_inicio, outro.horario_fim)
+        if inicio_outro < fim and inicio < fim_outro:
+            conflitos.append(_descrever(tipo_outro, outro))
+
+    return conflitos
+
+
+def listar_conflitos(inicio, fim):
+    """
+    Todos os pares de agendamentos sobrepostos entre as datas (inclusive),
+    por local e por equipe. Lê só o intervalo pedido mais a véspera (para os
+    que atravessam a meia-noite) e faz uma varredura ordenada por recurso:
+    O(n log n) no período. Cada par é informado no dia do que começa depois.
+    """
+    leitura = inicio - timedelta(days=1)
+    cirurgias = _ativos(AgendamentoCirurgico, AgendamentoCirurgico.status_cirurgia).filter(
+        AgendamentoCirurgico.data_agendamento >= leitura,
+        AgendamentoCirurgico.data_agendamento <= fim
+    ).all()
+    sessoes = _ativos(AgendamentoSessao, AgendamentoSessao.status_sessao).filter(
+        AgendamentoSessao.data_agendamento >= leitura,
+        AgendamentoSessao.data_agendamento <= fim
+    ).all()
+
+    # (recurso, id do recurso) -> [(inicio, fim, tipo, agendamento)]
+    grupos = {}
+    for tipo, lista in (('cirurgia', cirurgias), ('sessao', sessoes)):
+        for ag in lista:
+            ocupacao = intervalo(tipo, ag.data_agendamento, ag.horario_inicio, ag.horario_fim)
+            grupos.setdefault(('local', ag.local_atendimento_id), []).append((*ocupacao, tipo, ag))
+            if tipo == 'cirurgia':
+                grupos.setdefault(('equipe', ag.equipe_id), []).append((*ocupacao, tipo, ag))
+
+    conflitos = []
+    for (recurso, recurso_id), itens in grupos.items():
+        itens.sort(key=lambda item: (item[0], item[1]))
+        ativos = []
+        for inicio_item, fim_item, tipo, ag in itens:
+            # Remove os que já terminaram; os restantes se sobrepõem ao atual
+            ativos = [ativo for ativo in ativos if ativo[1] > inicio_item]
+            if ag.data_agendamento >= inicio:
+                for _, _, tipo_ativo, ag_ativo in ativos:
+                    conflitos.append({
+                        'recurso': recurso,
+                        'recurso_id': recurso_id,
+                        'data': ag.data_agendamento.isoformat(),
+                        'agendamentos': [_descrever(tipo_ativo, ag_ativo), _descrever(tipo, ag)],
+                    })
+            ativos.append((inicio_item, fim_item, tipo, ag))
+
+    conflitos.sort(key=lambda conflito: (conflito['data'], conflito['recurso'], conflito['recurso_id']))
+    return conflitos
+
+
+def _ocupacoes_por_dia(inicio, fim, local_atendimento_id, equipe_id=None):
+    """
+    Intervalos ocupados no local (cirurgias e sessões) e na equipe entre as
+    datas, agrupados por dia. Uma consulta por recurso, cada uma um range scan
+    no índice (recurso, data_agendamento, horario_inicio), lendo só as colunas
+    de data e horário. Quem atravessa a meia-noite ocupa também o dia seguinte
+    (por isso a véspera do início também é lida).
+    """
+    recursos = [
+        ('cirurgia', AgendamentoCirurgico, AgendamentoCirurgico.status_cirurgia,
+         AgendamentoCirurgico.local_atendimento_id == local_atendimento_id),
+        ('sessao', AgendamentoSessao, AgendamentoSessao.status_sessao,
+         AgendamentoSessao.local_atendimento_id == local_atendimento_id),
+    ]
+    if equipe_id:
+        recursos.append(('cirurgia', AgendamentoCirurgico, AgendamentoCirurgico.status_cirurgia,
+                         AgendamentoCirurgico.equipe_id == equipe_id))
+
+    por_dia = {}
+    for tipo, modelo, status, filtro_recurso in recursos:
+        linhas = _ativos(modelo, status).filter(
+            filtro_recurso,
+            modelo.data_agendamento >= inicio - timedelta(days=1),
+            modelo.data_agendamento <= fim
+        ).with_entities(modelo.data_agendamento, modelo.horario_inicio, modelo.horario_fim)
+
+        for data_agendamento, horario_inicio, horario_fim in linhas:
+            ocupado = intervalo(tipo, data_agendamento, horario_inicio, horario_fim)
+            por_dia.setdefault(data_agendamento, []).append(ocupado)
+            if ocupado[1].date() > data_agendamento:
+                por_dia.setdefault(ocupado[1].date(), []).append(ocupado)
+    return por_dia
+
+
+def slots_livres(inicio, fim, local_atendimento_id, duracao, equipe_id=None,
+                 expediente_inicio=None, expediente_fim=None, passo=None):
+    """
+    Horários livres de 'duracao' (timedelta) entre as datas, dentro do expediente.
+    Os intervalos ocupados de cada dia são ordenados e fundidos numa única
+    varredura; as lacunas que sobram viram slots a cada 'passo'
+    (padrão: a própria duração).
+    """
+    passo = passo or duracao
+    ocupacoes = _ocupacoes_por_dia(inicio, fim, local_atendimento_id, equipe_id)
+
+    slots = []
+    dia = inicio
+    while dia <= fim:
+        abertura = datetime.combine(dia, expediente_inicio)
+        fechamento = datetime.combine(dia, expediente_fim)
+
+        # Varredura: 'cursor' é o fim do trecho já ocupado (ou do último slot)
+        cursor = abertura
+        for ocupado_inicio, ocupado_fim in sorted(ocupacoes.get(dia, [])) + [(fechamento, fechamento)]:
+            limite = min(ocupado_inicio, fechamento)
+            while cursor + duracao <= limite:
+                slots.append({
+                    'data': dia.isoformat(),
+                    'horario_inicio': cursor.strftime('%H:%M'),
+                    'horario_fim': (cursor + duracao).strftime('%H:%M'),
+                })
+                cursor += passo
+            cursor = max(cursor, ocupado_fim)
+            if cursor >= fechamento:
+                break
+
+        dia += timedelta(days=1)
+
+    return slots
+
+
+def conflitos_lote(local_atendimento_id, intervalos):
+    """
+    Verifica de uma vez uma lista de intervalos [inicio, fim) no local.
+    Lê as ocupações de todo o período do lote numa única passada e devolve,
+    para cada intervalo em conflito, os horários ocupados que o cruzam.
+    """
+    if not intervalos:
+        return []
+
+    primeiro = min(inicio.date() for inicio, _ in intervalos)
+    ultimo = max(fim.date() for _, fim in intervalos)
+    ocupacoes = _ocupacoes_por_dia(primeiro, ultimo, local_atendimento_id)
+
+    conflitos = []
+    for inicio, fim in intervalos:
+        ocupados = set(ocupacoes.get(inicio.date(), [])) | set(ocupacoes.get(fim.date(), []))
+        cruzados = [
+            {'horario_inicio': ocupado_inicio.strftime('%H:%M'), 'horario_fim': ocupado_fim.strftime('%H:%M')}
+            for ocupado_inicio, ocupado_fim in sorted(ocupados)
+            if ocupado_inicio < fim and inicio < ocupado_fim
+        ]
+        if cruzados:
+            conflitos.append({
+                'data': inicio.date().isoformat(),
+                'horario_inicio': inicio.strftime('%H:%M'),
+                'horario_fim': fim.strftime('%H:%M'),
+                'ocupado': cruzados,
+            })
+    return conflitos
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from src.models.paciente import db
+from src.models.entrada_estoque import EntradaEstoque
+from src.models.saida_estoque import SaidaEstoque
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.item_saida_estoque import ItemSaidaEstoque
+from src.models.saldo_estoque import (
+    SaldoEstoqueMensal, mes_de, mes_seguinte, primeiro_dia, movimentos_por_item, ultimo_fechamento
+)
+
+
+def saldos_em(dia, item_id=None):
+    """
+    Totais de cada item ao fim do dia: fechamento mensal mais recente anterior
+    ao mês do dia, mais os movimentos entre o fechamento e o dia. O custo é
+    proporcional aos movimentos desde o fechamento, não ao histórico inteiro.
+    Retorna {item_id: [total_entrada, total_saida]}.
+    """
+    fechamento = ultimo_fechamento(antes_de=mes_de(dia))
+
+    saldos = {}
+    inicio = None
+    if fechamento:
+        query = SaldoEstoqueMensal.query.filter_by(mes=fechamento)
+        if item_id:
+            query = query.filter_by(item_id=item_id)
+        saldos = {linha.item_id: [linha.total_entrada, linha.total_saida] for linha in query}
+        inicio = primeiro_dia(mes_seguinte(fechamento))
+
+    for item, (entrada, saida) in movimentos_por_item(inicio, dia, item_id).items():
+        totais = saldos.setdefault(item, [0.0, 0.0])
+        totais[0] += entrada
+        totais[1] += saida
+    return saldos
+
+
+def movimentos_item(item_id, inicio, fim):
+    """
+    Extrato do item entre as datas (inclusive): saldo inicial (véspera do
+    início) e cada entrada/saída em ordem de data, com o saldo acumulado.
+    """
+    entrada, saida = saldos_em(inicio - timedelta(days=1), item_id).get(item_id, [0.0, 0.0])
+    saldo_inicial = entrada - saida
+
+    entradas = db.session.query(
+        ItemEntradaEstoque.id, ItemEntradaEstoque.quantidade, ItemEntradaEstoque.preco_unitario,
+        EntradaEstoque.id, EntradaEstoque.data_entrada, EntradaEstoque.observacoes
+    ).join(EntradaEstoque, EntradaEstoque.id == ItemEntradaEstoque.entrada_estoque_id).filter(
+        ItemEntradaEstoque.item_id == item_id,
+        EntradaEstoque.data_entrada >= inicio,
+        EntradaEstoque.data_entrada <= fim
+    )
+    saidas = db.session.query(
+        ItemSaidaEstoque.id, ItemSaidaEstoque.quantidade,
+        SaidaEstoque.id, SaidaEstoque.data_saida, SaidaEstoque.observacoes
+    ).join(SaidaEstoque, SaidaEstoque.id == ItemSaidaEstoque.saida_estoque_id).filter(
+        ItemSaidaEstoque.item_id == item_id,
+        SaidaEstoque.data_saida >= inicio,
+        SaidaEstoque.data_saida <= fim
+    )
+
+    movimentos = [
+        {
+            "data": data.isoformat(),
+            "tipo": "entrada",
+            "id": linha_id,
+            "documento_id": documento_id,
+            "quantidade": quantidade or 0,
+            "preco_unitario": preco_unitario,
+            "observacoes": observacoes,
+        }
+        for linha_id, quantidade, preco_unitario, documento_id, data, observacoes in entradas
+    ] + [
+        {
+            "data": data.isoformat(),
+            "tipo": "saida",
+            "id": linha_id,
+            "documento_id": documento_id,
+            "quantidade": quantidade or 0,
+            "observacoes": observacoes,
+        }
+        for linha_id, quantidade, documento_id, data, observacoes in saidas
+    ]
+    # No mesmo dia as entradas vêm antes das saídas
+    movimentos.sort(key=lambda movimento: (movimento["data"], movimento["tipo"] != "entrada", movimento["id"]))
+
+    saldo = saldo_inicial
+    for movimento in movimentos:
+        saldo += movimento["quantidade"] if movimento["tipo"] == "entrada" else -movimento["quantidade"]
+        movimento["saldo"] = saldo
+
+    return {
+        "item_id": item_id,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "saldo_inicial": saldo_inicial,
+        "saldo_final": saldo,
+        "movimentos": movimentos,
+    }
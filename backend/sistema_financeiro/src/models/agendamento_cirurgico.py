@@ -6,6 +6,15 @@ from src.models.paciente import db
 
 class AgendamentoCirurgico(db.Model):
     __tablename__ = 'agendamentos_cirurgicos'
+    __table_args__ = (
+        # Calendário (consulta por intervalo de datas, ordenada por horário)
+        db.Index('ix_agendamentos_cirurgicos_data_horario', 'data_agendamento', 'horario_inicio'),
+        # Verificação de conflitos (agenda do recurso no dia, ordenada por horário)
+        db.Index('ix_agendamentos_cirurgicos_local_data_horario', 'local_atendimento_id', 'data_agendamento', 'horario_inicio'),
+        db.Index('ix_agendamentos_cirurgicos_equipe_data_horario', 'equipe_id', 'data_agendamento', 'horario_inicio'),
+        # Extração incremental do BI (registros alterados desde a última marca)
+        db.Index('ix_agendamentos_cirurgicos_data_atualizacao', 'data_atualizacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False)
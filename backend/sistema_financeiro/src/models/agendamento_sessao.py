@@ -2,10 +2,21 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event
 from src.models.paciente import db
+from src.models.eventos import manter_valores_anteriores, valores_anteriores
+from src.models.pacote_tratamento import aplicar_delta_contadores
 
 class AgendamentoSessao(db.Model):
     __tablename__ = 'agendamentos_sessao'
+    __table_args__ = (
+        # Calendário (consulta por intervalo de datas, ordenada por horário)
+        db.Index('ix_agendamentos_sessao_data_horario', 'data_agendamento', 'horario_inicio'),
+        # Verificação de conflitos (agenda do local no dia, ordenada por horário)
+        db.Index('ix_agendamentos_sessao_local_data_horario', 'local_atendimento_id', 'data_agendamento', 'horario_inicio'),
+        # Um número de sessão por pacote (garantia contra agendamentos simultâneos)
+        db.UniqueConstraint('pacote_tratamento_id', 'numero_sessao', name='uq_agendamentos_sessao_pacote_numero'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False)
@@ -62,3 +73,31 @@ class AgendamentoSessao(db.Model):
             'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
         }
 
+
+# Manutenção dos contadores de sessões por status no pacote.
+# Os eventos rodam na mesma transação do flush; inserções/atualizações em
+# massa (insert()/query.update) não os disparam e precisam aplicar o delta
+# por conta própria (ou usar reconstruir_contadores_sessoes).
+CAMPOS_CONTADORES = ('pacote_tratamento_id', 'status_sessao')
+
+
+manter_valores_anteriores(*(getattr(AgendamentoSessao, campo) for campo in CAMPOS_CONTADORES))
+
+
+@event.listens_for(AgendamentoSessao, 'after_insert')
+def _contadores_apos_inserir(mapper, conexao, sessao):
+    aplicar_delta_contadores(conexao, sessao.pacote_tratamento_id, sessao.status_sessao, 1)
+
+
+@event.listens_for(AgendamentoSessao, 'after_update')
+def _contadores_apos_atualizar(mapper, conexao, sessao):
+    anterior = valores_anteriores(sessao, CAMPOS_CONTADORES)
+    atual = (sessao.pacote_tratamento_id, sessao.status_sessao)
+    if anterior != atual:
+        aplicar_delta_contadores(conexao, *anterior, -1)
+        aplicar_delta_contadores(conexao, *atual, 1)
+
+
+@event.listens_for(AgendamentoSessao, 'after_delete')
+def _contadores_apos_excluir(mapper, conexao, sessao):
+    aplicar_delta_contadores(conexao, *valores_anteriores(sessao, CAMPOS_CONTADORES), -1)
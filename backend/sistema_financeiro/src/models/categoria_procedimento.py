@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class CategoriaProcedimento(db.Model):
     __tablename__ = 'categorias_procedimento'
@@ -11,4 +12,16 @@ class CategoriaProcedimento(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<CategoriaProcedimento {self.nome}>'
\ No newline at end of file
+        return f'<CategoriaProcedimento {self.nome}>'
+
+
+ESQUEMA_CATEGORIA_PROCEDIMENTO = Esquema(CategoriaProcedimento, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_CATEGORIA_PROCEDIMENTO = (
+    'id', 'nome', 'descricao', 'data_cadastro'
+)
@@ -5,6 +5,12 @@ from src.models.paciente import db
 
 class Contrato(db.Model):
     __tablename__ = 'contratos'
+    __table_args__ = (
+        # Extração incremental do BI (registros alterados desde a última marca)
+        db.Index('ix_contratos_data_atualizacao', 'data_atualizacao'),
+        # ... e contratos de agendamentos cirúrgicos alterados
+        db.Index('ix_contratos_agendamento_cirurgico', 'agendamento_cirurgico_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     identificador_contrato = db.Column(db.String(50), unique=True, nullable=False)
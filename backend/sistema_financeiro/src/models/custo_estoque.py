@@ -0,0 +1,310 @@
+import os
+from sqlalchemy import select, update, delete, bindparam
+from sqlalchemy.orm import attributes
+from src.models.paciente import db
+from src.models.entrada_estoque import EntradaEstoque
+from src.models.saida_estoque import SaidaEstoque
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.item_saida_estoque import ItemSaidaEstoque
+
+# 'media' (custo médio ponderado móvel) ou 'fifo' (camadas PEPS).
+# Ao trocar o método, rode `flask recalcular-custos-estoque`.
+METODO_CUSTO = os.getenv('ESTOQUE_METODO_CUSTO', 'media')
+
+
+class CamadaCustoEstoque(db.Model):
+    """
+    Camadas FIFO: quanto resta de cada entrada e a que preço.
+    As saídas consomem da camada mais antiga para a mais nova; camadas
+    esgotadas são removidas. Só é mantida com ESTOQUE_METODO_CUSTO=fifo.
+    """
+    __tablename__ = 'camadas_custo_estoque'
+    __table_args__ = (
+        db.Index('ix_camadas_custo_estoque_item_ordem', 'item_id', 'data_entrada', 'item_entrada_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('itens.id'), nullable=False)
+    item_entrada_id = db.Column(db.Integer, db.ForeignKey('item_entrada_estoque.id'), nullable=False)
+    data_entrada = db.Column(db.Date, nullable=False)
+    preco_unitario = db.Column(db.Float, nullable=False, default=0)
+    quantidade_restante = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<CamadaCustoEstoque {self.item_id} {self.quantidade_restante}@{self.preco_unitario}>'
+
+
+def _tabela_saldos():
+    from src.models.saldo_estoque import SaldoEstoque
+    return SaldoEstoque.__table__
+
+
+def _custo_medio(quantidade, valor, anterior):
+    # Com saldo zerado ou negativo mantém o último custo médio conhecido
+    return valor / quantidade if quantidade > 0 else anterior
+
+
+def _consumir(camadas, quantidade, custo_reserva):
+    """
+    Consome 'quantidade' das camadas ([restante, preco], da mais antiga à mais
+    nova), alterando-as. O que faltar (estoque negativo) é custeado pelo preço
+    da última camada consumida ou, sem camadas, por 'custo_reserva'.
+    """
+    custo = 0.0
+    preco = custo_reserva
+    for camada in camadas:
+        if quantidade <= 0:
+            break
+        if camada[0] <= 0:
+            continue
+        consumido = min(camada[0], quantidade)
+        camada[0] -= consumido
+        quantidade -= consumido
+        preco = camada[1]
+        custo += consumido * preco
+    return custo + max(quantidade, 0) * (preco or 0)
+
+
+def ler_estados(conexao, itens):
+    """Estado de custo dos itens (travados até o commit); itens sem saldo ficam de fora"""
+    tabela = _tabela_saldos()
+    linhas = conexao.execute(
+        select(
+            tabela.c.item_id, tabela.c.quantidade, tabela.c.valor_total, tabela.c.custo_medio,
+            tabela.c.data_ultimo_custo, tabela.c.ultimo_custo_saida
+        ).where(tabela.c.item_id.in_(sorted(itens))).with_for_update()
+    ).all()
+    return {linha.item_id: linha for linha in linhas}
+
+
+def _em_ordem(estado, data, saida):
+    """
+    Custos seguem a ordem (data, entradas antes de saídas). Um movimento só
+    pode ser custeado incrementalmente se não for anterior ao último custeado.
+    """
+    if not estado or estado.data_ultimo_custo is None:
+        return True
+    return (data, saida) >= (estado.data_ultimo_custo, bool(estado.ultimo_custo_saida))
+
+
+def _camadas_fifo(conexao, itens):
+    """Camadas dos itens (travadas), da mais antiga para a mais nova: {item_id: [[restante, preco, id, restante_original]]}"""
+    tabela = CamadaCustoEstoque.__table__
+    camadas = {}
+    for camada_id, item_id, restante, preco in conexao.execute(
+        select(tabela.c.id, tabela.c.item_id, tabela.c.quantidade_restante, tabela.c.preco_unitario)
+        .where(tabela.c.item_id.in_(sorted(itens)))
+        .order_by(tabela.c.item_id, tabela.c.data_entrada, tabela.c.item_entrada_id)
+        .with_for_update()
+    ):
+        camadas.setdefault(item_id, []).append([restante, preco, camada_id, restante])
+    return camadas
+
+
+def custear_lote(conexao, linhas, data, saida, estados):
+    """
+    Custeia movimentos novos de um mesmo documento a partir do estado anterior
+    de cada item (estados lidos antes de aplicar os deltas de quantidade): as
+    entradas somam seu valor (e viram camadas no FIFO); as saídas recebem o
+    custo consumido e o abatem do valor em estoque.
+    'linhas' são tuplas (linha_id, item_id, quantidade, preco_unitario) em ordem de id.
+    Itens cujo último movimento custeado é posterior ao documento não são
+    alterados: voltam em 'fora_de_ordem' para recalcular_custos_item.
+    Retorna (custos {linha_id: custo_total} das saídas, fora_de_ordem).
+    """
+    por_item = {}
+    for linha in linhas:
+        por_item.setdefault(linha[1], []).append(linha)
+
+    fora_de_ordem = {item_id for item_id in por_item if not _em_ordem(estados.get(item_id), data, saida)}
+    itens = [item_id for item_id in por_item if item_id not in fora_de_ordem]
+    fifo = METODO_CUSTO == 'fifo'
+    camadas = _camadas_fifo(conexao, itens) if fifo and saida and itens else {}
+
+    custos = {}
+    novas_camadas = []
+    novos_estados = []
+    for item_id in itens:
+        estado = estados.get(item_id)
+        quantidade = estado.quantidade if estado else 0
+        valor = estado.valor_total if estado else 0
+        custo_medio = estado.custo_medio if estado else None
+
+        for linha_id, _, quantidade_movimento, preco in por_item[item_id]:
+            quantidade_movimento = quantidade_movimento or 0
+            if saida:
+                if fifo:
+                    custo = _consumir(camadas.get(item_id, []), quantidade_movimento, custo_medio)
+                else:
+                    custo = quantidade_movimento * (_custo_medio(quantidade, valor, custo_medio) or 0)
+                custos[linha_id] = custo
+                quantidade -= quantidade_movimento
+                valor -= custo
+            else:
+                preco = preco or 0
+                if fifo and quantidade_movimento > 0:
+                    novas_camadas.append({
+                        'item_id': item_id, 'item_entrada_id': linha_id, 'data_entrada': data,
+                        'preco_unitario': preco, 'quantidade_restante': quantidade_movimento,
+                    })
+                quantidade += quantidade_movimento
+                valor += quantidade_movimento * preco
+            custo_medio = _custo_medio(quantidade, valor, custo_medio)
+
+        novos_estados.append({
+            'chave_item_id': item_id, 'valor_total': valor, 'custo_medio': custo_medio,
+            'data_ultimo_custo': data, 'ultimo_custo_saida': saida,
+        })
+
+    if custos:
+        _gravar_custos_saida(conexao, [
+            {'linha_id': linha_id, 'quantidade': quantidade, 'custo': custos[linha_id]}
+            for linha_id, _, quantidade, _ in linhas if linha_id in custos
+        ])
+
+    tabela = CamadaCustoEstoque.__table__
+    if novas_camadas:
+        conexao.execute(tabela.insert(), novas_camadas)
+    alteradas = [camada for lista in camadas.values() for camada in lista if camada[0] != camada[3]]
+    esgotadas = [camada[2] for camada in alteradas if camada[0] <= 0]
+    if esgotadas:
+        conexao.execute(delete(tabela).where(tabela.c.id.in_(esgotadas)))
+    parciais = [{'camada_id': camada[2], 'restante': camada[0]} for camada in alteradas if camada[0] > 0]
+    if parciais:
+        conexao.execute(
+            update(tabela).where(tabela.c.id == bindparam('camada_id')).values(quantidade_restante=bindparam('restante')),
+            parciais
+        )
+
+    if novos_estados:
+        tabela = _tabela_saldos()
+        conexao.execute(
+            update(tabela).where(tabela.c.item_id == bindparam('chave_item_id')).values(
+                valor_total=bindparam('valor_total'),
+                custo_medio=bindparam('custo_medio'),
+                data_ultimo_custo=bindparam('data_ultimo_custo'),
+                ultimo_custo_saida=bindparam('ultimo_custo_saida'),
+            ),
+            novos_estados
+        )
+
+    return custos, fora_de_ordem
+
+
+def _gravar_custos_saida(conexao, custos):
+    """custos: [{'linha_id', 'quantidade', 'custo'}] -> grava custo unitário e total nas linhas de saída"""
+    tabela = ItemSaidaEstoque.__table__
+    conexao.execute(
+        update(tabela).where(tabela.c.id == bindparam('linha_id')).values(
+            custo_unitario=bindparam('custo_unitario'), custo_total=bindparam('custo_total')
+        ),
+        [
+            {
+                'linha_id': custo['linha_id'],
+                'custo_unitario': custo['custo'] / custo['quantidade'] if custo['quantidade'] else 0,
+                'custo_total': custo['custo'],
+            }
+            for custo in custos
+        ]
+    )
+
+
+def custear_insercao(conexao, linha, data, saida, estado):
+    """
+    Custeia uma linha nova inserida pelo ORM (ver custear_lote). Retorna False
+    se ela é retroativa e o item precisa ser recalculado.
+    """
+    custos, fora_de_ordem = custear_lote(
+        conexao, [(linha.id, linha.item_id, linha.quantidade, getattr(linha, 'preco_unitario', None))],
+        data, saida, {linha.item_id: estado} if estado else {}
+    )
+    if fora_de_ordem:
+        return False
+    if saida:
+        custo = custos[linha.id]
+        attributes.set_committed_value(linha, 'custo_total', custo)
+        attributes.set_committed_value(linha, 'custo_unitario', custo / linha.quantidade if linha.quantidade else 0)
+    return True
+
+
+def recalcular_custos_item(conexao, item_id):
+    """
+    Refaz o custeio do item percorrendo seus movimentos em ordem (data,
+    entradas antes de saídas, id). Usado quando um movimento retroativo é
+    incluído, alterado ou excluído; o caso comum (movimento mais recente)
+    é custeado incrementalmente por custear_insercao.
+    """
+    entradas = conexao.execute(
+        select(EntradaEstoque.data_entrada, ItemEntradaEstoque.id, ItemEntradaEstoque.quantidade, ItemEntradaEstoque.preco_unitario)
+        .join(EntradaEstoque, EntradaEstoque.id == ItemEntradaEstoque.entrada_estoque_id)
+        .where(ItemEntradaEstoque.item_id == item_id)
+    ).all()
+    saidas = conexao.execute(
+        select(SaidaEstoque.data_saida, ItemSaidaEstoque.id, ItemSaidaEstoque.quantidade)
+        .join(SaidaEstoque, SaidaEstoque.id == ItemSaidaEstoque.saida_estoque_id)
+        .where(ItemSaidaEstoque.item_id == item_id)
+    ).all()
+
+    movimentos = sorted(
+        [(data, False, linha_id, quantidade or 0, preco or 0) for data, linha_id, quantidade, preco in entradas]
+        + [(data, True, linha_id, quantidade or 0, None) for data, linha_id, quantidade in saidas]
+    )
+
+    quantidade = valor = 0.0
+    custo_medio = None
+    camadas = []  # [restante, preco, item_entrada_id, data]
+    custos = []
+    for data, saida, linha_id, quantidade_movimento, preco in movimentos:
+        if saida:
+            if METODO_CUSTO == 'fifo':
+                custo = _consumir(camadas, quantidade_movimento, custo_medio)
+            else:
+                custo = quantidade_movimento * (_custo_medio(quantidade, valor, custo_medio) or 0)
+            custos.append({'linha_id': linha_id, 'quantidade': quantidade_movimento, 'custo': custo})
+            quantidade -= quantidade_movimento
+            valor -= custo
+        else:
+            if quantidade_movimento > 0:
+                camadas.append([quantidade_movimento, preco, linha_id, data])
+            quantidade += quantidade_movimento
+            valor += quantidade_movimento * preco
+        custo_medio = _custo_medio(quantidade, valor, custo_medio)
+
+    if custos:
+        _gravar_custos_saida(conexao, custos)
+
+    tabela = CamadaCustoEstoque.__table__
+    conexao.execute(delete(tabela).where(tabela.c.item_id == item_id))
+    if METODO_CUSTO == 'fifo':
+        restantes = [
+            {'item_id': item_id, 'item_entrada_id': linha_id, 'data_entrada': data,
+             'preco_unitario': preco, 'quantidade_restante': restante}
+            for restante, preco, linha_id, data in camadas if restante > 0
+        ]
+        if restantes:
+            conexao.execute(tabela.insert(), restantes)
+
+    ultimo = movimentos[-1] if movimentos else None
+    tabela = _tabela_saldos()
+    conexao.execute(
+        update(tabela).where(tabela.c.item_id == item_id).values(
+            valor_total=valor,
+            custo_medio=custo_medio,
+            data_ultimo_custo=ultimo[0] if ultimo else None,
+            ultimo_custo_saida=ultimo[1] if ultimo else False,
+        )
+    )
+
+
+def recalcular_custos_estoque():
+    """Refaz o custeio de todos os itens (backfill ou troca de método)"""
+    itens = {
+        item_id
+        for modelo in (ItemEntradaEstoque, ItemSaidaEstoque)
+        for (item_id,) in db.session.execute(select(modelo.item_id).where(modelo.item_id.isnot(None)).distinct())
+    }
+    conexao = db.session.connection()
+    for item_id in sorted(itens):
+        recalcular_custos_item(conexao, item_id)
+    db.session.commit()
+    return len(itens)
@@ -8,6 +8,10 @@ from sqlalchemy.orm import relationship
 
 class EntradaEstoque(db.Model):
     __tablename__ = 'entrada_estoque'
+    __table_args__ = (
+        # Saldos históricos e extrato por período
+        db.Index('ix_entrada_estoque_data_entrada', 'data_entrada'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     data_entrada = db.Column(db.Date, nullable=False)
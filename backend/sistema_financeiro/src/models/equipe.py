@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Equipe(db.Model):
     __tablename__ = 'equipes'
@@ -11,4 +12,16 @@ class Equipe(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Equipe {self.nome}>'
\ No newline at end of file
+        return f'<Equipe {self.nome}>'
+
+
+ESQUEMA_EQUIPE = Esquema(Equipe, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_EQUIPE = (
+    'id', 'nome', 'descricao', 'data_cadastro'
+)
@@ -0,0 +1,78 @@
+from sqlalchemy import event, update, insert
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import attributes
+
+# Colunas que o upsert substitui em vez de somar
+COLUNAS_SUBSTITUIDAS = ('data_atualizacao',)
+
+
+def upsert_somando(conexao, tabela, chaves, linhas):
+    """
+    Soma as colunas de cada linha ({coluna: valor}) na linha de mesma chave,
+    criando-a com esses valores se ainda não existir. 'data_atualizacao' é
+    substituída, não somada.
+    Em MySQL e SQLite é um único upsert atômico (executemany para várias
+    linhas); nos demais bancos faz UPDATE e, se nenhuma linha existir, INSERT.
+    """
+    if not linhas:
+        return
+
+    somadas = [coluna for coluna in linhas[0] if coluna not in chaves and coluna not in COLUNAS_SUBSTITUIDAS]
+    substituidas = [coluna for coluna in linhas[0] if coluna in COLUNAS_SUBSTITUIDAS]
+
+    dialeto = conexao.dialect.name
+    if dialeto == 'mysql':
+        comando = mysql.insert(tabela)
+        novos = comando.inserted
+        comando = comando.on_duplicate_key_update(
+            **{coluna: tabela.c[coluna] + novos[coluna] for coluna in somadas},
+            **{coluna: novos[coluna] for coluna in substituidas},
+        )
+        conexao.execute(comando, linhas)
+        return
+
+    if dialeto == 'sqlite':
+        comando = sqlite.insert(tabela)
+        novos = comando.excluded
+        comando = comando.on_conflict_do_update(
+            index_elements=list(chaves),
+            set_={
+                **{coluna: tabela.c[coluna] + novos[coluna] for coluna in somadas},
+                **{coluna: novos[coluna] for coluna in substituidas},
+            },
+        )
+        conexao.execute(comando, linhas)
+        return
+
+    for linha in linhas:
+        resultado = conexao.execute(
+            update(tabela)
+            .where(*(tabela.c[chave] == linha[chave] for chave in chaves))
+            .values(
+                **{coluna: tabela.c[coluna] + linha[coluna] for coluna in somadas},
+                **{coluna: linha[coluna] for coluna in substituidas},
+            )
+        )
+        if resultado.rowcount == 0:
+            conexao.execute(insert(tabela).values(**linha))
+
+
+def _registrar_valor_anterior(alvo, valor, anterior, iniciador):
+    # Sem efeito próprio: existe para que o valor anterior seja carregado
+    # (active_history) mesmo quando o atributo estava expirado
+    return valor
+
+
+def manter_valores_anteriores(*atributos):
+    """Garante que o histórico dos atributos traga o valor anterior a uma alteração"""
+    for atributo in atributos:
+        event.listen(atributo, 'set', _registrar_valor_anterior, active_history=True)
+
+
+def valores_anteriores(alvo, campos):
+    """Valores dos campos antes das alterações pendentes (os atuais, se não mudaram)"""
+    valores = []
+    for campo in campos:
+        historico = attributes.get_history(alvo, campo)
+        valores.append(historico.deleted[0] if historico.deleted else getattr(alvo, campo))
+    return tuple(valores)
@@ -0,0 +1,105 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, func
+from src.models.paciente import db
+from src.models.eventos import upsert_somando
+
+# Apenas lançamentos pagos entram no fluxo de caixa
+STATUS_FLUXO_CAIXA = 'pago'
+
+
+class FluxoCaixaMensal(db.Model):
+    """
+    Totais pagos por mês (YYYY-MM), tipo e natureza.
+    Mantida incrementalmente pelos eventos de LancamentoFinanceiro; pode ser
+    recalculada por completo com `flask reconstruir-fluxo-caixa`.
+    """
+    __tablename__ = 'fluxo_caixa_mensal'
+
+    mes = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    tipo = db.Column(db.String(10), primary_key=True)  # 'a_receber' ou 'a_pagar'
+    natureza_id = db.Column(db.Integer, db.ForeignKey('natureza_orcamentaria.id'), primary_key=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FluxoCaixaMensal {self.mes} {self.tipo} {self.natureza_id}>'
+
+    def to_dict(self):
+        return {
+            'mes': self.mes,
+            'tipo': self.tipo,
+            'natureza_id': self.natureza_id,
+            'total': float(self.total) if self.total is not None else 0.0,
+            'quantidade': self.quantidade
+        }
+
+
+def chave_fluxo_caixa(status, data_pagamento, tipo, natureza_id):
+    """Chave (mes, tipo, natureza_id) em que o lançamento é contabilizado, ou None se não entra no fluxo"""
+    if status != STATUS_FLUXO_CAIXA or data_pagamento is None:
+        return None
+    return (data_pagamento.strftime('%Y-%m'), tipo, natureza_id)
+
+
+def aplicar_delta_fluxo_caixa(conexao, chave, valor, quantidade):
+    """Soma valor/quantidade na linha da chave, criando-a se ainda não existir"""
+    mes, tipo, natureza_id = chave
+    upsert_somando(conexao, FluxoCaixaMensal.__table__, ('mes', 'tipo', 'natureza_id'), [{
+        'mes': mes,
+        'tipo': tipo,
+        'natureza_id': natureza_id,
+        'total': valor,
+        'quantidade': quantidade,
+        'data_atualizacao': datetime.utcnow(),
+    }])
+
+
+def consulta_totais_pagos():
+    """
+    Totais dos lançamentos pagos por ano, mês, tipo e natureza, lidos pelo
+    índice (status, data_pagamento, tipo) de lancamentos_financeiros
+    """
+    from src.models.lancamento_financeiro import LancamentoFinanceiro
+
+    ano = func.extract('year', LancamentoFinanceiro.data_pagamento).label('ano')
+    mes = func.extract('month', LancamentoFinanceiro.data_pagamento).label('mes')
+    return select(
+        ano,
+        mes,
+        LancamentoFinanceiro.tipo,
+        LancamentoFinanceiro.natureza_id,
+        func.sum(LancamentoFinanceiro.valor).label('total'),
+        func.count(LancamentoFinanceiro.id).label('quantidade'),
+    ).where(
+        LancamentoFinanceiro.status == STATUS_FLUXO_CAIXA,
+        LancamentoFinanceiro.data_pagamento.isnot(None)
+    ).group_by(ano, mes, LancamentoFinanceiro.tipo, LancamentoFinanceiro.natureza_id)
+
+
+def reconstruir_fluxo_caixa():
+    """
+    Recalcula toda a tabela a partir dos lançamentos (backfill ou correção).
+    Roda em uma única transação: leitores continuam vendo a versão anterior
+    até o commit.
+    """
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            'mes': f"{int(linha.ano):04d}-{int(linha.mes):02d}",
+            'tipo': linha.tipo,
+            'natureza_id': linha.natureza_id,
+            'total': Decimal(str(linha.total or 0)),
+            'quantidade': linha.quantidade,
+            'data_atualizacao': agora,
+        }
+        for linha in db.session.execute(consulta_totais_pagos())
+    ]
+
+    db.session.execute(FluxoCaixaMensal.__table__.delete())
+    if linhas:
+        db.session.execute(FluxoCaixaMensal.__table__.insert(), linhas)
+    db.session.commit()
+
+    return len(linhas)
@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Fornecedor(db.Model):
     __tablename__ = 'fornecedores'
@@ -24,3 +25,19 @@ class Fornecedor(db.Model):
     @staticmethod
     def gerar_identificador():
         return f'FORN-{uuid.uuid4().hex[:8].upper()}'
+
+
+ESQUEMA_FORNECEDOR = Esquema(Fornecedor, {
+    'id': coluna(),
+    'nome': coluna(),
+    'cpf_cnpj': coluna(),
+    'identificador': coluna(),
+    'telefone': coluna(),
+    'email': coluna(),
+    'endereco': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_FORNECEDOR = (
+    'id', 'nome', 'cpf_cnpj', 'identificador', 'telefone', 'email', 'endereco', 'data_cadastro'
+)
@@ -12,6 +12,9 @@ class ItemSaidaEstoque(db.Model):
     saida_estoque_id = db.Column(db.Integer, db.ForeignKey('saida_estoque.id'))
     item_id = db.Column(db.Integer, db.ForeignKey('itens.id'))
     quantidade = db.Column(db.Float)
+    # Custo consumido pela saída (custo médio ou FIFO, ver custo_estoque)
+    custo_unitario = db.Column(db.Float, nullable=True)
+    custo_total = db.Column(db.Float, nullable=True)
 
     item = relationship("Item", backref="itens_saida")
 
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Item(db.Model):
     __tablename__ = 'itens'
@@ -12,4 +13,17 @@ class Item(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Item {self.nome}>'
\ No newline at end of file
+        return f'<Item {self.nome}>'
+
+
+ESQUEMA_ITEM = Esquema(Item, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'quantidade_estoque': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_ITEM = (
+    'id', 'nome', 'descricao', 'quantidade_estoque', 'data_cadastro'
+)
@@ -3,9 +3,34 @@ from datetime import datetime
 import uuid
 from src.models.paciente import db
 from src.models.fornecedor import Fornecedor
+from src.models.contrato import Contrato
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.fluxo_caixa_mensal import chave_fluxo_caixa, aplicar_delta_fluxo_caixa
+from src.models.eventos import manter_valores_anteriores, valores_anteriores
+from src.serializacao import Esquema, coluna, derivado, data_iso, decimal_float
+from decimal import Decimal
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
 
 class LancamentoFinanceiro(db.Model):
     __tablename__ = 'lancamentos_financeiros'
+    __table_args__ = (
+        # Usado pelo resumo do dashboard (agregações por tipo/status/vencimento)
+        db.Index('ix_lancamentos_tipo_status_vencimento', 'tipo', 'status', 'data_vencimento'),
+        # Paginação por cursor (data_vencimento, id) e filtros da listagem
+        db.Index('ix_lancamentos_vencimento_id', 'data_vencimento', 'id'),
+        db.Index('ix_lancamentos_status_vencimento_id', 'status', 'data_vencimento', 'id'),
+        db.Index('ix_lancamentos_natureza_vencimento', 'natureza_id', 'data_vencimento'),
+        db.Index('ix_lancamentos_fornecedor_vencimento', 'fornecedor_id', 'data_vencimento'),
+        db.Index('ix_lancamentos_valor_id', 'valor', 'id'),
+        # Fluxo de caixa do BI (pagos por data de pagamento e tipo)
+        db.Index('ix_lancamentos_status_pagamento_tipo', 'status', 'data_pagamento', 'tipo', 'valor'),
+        # Extração incremental do BI (registros alterados desde a última marca)
+        db.Index('ix_lancamentos_data_atualizacao', 'data_atualizacao'),
+        # ... e lançamentos de contratos/pacotes alterados (join a partir do pai)
+        db.Index('ix_lancamentos_contrato', 'contrato_id'),
+        db.Index('ix_lancamentos_pacote_tratamento', 'pacote_tratamento_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(10), nullable=False)  # 'a_receber' ou 'a_pagar'
@@ -27,10 +52,20 @@ class LancamentoFinanceiro(db.Model):
     natureza = db.relationship('Natureza', backref='lancamentos_financeiros_natureza', lazy=True)
     contrato = db.relationship('Contrato', back_populates='lancamentos')
     fornecedor = db.relationship('Fornecedor', back_populates='lancamentos_financeiros')
-    pacote_tratamento = db.relationship('PacoteTratamento', back_populates='lancamentos_tratamentos')
+    pacote_tratamento = db.relationship('PacoteTratamento', back_populates='lancamentos_financeiros')
     
     def __repr__(self):
         return f'<LancamentoFinanceiro {self.id} - {self.tipo}>'
+
+    @staticmethod
+    def opcoes_carregamento():
+        """Carregamento antecipado usado por todas as leituras que serializam lançamentos"""
+        return (
+            selectinload(LancamentoFinanceiro.contrato).joinedload(Contrato.paciente),
+            selectinload(LancamentoFinanceiro.pacote_tratamento).joinedload(PacoteTratamento.paciente),
+            joinedload(LancamentoFinanceiro.fornecedor),
+            joinedload(LancamentoFinanceiro.natureza),
+        )
     
     def validar(self):
         """Valida as regras de negócio para lançamentos financeiros"""
@@ -63,26 +98,123 @@ class LancamentoFinanceiro(db.Model):
             return "Origem não identificada"
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'tipo': self.tipo,
-            'contrato_id': self.contrato_id,
-            'contrato_identificador': self.contrato.identificador_contrato if self.contrato else None,
-            'pacote_tratamento_id': self.pacote_tratamento_id,
-            'pacote_tratamento_descricao': self.pacote_tratamento.descricao if self.pacote_tratamento else None,
-            'fornecedor_id': self.fornecedor_id,
-            'fornecedor_nome': self.fornecedor.nome if self.fornecedor else None,
-            'data_vencimento': self.data_vencimento.isoformat() if self.data_vencimento else None,
-            'data_pagamento': self.data_pagamento.isoformat() if self.data_pagamento else None,
-            'valor': float(self.valor),
-            'status': self.status,
-            'numero_nota_fiscal': self.numero_nota_fiscal,
-            'observacoes': self.observacoes,
-            'forma_pagamento': self.forma_pagamento,
-            'natureza_id': self.natureza_id,
-            'natureza_nome': self.natureza.nome if self.natureza else None,
-            'origem_descricao': self.origem_descricao,
-            'data_criacao': self.data_criacao.isoformat(),
-            'data_atualizacao': self.data_atualizacao.isoformat()
-        }
+        return ESQUEMA_LANCAMENTO.serializar(self, CAMPOS_LANCAMENTO_COMPLETO)
+
+
+def _paciente_nome(lancamento):
+    if lancamento.contrato:
+        return lancamento.contrato.paciente.nome
+    if lancamento.pacote_tratamento:
+        return lancamento.pacote_tratamento.paciente.nome
+    return None
+
+
+ESQUEMA_LANCAMENTO = Esquema(LancamentoFinanceiro, {
+    'id': coluna(),
+    'tipo': coluna(),
+    'contrato_id': coluna(),
+    'contrato_identificador': derivado(lambda l: l.contrato.identificador_contrato if l.contrato else None),
+    'paciente_nome': derivado(_paciente_nome),
+    'pacote_tratamento_id': coluna(),
+    'pacote_tratamento_descricao': derivado(lambda l: l.pacote_tratamento.descricao if l.pacote_tratamento else None),
+    'fornecedor_id': coluna(),
+    'fornecedor_nome': derivado(lambda l: l.fornecedor.nome if l.fornecedor else None),
+    'data_vencimento': coluna(conversor=data_iso),
+    'data_pagamento': coluna(conversor=data_iso),
+    'valor': coluna(conversor=decimal_float),
+    'status': coluna(),
+    'numero_nota_fiscal': coluna(),
+    'observacoes': coluna(),
+    'forma_pagamento': coluna(),
+    'natureza_id': coluna(),
+    'natureza_nome': derivado(lambda l: l.natureza.nome if l.natureza else None),
+    'origem_descricao': derivado(lambda l: l.origem_descricao),
+    'data_criacao': coluna(conversor=data_iso),
+    'data_atualizacao': coluna(conversor=data_iso),
+}, carregamento=LancamentoFinanceiro.opcoes_carregamento)
+
+CAMPOS_LANCAMENTO_COMPLETO = (
+    'id', 'tipo', 'contrato_id', 'contrato_identificador', 'pacote_tratamento_id',
+    'pacote_tratamento_descricao', 'fornecedor_id', 'fornecedor_nome', 'data_vencimento',
+    'data_pagamento', 'valor', 'status', 'numero_nota_fiscal', 'observacoes', 'forma_pagamento',
+    'natureza_id', 'natureza_nome', 'origem_descricao', 'data_criacao', 'data_atualizacao'
+)
+
+# Campos das listagens e do detalhe
+CAMPOS_LANCAMENTO_LISTAGEM = (
+    'id', 'tipo', 'contrato_id', 'contrato_identificador', 'paciente_nome', 'fornecedor_id',
+    'fornecedor_nome', 'data_vencimento', 'data_pagamento', 'valor', 'status', 'numero_nota_fiscal',
+    'observacoes', 'forma_pagamento', 'natureza_id', 'natureza_nome', 'data_criacao',
+    'data_atualizacao', 'pacote_tratamento_id'
+)
+
+# Campos devolvidos após criar/atualizar
+CAMPOS_LANCAMENTO_GRAVACAO = (
+    'id', 'tipo', 'contrato_id', 'fornecedor_id', 'data_vencimento', 'data_pagamento', 'valor',
+    'status', 'numero_nota_fiscal', 'observacoes', 'forma_pagamento', 'data_criacao',
+    'data_atualizacao', 'natureza_id', 'natureza_nome'
+)
+
+CAMPOS_LANCAMENTO_POR_CONTRATO = (
+    'id', 'tipo', 'contrato_id', 'data_vencimento', 'data_pagamento', 'valor', 'status',
+    'numero_nota_fiscal', 'observacoes', 'forma_pagamento', 'data_criacao', 'data_atualizacao',
+    'natureza_id', 'natureza_nome'
+)
+
+CAMPOS_LANCAMENTO_POR_FORNECEDOR = (
+    'id', 'tipo', 'fornecedor_id', 'data_vencimento', 'data_pagamento', 'valor', 'status',
+    'numero_nota_fiscal', 'observacoes', 'forma_pagamento', 'data_criacao', 'data_atualizacao'
+)
+
+
+# Manutenção incremental de fluxo_caixa_mensal.
+# Os eventos rodam na mesma conexão/transação do flush, então a tabela de
+# resumo nunca fica à frente nem atrás dos lançamentos. Atualizações em massa
+# (query.update/delete) não disparam estes eventos: use reconstruir_fluxo_caixa.
+CAMPOS_FLUXO_CAIXA = ('status', 'data_pagamento', 'tipo', 'natureza_id', 'valor')
+
+
+def _valor_decimal(valor):
+    return Decimal(str(valor)) if valor is not None else Decimal('0')
+
+
+def _contribuicao(status, data_pagamento, tipo, natureza_id, valor):
+    chave = chave_fluxo_caixa(status, data_pagamento, tipo, natureza_id)
+    return (chave, _valor_decimal(valor)) if chave else None
+
+
+def _contribuicao_atual(lancamento):
+    return _contribuicao(*(getattr(lancamento, campo) for campo in CAMPOS_FLUXO_CAIXA))
+
+
+def _contribuicao_anterior(lancamento):
+    return _contribuicao(*valores_anteriores(lancamento, CAMPOS_FLUXO_CAIXA))
+
+
+manter_valores_anteriores(*(getattr(LancamentoFinanceiro, campo) for campo in CAMPOS_FLUXO_CAIXA))
+
+
+@event.listens_for(LancamentoFinanceiro, 'after_insert')
+def _fluxo_caixa_apos_inserir(mapper, conexao, lancamento):
+    atual = _contribuicao_atual(lancamento)
+    if atual:
+        aplicar_delta_fluxo_caixa(conexao, atual[0], atual[1], 1)
+
+
+@event.listens_for(LancamentoFinanceiro, 'after_update')
+def _fluxo_caixa_apos_atualizar(mapper, conexao, lancamento):
+    anterior = _contribuicao_anterior(lancamento)
+    atual = _contribuicao_atual(lancamento)
+    if anterior == atual:
+        return
+    if anterior:
+        aplicar_delta_fluxo_caixa(conexao, anterior[0], -anterior[1], -1)
+    if atual:
+        aplicar_delta_fluxo_caixa(conexao, atual[0], atual[1], 1)
+
 
+@event.listens_for(LancamentoFinanceiro, 'after_delete')
+def _fluxo_caixa_apos_excluir(mapper, conexao, lancamento):
+    anterior = _contribuicao_anterior(lancamento)
+    if anterior:
+        aplicar_delta_fluxo_caixa(conexao, anterior[0], -anterior[1], -1)
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class LocalAtendimento(db.Model):
     __tablename__ = 'locais_atendimento'
@@ -11,4 +12,16 @@ class LocalAtendimento(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<LocalAtendimento {self.nome}>'
\ No newline at end of file
+        return f'<LocalAtendimento {self.nome}>'
+
+
+ESQUEMA_LOCAL_ATENDIMENTO = Esquema(LocalAtendimento, {
+    'id': coluna(),
+    'nome': coluna(),
+    'endereco': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_LOCAL_ATENDIMENTO = (
+    'id', 'nome', 'endereco', 'data_cadastro'
+)
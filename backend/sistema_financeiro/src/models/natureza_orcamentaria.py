@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Natureza(db.Model):
     __tablename__ = 'natureza_orcamentaria'
@@ -11,4 +12,16 @@ class Natureza(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Natureza {self.nome}>'
\ No newline at end of file
+        return f'<Natureza {self.nome}>'
+
+
+ESQUEMA_NATUREZA = Esquema(Natureza, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_NATUREZA = (
+    'id', 'nome', 'descricao', 'data_cadastro'
+)
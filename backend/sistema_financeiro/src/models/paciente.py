@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
+from src.serializacao import Esquema, coluna, data_iso
 db = SQLAlchemy()
 
 class Paciente(db.Model):
@@ -31,4 +32,31 @@ class Paciente(db.Model):
     
     @staticmethod
     def gerar_identificador():
-        return f'PAC-{uuid.uuid4().hex[:8].upper()}'
\ No newline at end of file
+        return f'PAC-{uuid.uuid4().hex[:8].upper()}'
+
+
+ESQUEMA_PACIENTE = Esquema(Paciente, {
+    'id': coluna(),
+    'nome': coluna(),
+    'cpf': coluna(),
+    'data_nascimento': coluna(conversor=data_iso),
+    'identificador': coluna(),
+    'telefone': coluna(),
+    'email': coluna(),
+    'endereco': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+    'nacionalidade': coluna(),
+    'logradouro': coluna(),
+    'numero': coluna(),
+    'bairro': coluna(),
+    'cidade': coluna(),
+    'estado': coluna(),
+    'cep': coluna(),
+    'complemento': coluna(),
+})
+
+CAMPOS_PACIENTE = (
+    'id', 'nome', 'cpf', 'data_nascimento', 'identificador', 'telefone', 'email', 'endereco',
+    'data_cadastro', 'nacionalidade', 'logradouro', 'numero', 'bairro', 'cidade', 'estado', 'cep',
+    'complemento'
+)
@@ -2,10 +2,22 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import select, func, update, bindparam
 from src.models.paciente import db
 
+# Status de sessão -> contador mantido no pacote (sessões 'remarcada' não contam)
+CONTADORES_STATUS_SESSAO = {
+    'agendada': 'total_sessoes_agendadas',
+    'realizada': 'total_sessoes_realizadas',
+    'cancelada': 'total_sessoes_canceladas',
+}
+
 class PacoteTratamento(db.Model):
     __tablename__ = 'pacotes_tratamento'
+    __table_args__ = (
+        # Extração incremental do BI (registros alterados desde a última marca)
+        db.Index('ix_pacotes_tratamento_data_atualizacao', 'data_atualizacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False)
@@ -14,6 +26,11 @@ class PacoteTratamento(db.Model):
     data_inicio_tratamento = db.Column(db.Date, nullable=False)
     numero_sessoes_contratadas = db.Column(db.Integer, nullable=False)
     numero_sessoes_realizadas = db.Column(db.Integer, default=0)
+    # Sessões por status atual, mantidos pelos eventos de AgendamentoSessao
+    # (recalculáveis com `flask reconstruir-contadores-sessoes`)
+    total_sessoes_agendadas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_sessoes_realizadas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_sessoes_canceladas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     valor_total_pacote = db.Column(db.Float, nullable=False)
     status_pacote = db.Column(db.String(50), nullable=False, default='ativo')  # ativo, concluido, cancelado
     observacoes = db.Column(db.Text, nullable=True)
@@ -22,7 +39,7 @@ class PacoteTratamento(db.Model):
 
     # Relacionamentos
     paciente = db.relationship('Paciente', backref='pacotes_tratamento', lazy=True)
-    lancamentos_financeiros = db.relationship('LancamentoFinanceiro', backref='pacote_tratamento', lazy=True)
+    lancamentos_financeiros = db.relationship('LancamentoFinanceiro', back_populates='pacote_tratamento', lazy=True)
     agendamentos_sessao = db.relationship('AgendamentoSessao', backref='pacote_tratamento', lazy=True)
 
     def __repr__(self):
@@ -67,6 +84,9 @@ class PacoteTratamento(db.Model):
             'numero_sessoes_realizadas': self.numero_sessoes_realizadas,
             'sessoes_restantes': self.sessoes_restantes,
             'percentual_concluido': self.percentual_concluido,
+            'total_sessoes_agendadas': self.total_sessoes_agendadas,
+            'total_sessoes_realizadas': self.total_sessoes_realizadas,
+            'total_sessoes_canceladas': self.total_sessoes_canceladas,
             'valor_total_pacote': float(self.valor_total_pacote),
             'status_pacote': self.status_pacote,
             'observacoes': self.observacoes,
@@ -74,3 +94,49 @@ class PacoteTratamento(db.Model):
             'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
         }
 
+
+def aplicar_delta_contadores(conexao, pacote_id, status, quantidade):
+    """Soma 'quantidade' (pode ser negativa) ao contador do status no pacote, no próprio banco"""
+    coluna = CONTADORES_STATUS_SESSAO.get(status)
+    if not coluna or not pacote_id:
+        return
+    tabela = PacoteTratamento.__table__
+    conexao.execute(
+        update(tabela)
+        .where(tabela.c.id == pacote_id)
+        .values({coluna: tabela.c[coluna] + quantidade})
+    )
+
+
+def reconstruir_contadores_sessoes():
+    """
+    Recalcula os contadores de todos os pacotes com um único GROUP BY
+    (pacote, status) sobre as sessões. Roda em uma única transação.
+    """
+    from src.models.agendamento_sessao import AgendamentoSessao
+
+    consulta = select(
+        AgendamentoSessao.pacote_tratamento_id,
+        AgendamentoSessao.status_sessao,
+        func.count(AgendamentoSessao.id).label('quantidade'),
+    ).group_by(AgendamentoSessao.pacote_tratamento_id, AgendamentoSessao.status_sessao)
+
+    contadores = {}
+    for linha in db.session.execute(consulta):
+        coluna = CONTADORES_STATUS_SESSAO.get(linha.status_sessao)
+        if coluna:
+            valores = contadores.setdefault(linha.pacote_tratamento_id, dict.fromkeys(CONTADORES_STATUS_SESSAO.values(), 0))
+            valores[coluna] = linha.quantidade
+
+    tabela = PacoteTratamento.__table__
+    db.session.execute(update(tabela).values(dict.fromkeys(CONTADORES_STATUS_SESSAO.values(), 0)))
+    if contadores:
+        db.session.execute(
+            update(tabela).where(tabela.c.id == bindparam('pacote_id')).values(
+                {coluna: bindparam(coluna) for coluna in CONTADORES_STATUS_SESSAO.values()}
+            ),
+            [{'pacote_id': pacote_id, **valores} for pacote_id, valores in contadores.items()]
+        )
+    db.session.commit()
+
+    return len(contadores)
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Procedimento(db.Model):
     __tablename__ = 'procedimentos'
@@ -12,4 +13,17 @@ class Procedimento(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Procedimento {self.nome}>'
\ No newline at end of file
+        return f'<Procedimento {self.nome}>'
+
+
+ESQUEMA_PROCEDIMENTO = Esquema(Procedimento, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'valor_sugerido': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_PROCEDIMENTO = (
+    'id', 'nome', 'descricao', 'valor_sugerido', 'data_cadastro'
+)
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.paciente import db
+from src.serializacao import Esquema, coluna, data_iso
 
 class Refeicao(db.Model):
     __tablename__ = 'refeicoes'
@@ -11,4 +12,16 @@ class Refeicao(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Refeicao {self.nome}>'
\ No newline at end of file
+        return f'<Refeicao {self.nome}>'
+
+
+ESQUEMA_REFEICAO = Esquema(Refeicao, {
+    'id': coluna(),
+    'nome': coluna(),
+    'descricao': coluna(),
+    'data_cadastro': coluna(conversor=data_iso),
+})
+
+CAMPOS_REFEICAO = (
+    'id', 'nome', 'descricao', 'data_cadastro'
+)
@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.models.paciente import db
+from src.models.contrato import Contrato
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.models.lancamento_financeiro import LancamentoFinanceiro
+
+
+class RegistroExcluido(db.Model):
+    """
+    Lápides de registros excluídos, usadas pela extração incremental do BI
+    para informar ao data warehouse o que deve ser apagado
+    """
+    __tablename__ = 'registros_excluidos'
+    __table_args__ = (
+        db.Index('ix_registros_excluidos_tabela_data', 'tabela', 'data_exclusao'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(64), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    data_exclusao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RegistroExcluido {self.tabela} {self.registro_id}>'
+
+
+# Retenção das lápides: purgar-registros-excluidos apaga as mais antigas.
+# Um consumidor do BI precisa sincronizar dentro desse prazo; com uma marca
+# mais antiga a extração incremental é recusada e ele deve refazer a carga
+# completa (exclusões anteriores ao prazo já não podem ser informadas).
+RETENCAO_EXCLUIDOS_DIAS = int(os.getenv('BI_RETENCAO_EXCLUIDOS_DIAS', '90'))
+
+
+def limite_retencao_excluidos(agora=None):
+    """Data a partir da qual as lápides são mantidas (UTC)"""
+    return (agora or datetime.utcnow()) - timedelta(days=RETENCAO_EXCLUIDOS_DIAS)
+
+
+def purgar_registros_excluidos(antes_de=None):
+    """
+    Apaga as lápides anteriores a 'antes_de' (padrão: limite de retenção).
+    Retorna quantas foram apagadas.
+    """
+    if antes_de is None:
+        antes_de = limite_retencao_excluidos()
+    apagadas = RegistroExcluido.query.filter(
+        RegistroExcluido.data_exclusao < antes_de
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return apagadas
+
+
+# Modelos cujas exclusões são registradas (os que têm data_atualizacao).
+# Exclusões em massa (query.delete) não disparam o evento.
+MODELOS_RASTREADOS = (LancamentoFinanceiro, Contrato, PacoteTratamento, AgendamentoCirurgico)
+
+
+def _registrar_exclusao(mapper, conexao, registro):
+    conexao.execute(RegistroExcluido.__table__.insert().values(
+        tabela=mapper.local_table.name,
+        registro_id=registro.id,
+        data_exclusao=datetime.utcnow()
+    ))
+
+
+for _modelo in MODELOS_RASTREADOS:
+    event.listen(_modelo, 'after_delete', _registrar_exclusao)
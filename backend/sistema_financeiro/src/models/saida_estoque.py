@@ -6,6 +6,10 @@ from src.models.agendamento import Agendamento
 
 class SaidaEstoque(db.Model):
     __tablename__ = 'saida_estoque'
+    __table_args__ = (
+        # Saldos históricos e extrato por período
+        db.Index('ix_saida_estoque_data_saida', 'data_saida'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     data_saida = db.Column(db.Date, nullable=False)
@@ -0,0 +1,421 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, select, func, literal
+from sqlalchemy.orm import Session, attributes, object_session
+from src.models.paciente import db
+from src.models.eventos import upsert_somando, manter_valores_anteriores, valores_anteriores
+from src.models.entrada_estoque import EntradaEstoque
+from src.models.saida_estoque import SaidaEstoque
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.item_saida_estoque import ItemSaidaEstoque
+from src.models.custo_estoque import ler_estados, custear_lote, custear_insercao, recalcular_custos_item
+
+
+class SaldoEstoque(db.Model):
+    """
+    Saldo atual de cada item (entradas - saídas).
+    Mantida incrementalmente pelos eventos dos itens de entrada e de saída;
+    pode ser recalculada por completo com `flask reconstruir-saldos-estoque`.
+    """
+    __tablename__ = 'saldos_estoque'
+
+    item_id = db.Column(db.Integer, db.ForeignKey('itens.id'), primary_key=True)
+    total_entrada = db.Column(db.Float, nullable=False, default=0)
+    total_saida = db.Column(db.Float, nullable=False, default=0)
+    quantidade = db.Column(db.Float, nullable=False, default=0)
+    # Custeio (ver custo_estoque): valor do saldo e estado do último movimento custeado
+    valor_total = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    custo_medio = db.Column(db.Float, nullable=True)
+    data_ultimo_custo = db.Column(db.Date, nullable=True)
+    ultimo_custo_saida = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    item = db.relationship('Item', backref=db.backref('saldo_estoque', uselist=False), lazy=True)
+
+    def __repr__(self):
+        return f'<SaldoEstoque {self.item_id} {self.quantidade}>'
+
+
+class SaldoEstoqueMensal(db.Model):
+    """
+    Fechamento mensal do estoque: totais acumulados de cada item até o último
+    dia do mês (YYYY-MM). Consultas históricas partem do fechamento anterior
+    à data pedida e somam só os movimentos posteriores a ele.
+    Gerada por `flask gerar-fechamentos-estoque`; movimentos com data em um
+    mês já fechado apagam os fechamentos daquele mês em diante.
+    """
+    __tablename__ = 'saldos_estoque_mensais'
+
+    mes = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    item_id = db.Column(db.Integer, db.ForeignKey('itens.id'), primary_key=True)
+    total_entrada = db.Column(db.Float, nullable=False, default=0)
+    total_saida = db.Column(db.Float, nullable=False, default=0)
+    quantidade = db.Column(db.Float, nullable=False, default=0)
+    data_geracao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SaldoEstoqueMensal {self.mes} {self.item_id} {self.quantidade}>'
+
+
+def mes_de(dia):
+    return dia.strftime('%Y-%m')
+
+
+def primeiro_dia(mes):
+    return date(int(mes[:4]), int(mes[5:7]), 1)
+
+
+def ultimo_dia(mes):
+    return (primeiro_dia(mes) + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+
+def mes_seguinte(mes):
+    return mes_de(ultimo_dia(mes) + timedelta(days=1))
+
+
+def movimentos_por_item(inicio=None, fim=None, item_id=None):
+    """
+    Entradas e saídas somadas por item com data entre inicio e fim (inclusive;
+    None = sem limite). Filtra pela data do cabeçalho (data_entrada/data_saida),
+    então lê só os movimentos do intervalo.
+    Retorna {item_id: [total_entrada, total_saida]}.
+    """
+    totais = {}
+    for linha_modelo, cabecalho, chave, coluna_data, posicao in (
+        (ItemEntradaEstoque, EntradaEstoque, ItemEntradaEstoque.entrada_estoque_id, EntradaEstoque.data_entrada, 0),
+        (ItemSaidaEstoque, SaidaEstoque, ItemSaidaEstoque.saida_estoque_id, SaidaEstoque.data_saida, 1),
+    ):
+        consulta = select(
+            linha_modelo.item_id, func.coalesce(func.sum(linha_modelo.quantidade), 0)
+        ).join(cabecalho, cabecalho.id == chave).where(linha_modelo.item_id.isnot(None))
+        if inicio:
+            consulta = consulta.where(coluna_data >= inicio)
+        if fim:
+            consulta = consulta.where(coluna_data <= fim)
+        if item_id:
+            consulta = consulta.where(linha_modelo.item_id == item_id)
+
+        for item, total in db.session.execute(consulta.group_by(linha_modelo.item_id)):
+            totais.setdefault(item, [0.0, 0.0])[posicao] = float(total)
+    return totais
+
+
+def ultimo_fechamento(antes_de=None):
+    """Mês (YYYY-MM) do fechamento mais recente, opcionalmente anterior ao mês informado"""
+    consulta = select(func.max(SaldoEstoqueMensal.mes))
+    if antes_de:
+        consulta = consulta.where(SaldoEstoqueMensal.mes < antes_de)
+    return db.session.execute(consulta).scalar()
+
+
+def gerar_fechamentos_estoque(ate=None):
+    """
+    Gera os fechamentos mensais que faltam, do mês seguinte ao último
+    fechamento até 'ate' (padrão: o mês anterior ao atual). Cada mês é o
+    fechamento anterior mais os movimentos do mês; todos os itens já
+    movimentados ganham linha (mesmo com saldo zero), então um mês fechado
+    está sempre completo. Retorna quantos meses foram gerados.
+    """
+    ate = ate or mes_de(date.today().replace(day=1) - timedelta(days=1))
+
+    ultimo = ultimo_fechamento()
+    if ultimo:
+        saldos = {
+            linha.item_id: [linha.total_entrada, linha.total_saida]
+            for linha in SaldoEstoqueMensal.query.filter_by(mes=ultimo)
+        }
+        mes = mes_seguinte(ultimo)
+    else:
+        saldos = {}
+        primeiras = [
+            db.session.execute(select(func.min(EntradaEstoque.data_entrada))).scalar(),
+            db.session.execute(select(func.min(SaidaEstoque.data_saida))).scalar(),
+        ]
+        primeiras = [dia for dia in primeiras if dia]
+        if not primeiras:
+            return 0
+        mes = mes_de(min(primeiras))
+
+    gerados = 0
+    agora = datetime.utcnow()
+    while mes <= ate:
+        for item, (entrada, saida) in movimentos_por_item(primeiro_dia(mes), ultimo_dia(mes)).items():
+            totais = saldos.setdefault(item, [0.0, 0.0])
+            totais[0] += entrada
+            totais[1] += saida
+
+        if saldos:
+            db.session.execute(SaldoEstoqueMensal.__table__.insert(), [
+                {
+                    'mes': mes,
+                    'item_id': item,
+                    'total_entrada': entrada,
+                    'total_saida': saida,
+                    'quantidade': entrada - saida,
+                    'data_geracao': agora,
+                }
+                for item, (entrada, saida) in saldos.items()
+            ])
+            gerados += 1
+        mes = mes_seguinte(mes)
+
+    db.session.commit()
+    return gerados
+
+
+def aplicar_delta_saldo(conexao, item_id, entrada, saida):
+    """Soma entrada/saída no saldo do item, criando a linha se ainda não existir"""
+    aplicar_deltas_saldo(conexao, {item_id: (entrada, saida)})
+
+
+def aplicar_deltas_saldo(conexao, deltas):
+    """
+    Soma {item_id: (entrada, saida)} nos saldos, criando as linhas que faltarem
+    (um único upsert para todos os itens, ver upsert_somando)
+    """
+    agora = datetime.utcnow()
+    upsert_somando(conexao, SaldoEstoque.__table__, ('item_id',), [
+        {
+            'item_id': item_id,
+            'total_entrada': entrada,
+            'total_saida': saida,
+            'quantidade': entrada - saida,
+            'data_atualizacao': agora,
+        }
+        for item_id, (entrada, saida) in sorted(deltas.items())
+        if item_id and (entrada or saida)
+    ])
+
+
+def reconstruir_saldos_estoque():
+    """
+    Recalcula todos os saldos a partir dos itens de entrada e saída
+    (backfill ou correção). Roda em uma única transação.
+    """
+    totais = {}
+    for modelo, campo in ((ItemEntradaEstoque, 'total_entrada'), (ItemSaidaEstoque, 'total_saida')):
+        consulta = select(
+            modelo.item_id, func.coalesce(func.sum(modelo.quantidade), 0)
+        ).where(modelo.item_id.isnot(None)).group_by(modelo.item_id)
+        for item_id, total in db.session.execute(consulta):
+            totais.setdefault(item_id, {'total_entrada': 0.0, 'total_saida': 0.0})[campo] = float(total)
+
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            'item_id': item_id,
+            'total_entrada': valores['total_entrada'],
+            'total_saida': valores['total_saida'],
+            'quantidade': valores['total_entrada'] - valores['total_saida'],
+            'data_atualizacao': agora,
+        }
+        for item_id, valores in totais.items()
+    ]
+
+    db.session.execute(SaldoEstoque.__table__.delete())
+    if linhas:
+        db.session.execute(SaldoEstoque.__table__.insert(), linhas)
+    conexao = db.session.connection()
+    for item_id in totais:
+        recalcular_custos_item(conexao, item_id)
+    db.session.commit()
+
+    return len(linhas)
+
+
+# Manutenção incremental dos saldos e do custeio.
+# Os eventos rodam na mesma transação do flush; inserções/exclusões em massa
+# (insert()/query.delete) não os disparam e precisam aplicar o delta por
+# conta própria (ou usar reconstruir_saldos_estoque).
+# Movimentos novos em ordem de data são custeados na hora; os retroativos,
+# alterados ou excluídos marcam o item para recálculo ao fim do flush.
+CAMPOS_SALDO = ('item_id', 'quantidade')
+CHAVE_RECALCULO_CUSTO = 'itens_recalcular_custo'
+
+# Modelo -> sinal no saldo (entradas somam, saídas subtraem)
+MOVIMENTOS_ESTOQUE = {ItemEntradaEstoque: 1, ItemSaidaEstoque: -1}
+
+
+def _aplicar_movimento(conexao, modelo, item_id, quantidade):
+    """Aplica uma linha de movimento (quantidade com sinal: +1 soma, -1 desfaz)"""
+    if MOVIMENTOS_ESTOQUE[modelo] > 0:
+        aplicar_delta_saldo(conexao, item_id, quantidade, 0)
+    else:
+        aplicar_delta_saldo(conexao, item_id, 0, quantidade)
+
+
+def _valores_anteriores(linha):
+    item_id, quantidade = valores_anteriores(linha, CAMPOS_SALDO)
+    return item_id, quantidade or 0
+
+
+def _data_movimento(conexao, modelo, linha):
+    """Data do documento (entrada/saída) da linha, lida na conexão do flush"""
+    cabecalho, chave, _ = LINHAS_ESTOQUE[modelo]
+    documento_id = getattr(linha, chave)
+    if not documento_id:
+        return None
+    coluna = getattr(cabecalho, CABECALHOS_ESTOQUE[cabecalho])
+    return conexao.execute(select(coluna).where(cabecalho.id == documento_id)).scalar()
+
+
+def registrar_linhas_inseridas(conexao, modelo, documento_id, ids_existentes=()):
+    """
+    Manutenção das linhas do documento inseridas em lote (insert() com
+    executemany não dispara os eventos do modelo): aplica os deltas de saldo
+    em um upsert, custeia as linhas em lote e invalida os fechamentos a partir
+    da data do documento. 'ids_existentes' são as linhas que já existiam
+    antes da inserção e devem ser ignoradas.
+    """
+    cabecalho, chave, _ = LINHAS_ESTOQUE[modelo]
+    tabela = modelo.__table__
+    preco = tabela.c.preco_unitario if 'preco_unitario' in tabela.c else literal(None)
+    consulta = select(tabela.c.id, tabela.c.item_id, tabela.c.quantidade, preco).where(
+        tabela.c[chave] == documento_id, tabela.c.item_id.isnot(None)
+    )
+    if ids_existentes:
+        consulta = consulta.where(tabela.c.id.notin_(list(ids_existentes)))
+    linhas = conexao.execute(consulta.order_by(tabela.c.id)).all()
+    if not linhas:
+        return
+
+    data = _como_data(conexao.execute(
+        select(getattr(cabecalho, CABECALHOS_ESTOQUE[cabecalho])).where(cabecalho.id == documento_id)
+    ).scalar())
+    saida = MOVIMENTOS_ESTOQUE[modelo] < 0
+
+    estados = ler_estados(conexao, {linha.item_id for linha in linhas})
+    deltas = {}
+    for linha in linhas:
+        entrada_item, saida_item = deltas.get(linha.item_id, (0, 0))
+        if saida:
+            saida_item += linha.quantidade or 0
+        else:
+            entrada_item += linha.quantidade or 0
+        deltas[linha.item_id] = (entrada_item, saida_item)
+    aplicar_deltas_saldo(conexao, deltas)
+
+    _, fora_de_ordem = custear_lote(conexao, [tuple(linha) for linha in linhas], data, saida, estados)
+    for item_id in sorted(fora_de_ordem):
+        recalcular_custos_item(conexao, item_id)
+
+    invalidar_fechamentos(conexao, data)
+
+
+def _marcar_recalculo(linha, *itens):
+    """Agenda o recálculo de custo dos itens para o fim do flush"""
+    session = object_session(linha)
+    session.info.setdefault(CHAVE_RECALCULO_CUSTO, set()).update(item for item in itens if item)
+
+
+def _apos_inserir(mapper, conexao, linha):
+    estado = ler_estados(conexao, [linha.item_id]).get(linha.item_id) if linha.item_id else None
+    _aplicar_movimento(conexao, mapper.class_, linha.item_id, linha.quantidade or 0)
+
+    data = _data_movimento(conexao, mapper.class_, linha)
+    if linha.item_id and data:
+        saida = MOVIMENTOS_ESTOQUE[mapper.class_] < 0
+        if not custear_insercao(conexao, linha, _como_data(data), saida, estado):
+            _marcar_recalculo(linha, linha.item_id)
+
+
+def _apos_atualizar(mapper, conexao, linha):
+    item_anterior, quantidade_anterior = _valores_anteriores(linha)
+    # Qualquer alteração (item, quantidade, preço, documento) muda o custeio
+    if object_session(linha).is_modified(linha, include_collections=False):
+        _marcar_recalculo(linha, item_anterior, linha.item_id)
+    if (item_anterior, quantidade_anterior) == (linha.item_id, linha.quantidade or 0):
+        return
+    _aplicar_movimento(conexao, mapper.class_, item_anterior, -quantidade_anterior)
+    _aplicar_movimento(conexao, mapper.class_, linha.item_id, linha.quantidade or 0)
+
+
+def _apos_excluir(mapper, conexao, linha):
+    item_anterior, quantidade_anterior = _valores_anteriores(linha)
+    _aplicar_movimento(conexao, mapper.class_, item_anterior, -quantidade_anterior)
+    _marcar_recalculo(linha, item_anterior)
+
+
+for _modelo in MOVIMENTOS_ESTOQUE:
+    manter_valores_anteriores(*(getattr(_modelo, campo) for campo in CAMPOS_SALDO))
+    event.listen(_modelo, 'after_insert', _apos_inserir)
+    event.listen(_modelo, 'after_update', _apos_atualizar)
+    event.listen(_modelo, 'after_delete', _apos_excluir)
+
+
+# Invalidação dos fechamentos mensais.
+# Movimento novo, alterado ou excluído com data em um mês já fechado torna
+# aquele fechamento e os seguintes incorretos: eles são apagados na mesma
+# transação e as consultas passam a partir do fechamento anterior até que
+# `flask gerar-fechamentos-estoque` os gere de novo.
+CABECALHOS_ESTOQUE = {EntradaEstoque: 'data_entrada', SaidaEstoque: 'data_saida'}
+LINHAS_ESTOQUE = {
+    ItemEntradaEstoque: (EntradaEstoque, 'entrada_estoque_id', 'entrada_estoque'),
+    ItemSaidaEstoque: (SaidaEstoque, 'saida_estoque_id', 'saida_estoque'),
+}
+
+
+def invalidar_fechamentos(conexao, data):
+    """Apaga os fechamentos do mês da data em diante"""
+    conexao.execute(SaldoEstoqueMensal.__table__.delete().where(SaldoEstoqueMensal.mes >= mes_de(data)))
+
+
+def _como_data(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _valores_historico(objeto, campo):
+    historico = attributes.get_history(objeto, campo)
+    return list(historico.added) + list(historico.unchanged) + list(historico.deleted)
+
+
+def _datas_movimentadas(session):
+    datas = set()
+    for conjunto in (session.new, session.dirty, session.deleted):
+        for objeto in conjunto:
+            if conjunto is session.dirty and not session.is_modified(objeto):
+                continue
+
+            if isinstance(objeto, tuple(CABECALHOS_ESTOQUE)):
+                datas.update(_valores_historico(objeto, CABECALHOS_ESTOQUE[type(objeto)]))
+
+            elif isinstance(objeto, tuple(LINHAS_ESTOQUE)):
+                modelo, chave, relacao = LINHAS_ESTOQUE[type(objeto)]
+                cabecalhos = [session.get(modelo, valor) for valor in _valores_historico(objeto, chave) if valor]
+                cabecalhos.append(getattr(objeto, relacao))
+                datas.update(
+                    getattr(cabecalho, CABECALHOS_ESTOQUE[modelo]) for cabecalho in cabecalhos if cabecalho
+                )
+    return {_como_data(dia) for dia in datas if dia}
+
+
+manter_valores_anteriores(*(getattr(modelo, campo) for modelo, campo in CABECALHOS_ESTOQUE.items()))
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidar_fechamentos(session, contexto_flush, instancias):
+    with session.no_autoflush:
+        datas = _datas_movimentadas(session)
+
+    if datas:
+        invalidar_fechamentos(session.connection(), min(datas))
+
+
+@event.listens_for(Session, 'after_flush')
+def _recalcular_custos(session, contexto_flush):
+    itens = session.info.pop(CHAVE_RECALCULO_CUSTO, set())
+
+    # Documento que mudou de data: todos os itens dele mudam de posição na ordem de custeio
+    for objeto in session.dirty:
+        if isinstance(objeto, tuple(CABECALHOS_ESTOQUE)) and attributes.get_history(objeto, CABECALHOS_ESTOQUE[type(objeto)]).deleted:
+            linha_modelo, chave = (
+                (ItemEntradaEstoque, ItemEntradaEstoque.entrada_estoque_id) if isinstance(objeto, EntradaEstoque)
+                else (ItemSaidaEstoque, ItemSaidaEstoque.saida_estoque_id)
+            )
+            itens.update(
+                item_id for (item_id,) in session.connection().execute(
+                    select(linha_modelo.item_id).where(chave == objeto.id).distinct()
+                ) if item_id
+            )
+
+    for item_id in sorted(itens):
+        recalcular_custos_item(session.connection(), item_id)
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+from src.models.paciente import db
+from src.models.eventos import upsert_somando, manter_valores_anteriores
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.models.agendamento_sessao import AgendamentoSessao
+
+
+class VersaoSemanaAgenda(db.Model):
+    """
+    Versão de cada semana do calendário (semana = segunda-feira).
+    Incrementada na mesma transação de qualquer escrita em agendamentos da
+    semana; o cache do calendário compara essa versão para saber, em todos os
+    processos, se a semana guardada ainda vale.
+    """
+    __tablename__ = 'versoes_semana_agenda'
+
+    semana = db.Column(db.Date, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<VersaoSemanaAgenda {self.semana} v{self.versao}>'
+
+
+MODELOS_AGENDA = (AgendamentoCirurgico, AgendamentoSessao)
+
+
+def inicio_semana(dia):
+    """Segunda-feira da semana do dia"""
+    if isinstance(dia, datetime):
+        dia = dia.date()
+    return dia - timedelta(days=dia.weekday())
+
+
+def incrementar_versoes(conexao, semanas):
+    """Incrementa a versão das semanas (criando as linhas que faltarem)"""
+    agora = datetime.utcnow()
+    upsert_somando(conexao, VersaoSemanaAgenda.__table__, ('semana',), [
+        {'semana': semana, 'versao': 1, 'data_atualizacao': agora}
+        for semana in sorted(semanas)
+    ])
+
+
+def _semanas_afetadas(agendamento):
+    """Semanas da data atual e da anterior (quando o agendamento mudou de data)"""
+    semanas = set()
+    historico = attributes.get_history(agendamento, 'data_agendamento')
+    for dia in list(historico.added) + list(historico.unchanged) + list(historico.deleted):
+        if isinstance(dia, date):
+            semanas.add(inicio_semana(dia))
+    return semanas
+
+
+# A data anterior precisa estar no histórico mesmo se o atributo estava expirado
+manter_valores_anteriores(*(modelo.data_agendamento for modelo in MODELOS_AGENDA))
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidar_semanas(session, contexto_flush):
+    semanas = set()
+    for conjunto in (session.new, session.dirty, session.deleted):
+        for objeto in conjunto:
+            if isinstance(objeto, MODELOS_AGENDA) and (conjunto is not session.dirty or session.is_modified(objeto)):
+                semanas |= _semanas_afetadas(objeto)
+
+    if semanas:
+        incrementar_versoes(session.connection(), semanas)
@@ -0,0 +1,90 @@
+from sqlalchemy import insert
+from src.models.paciente import db
+from src.models.itens import Item
+from src.models.saldo_estoque import registrar_linhas_inseridas
+
+
+def linhas_do_payload(itens, com_preco=False):
+    """
+    Normaliza as linhas enviadas: {'id', 'item_id', 'quantidade'[, 'preco_unitario']}.
+    Linhas sem item_id ou sem quantidade são ignoradas, como sempre foram.
+    """
+    linhas = []
+    for item in itens:
+        item_id = item.get("item_id")
+        quantidade = item.get("quantidade")
+        if not item_id or not quantidade:
+            continue
+
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            pass  # não existe no cadastro: itens_inexistentes devolve 400
+
+        linha = {"id": item.get("id"), "item_id": item_id, "quantidade": quantidade}
+        if com_preco:
+            linha["preco_unitario"] = item.get("valor_unitario", 0)
+        linhas.append(linha)
+    return linhas
+
+
+def itens_inexistentes(linhas):
+    """Ids de item das linhas que não existem no cadastro (uma única consulta IN)"""
+    ids = {linha["item_id"] for linha in linhas}
+    numericos = {item_id for item_id in ids if isinstance(item_id, int)}
+    existentes = set()
+    if numericos:
+        existentes = {item_id for item_id, in db.session.query(Item.id).filter(Item.id.in_(numericos))}
+    return sorted(ids - existentes, key=str)
+
+
+def inserir_linhas(modelo, chave, documento_id, linhas, ids_existentes=()):
+    """
+    Insere as linhas do documento num único executemany e faz a manutenção de
+    saldo, custo e fechamentos em lote (o insert em lote não passa pelos
+    eventos do modelo). 'ids_existentes' são as linhas que o documento mantém
+    (não as removidas: o banco pode reaproveitar o id de uma linha apagada).
+    """
+    if not linhas:
+        return
+
+    db.session.flush()
+    db.session.execute(insert(modelo.__table__), [
+        {chave: documento_id, **{campo: valor for campo, valor in linha.items() if campo != "id"}}
+        for linha in linhas
+    ])
+    registrar_linhas_inseridas(db.session.connection(), modelo, documento_id, ids_existentes)
+
+
+def aplicar_diferenca(existentes, linhas, campos):
+    """
+    Compara as linhas atuais do documento com as enviadas e altera só o que mudou.
+    Uma linha enviada casa com a existente pelo 'id' ou, sem id, pela primeira
+    ainda livre com o mesmo item_id. Alteradas e removidas passam pelo ORM (os
+    eventos ajustam saldo e custo). Retorna (linhas novas, a inserir em lote,
+    ids das linhas mantidas).
+    """
+    por_id = {linha.id: linha for linha in existentes}
+    livres = list(existentes)
+    pares = []
+    novas = []
+
+    for linha in linhas:
+        atual = por_id.get(linha["id"]) if linha["id"] else None
+        if atual is None and not linha["id"]:
+            atual = next((candidata for candidata in livres if candidata.item_id == linha["item_id"]), None)
+        if atual is None or atual not in livres:
+            novas.append(linha)
+            continue
+        livres.remove(atual)
+        pares.append((atual, linha))
+
+    for atual in livres:
+        db.session.delete(atual)
+
+    for atual, linha in pares:
+        for campo in campos:
+            if getattr(atual, campo) != linha[campo]:
+                setattr(atual, campo, linha[campo])
+
+    return novas, [atual.id for atual, _ in pares]
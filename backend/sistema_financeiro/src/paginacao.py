@@ -0,0 +1,137 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from sqlalchemy import and_, or_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+
+class ParametroInvalido(ValueError):
+    """Erro de validação dos parâmetros de paginação ou filtro"""
+
+
+def obter_limite(args, padrao=LIMITE_PADRAO, maximo=LIMITE_MAXIMO):
+    """Lê o parâmetro 'limite' da query string, respeitando o máximo permitido"""
+    valor = args.get('limite')
+    if valor is None or valor == '':
+        return padrao
+
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ParametroInvalido("Parâmetro 'limite' deve ser um número inteiro")
+
+    if limite <= 0:
+        raise ParametroInvalido("Parâmetro 'limite' deve ser maior que zero")
+
+    return min(limite, maximo)
+
+
+def obter_data(args, nome):
+    """Lê um parâmetro de data (YYYY-MM-DD) da query string"""
+    valor = args.get(nome)
+    if not valor:
+        return None
+
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' inválido. Use ISO 8601 (YYYY-MM-DD)")
+
+
+def obter_inteiro(args, nome):
+    """Lê um parâmetro inteiro (ex.: ids) da query string"""
+    valor = args.get(nome)
+    if valor is None or valor == '':
+        return None
+
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' deve ser um número inteiro")
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _converter_valor(valor, coluna):
+    if valor is None:
+        return None
+
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    if tipo is time:
+        return time.fromisoformat(valor)
+    return tipo(valor)
+
+
+def codificar_cursor(valores):
+    """Gera um cursor opaco a partir dos valores da chave de ordenação"""
+    bruto = json.dumps([_serializar_valor(valor) for valor in valores])
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor, colunas):
+    """Converte um cursor de volta para os valores tipados da chave de ordenação"""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            raise ValueError
+        return [_converter_valor(valor, coluna) for valor, coluna in zip(valores, colunas)]
+    except (ValueError, TypeError, binascii.Error):
+        raise ParametroInvalido("Cursor inválido")
+
+
+def filtro_keyset(colunas, valores, descendente=False):
+    """
+    Monta a condição (c1, c2, ...) > (v1, v2, ...) expandida em OR/AND,
+    forma que o MySQL consegue resolver com um range scan no índice composto
+    """
+    condicoes = []
+    for posicao, coluna in enumerate(colunas):
+        anteriores = [c == v for c, v in zip(colunas[:posicao], valores[:posicao])]
+        comparacao = coluna < valores[posicao] if descendente else coluna > valores[posicao]
+        condicoes.append(and_(*anteriores, comparacao))
+    return or_(*condicoes)
+
+
+def paginar_keyset(query, colunas, args, descendente=False, padrao=LIMITE_PADRAO, maximo=LIMITE_MAXIMO):
+    """
+    Aplica cursor, ordenação e limite a uma query.
+    As colunas devem formar uma chave única (a última normalmente é o id).
+    Retorna (itens, proximo_cursor); proximo_cursor é None na última página.
+    """
+    limite = obter_limite(args, padrao, maximo)
+
+    cursor = args.get('cursor')
+    if cursor:
+        valores = decodificar_cursor(cursor, colunas)
+        query = query.filter(filtro_keyset(colunas, valores, descendente))
+
+    ordenacao = [coluna.desc() if descendente else coluna.asc() for coluna in colunas]
+    # Busca um registro a mais para saber se existe próxima página
+    itens = query.order_by(*ordenacao).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        proximo_cursor = codificar_cursor([getattr(ultimo, coluna.key) for coluna in colunas])
+
+    return itens, proximo_cursor
+
+
+def paginacao_solicitada(args):
+    """Indica se o cliente pediu resposta paginada (mantém compatibilidade com a listagem completa)"""
+    return 'limite' in args or 'cursor' in args
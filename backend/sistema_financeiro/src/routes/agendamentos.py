@@ -1,16 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from datetime import date
-from src.models.agendamento_cirurgico import AgendamentoCirurgico
-from src.models.agendamento_sessao import AgendamentoSessao
+from datetime import date, datetime, time, timedelta
 from src.models.paciente import Paciente
 from src.models.procedimento import Procedimento
 from src.models.local_atendimento import LocalAtendimento
 from src.models.equipe import Equipe
 from src.models.categoria_procedimento import CategoriaProcedimento
 from src.models.pacote_tratamento import PacoteTratamento
-from sqlalchemy.orm import joinedload
+from src.models.tipo_tratamento import TipoTratamento
 from src.models.paciente import db
+from src.calendario import eventos_periodo
+from src.conflitos import listar_conflitos, slots_livres
+from src.paginacao import ParametroInvalido, obter_data, obter_inteiro
 
 agendamentos_geral_bp = Blueprint('agendamentos_geral', __name__)
 
@@ -29,63 +30,114 @@ def listar_agendamentos_por_periodo():
     except ValueError:
         return jsonify({"msg": "Formato de data inválido. Use ISO 8601 (YYYY-MM-DD)"}), 400
 
-    # 🔍 Busca Agendamentos Cirúrgicos
-    agendamentos_cirurgicos = AgendamentoCirurgico.query.filter(
-        AgendamentoCirurgico.data_agendamento >= start_date,
-        AgendamentoCirurgico.data_agendamento <= end_date
-    ).options(
-        joinedload(AgendamentoCirurgico.paciente),
-        joinedload(AgendamentoCirurgico.procedimento),
-        joinedload(AgendamentoCirurgico.equipe),
-        joinedload(AgendamentoCirurgico.local_atendimento)
-    ).all()
-
-    # 🔍 Busca Agendamentos de Sessão
-    agendamentos_sessoes = AgendamentoSessao.query.filter(
-        AgendamentoSessao.data_agendamento >= start_date,
-        AgendamentoSessao.data_agendamento <= end_date
-    ).options(
-        joinedload(AgendamentoSessao.paciente),
-        joinedload(AgendamentoSessao.local_atendimento),
-        joinedload(AgendamentoSessao.pacote_tratamento)
-    ).all()
-
-    eventos = []
-
-    # 🔧 Mapeia Cirurgias para o calendário
-    for ag in agendamentos_cirurgicos:
-        eventos.append({
-            "id": f"cirurgia-{ag.id}",
-            "title": f"Cirurgia: {ag.paciente.nome} - {ag.procedimento.nome}",
-            "start": f"{ag.data_agendamento.isoformat()}T{ag.horario_inicio.isoformat()}",
-            "end": f"{ag.data_agendamento.isoformat()}T{ag.horario_fim.isoformat()}" if ag.horario_fim else None,
-            "tipo": "cirurgia",
-            "extendedProps": {
-                "paciente": ag.paciente.nome,
-                "procedimento": ag.procedimento.nome,
-                "equipe": ag.equipe.nome,
-                "local": ag.local_atendimento.nome,
-                "valor": ag.valor_geral_venda,
-                "status_pagamento": "Pago" if ag.valor_pago >= ag.valor_geral_venda else "Parcial" if ag.valor_pago > 0 else "Pendente",
-                "status_cirurgia": ag.status_cirurgia
-            }
-        })
-
-    # 🔧 Mapeia Sessões para o calendário
-    for ag in agendamentos_sessoes:
-        eventos.append({
-            "id": f"sessao-{ag.id}",
-            "title": f"Sessão {ag.numero_sessao}: {ag.paciente.nome} - {ag.pacote_tratamento.descricao}",
-            "start": f"{ag.data_agendamento.isoformat()}T{ag.horario_inicio.isoformat()}",
-            "end": f"{ag.data_agendamento.isoformat()}T{ag.horario_fim.isoformat()}" if ag.horario_fim else None,
-            "tipo": "sessao",
-            "extendedProps": {
-                "paciente": ag.paciente.nome,
-                "pacote": ag.pacote_tratamento.descricao,
-                "local": ag.local_atendimento.nome,
-                "numero_sessao": ag.numero_sessao,
-                "status_sessao": ag.status_sessao
-            }
-        })
+    if end_date < start_date:
+        return jsonify({"msg": "'end' deve ser maior ou igual a 'start'"}), 400
+
+    # Eventos por semana, reaproveitando as semanas em cache que não mudaram
+    eventos = eventos_periodo(start_date, end_date)
 
     return jsonify(eventos), 200
+
+@agendamentos_geral_bp.route("/conflitos", methods=["GET"])
+@jwt_required()
+def listar_conflitos_periodo():
+    """Lista os agendamentos sobrepostos no mesmo local ou equipe entre 'start' e 'end'"""
+    start_date_str = request.args.get('start')
+    end_date_str = request.args.get('end')
+
+    if not start_date_str or not end_date_str:
+        return jsonify({"msg": "Parâmetros 'start' e 'end' são obrigatórios"}), 400
+
+    try:
+        start_date = date.fromisoformat(start_date_str)
+        end_date = date.fromisoformat(end_date_str)
+    except ValueError:
+        return jsonify({"msg": "Formato de data inválido. Use ISO 8601 (YYYY-MM-DD)"}), 400
+
+    if end_date < start_date:
+        return jsonify({"msg": "'end' deve ser maior ou igual a 'start'"}), 400
+
+    return jsonify(listar_conflitos(start_date, end_date)), 200
+
+# Janela máxima de busca de horários livres
+LIMITE_DIAS_SLOTS = 92
+EXPEDIENTE_PADRAO = (time(8, 0), time(18, 0))
+
+def _obter_horario(nome, padrao):
+    valor = request.args.get(nome)
+    if not valor:
+        return padrao
+    try:
+        return datetime.strptime(valor, '%H:%M').time()
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' inválido. Use HH:MM")
+
+@agendamentos_geral_bp.route("/slots-livres", methods=["GET"])
+@jwt_required()
+def listar_slots_livres():
+    """
+    Horários livres no local (e opcionalmente na equipe) entre 'start' e 'end'.
+    A duração vem de 'duracao' (minutos) ou, na falta dela, da duração de sessão
+    do tipo de tratamento ('tipo_tratamento_id' ou 'pacote_tratamento_id').
+    """
+    try:
+        start_date = obter_data(request.args, 'start')
+        end_date = obter_data(request.args, 'end')
+        local_atendimento_id = obter_inteiro(request.args, 'local_atendimento_id')
+        equipe_id = obter_inteiro(request.args, 'equipe_id')
+        duracao = obter_inteiro(request.args, 'duracao')
+        passo = obter_inteiro(request.args, 'passo')
+        tipo_tratamento_id = obter_inteiro(request.args, 'tipo_tratamento_id')
+        pacote_tratamento_id = obter_inteiro(request.args, 'pacote_tratamento_id')
+        expediente_inicio = _obter_horario('expediente_inicio', EXPEDIENTE_PADRAO[0])
+        expediente_fim = _obter_horario('expediente_fim', EXPEDIENTE_PADRAO[1])
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    if not start_date or not end_date or not local_atendimento_id:
+        return jsonify({"msg": "Parâmetros 'start', 'end' e 'local_atendimento_id' são obrigatórios"}), 400
+
+    if end_date < start_date:
+        return jsonify({"msg": "'end' deve ser maior ou igual a 'start'"}), 400
+
+    if (end_date - start_date).days >= LIMITE_DIAS_SLOTS:
+        return jsonify({"msg": f"O período deve ter no máximo {LIMITE_DIAS_SLOTS} dias"}), 400
+
+    if expediente_fim <= expediente_inicio:
+        return jsonify({"msg": "'expediente_fim' deve ser posterior a 'expediente_inicio'"}), 400
+
+    if not LocalAtendimento.query.get(local_atendimento_id):
+        return jsonify({"msg": "Local de atendimento não encontrado"}), 404
+
+    if equipe_id and not Equipe.query.get(equipe_id):
+        return jsonify({"msg": "Equipe não encontrada"}), 404
+
+    if duracao is None:
+        if pacote_tratamento_id:
+            pacote = PacoteTratamento.query.get(pacote_tratamento_id)
+            if not pacote:
+                return jsonify({"msg": "Pacote de tratamento não encontrado"}), 404
+            tipo_tratamento = pacote.tipo_tratamento
+        elif tipo_tratamento_id:
+            tipo_tratamento = TipoTratamento.query.get(tipo_tratamento_id)
+            if not tipo_tratamento:
+                return jsonify({"msg": "Tipo de tratamento não encontrado"}), 404
+        else:
+            tipo_tratamento = None
+        duracao = tipo_tratamento.duracao_sessao_minutos if tipo_tratamento else None
+
+    if not duracao or duracao <= 0:
+        return jsonify({"msg": "Informe 'duracao' (minutos) ou um tipo de tratamento com duração de sessão"}), 400
+
+    if passo is not None and passo <= 0:
+        return jsonify({"msg": "Parâmetro 'passo' deve ser maior que zero"}), 400
+
+    slots = slots_livres(
+        start_date, end_date, local_atendimento_id, timedelta(minutes=duracao),
+        equipe_id=equipe_id,
+        expediente_inicio=expediente_inicio,
+        expediente_fim=expediente_fim,
+        passo=timedelta(minutes=passo) if passo else None
+    )
+
+    return jsonify({"duracao_minutos": duracao, "slots": slots}), 200
@@ -9,20 +9,83 @@ from src.models.equipe import Equipe
 from src.models.local_atendimento import LocalAtendimento
 from src.models.categoria_procedimento import CategoriaProcedimento
 from src.models.refeicao import Refeicao
+from src.streaming import formato_streaming, resposta_streaming
+from src.paginacao import ParametroInvalido, paginar_keyset, paginacao_solicitada, obter_data, obter_inteiro
+from src.conflitos import bloquear_recursos, verificar_conflitos
+from sqlalchemy.orm import joinedload
 from datetime import datetime, time
 
 agendamentos_cirurgicos_bp = Blueprint('agendamentos_cirurgicos', __name__)
 
+def _com_relacionamentos(query):
+    """
+    Carrega as seis relações usadas por to_dict na mesma consulta (joins
+    externos: todas são muitos-para-um, então não multiplicam linhas). O
+    número de consultas não cresce com a quantidade de agendamentos listados;
+    selectinload faria uma consulta extra por relação a cada 500 linhas.
+    """
+    return query.options(
+        joinedload(AgendamentoCirurgico.paciente),
+        joinedload(AgendamentoCirurgico.procedimento),
+        joinedload(AgendamentoCirurgico.equipe),
+        joinedload(AgendamentoCirurgico.local_atendimento),
+        joinedload(AgendamentoCirurgico.categoria),
+        joinedload(AgendamentoCirurgico.almoco_escolhido)
+    )
+
+def _filtrar_agendamentos_cirurgicos(args):
+    """Monta a query de agendamentos cirúrgicos aplicando os filtros da query string"""
+    query = AgendamentoCirurgico.query
+
+    status = args.get('status_cirurgia')
+    if status:
+        query = query.filter(AgendamentoCirurgico.status_cirurgia == status)
+
+    for campo in ('equipe_id', 'local_atendimento_id', 'paciente_id'):
+        valor = obter_inteiro(args, campo)
+        if valor is not None:
+            query = query.filter(getattr(AgendamentoCirurgico, campo) == valor)
+
+    data_inicio = obter_data(args, 'data_inicio')
+    if data_inicio:
+        query = query.filter(AgendamentoCirurgico.data_agendamento >= data_inicio)
+
+    data_fim = obter_data(args, 'data_fim')
+    if data_fim:
+        query = query.filter(AgendamentoCirurgico.data_agendamento <= data_fim)
+
+    return query
+
 @agendamentos_cirurgicos_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_agendamentos_cirurgicos():
-    """Endpoint para listar todos os agendamentos cirúrgicos"""
-    agendamentos = AgendamentoCirurgico.query.all()
-    
-    resultado = []
-    for agendamento in agendamentos:
-        resultado.append(agendamento.to_dict())
-    
+    """
+    Endpoint para listar os agendamentos cirúrgicos.
+    Filtros: status_cirurgia, equipe_id, local_atendimento_id, paciente_id,
+    data_inicio e data_fim (YYYY-MM-DD). Ordenados por data, horário e id.
+    Com 'limite' e/ou 'cursor' a resposta é paginada por cursor e retorna
+    {"itens": [...], "proximo_cursor": ...}; sem eles retorna a lista completa.
+    Com ?formato=csv ou Accept: application/x-ndjson a lista é transmitida em streaming.
+    """
+    colunas = [AgendamentoCirurgico.data_agendamento, AgendamentoCirurgico.horario_inicio, AgendamentoCirurgico.id]
+    formato = formato_streaming(request)
+
+    try:
+        query = _com_relacionamentos(_filtrar_agendamentos_cirurgicos(request.args))
+        if formato:
+            return resposta_streaming(query.order_by(*colunas), AgendamentoCirurgico.to_dict, formato, 'agendamentos_cirurgicos')
+        if paginacao_solicitada(request.args):
+            agendamentos, proximo_cursor = paginar_keyset(query, colunas, request.args)
+        else:
+            agendamentos = query.order_by(*colunas).all()
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    resultado = [agendamento.to_dict() for agendamento in agendamentos]
+
+    if paginacao_solicitada(request.args):
+        return jsonify({"itens": resultado, "proximo_cursor": proximo_cursor}), 200
+
     return jsonify(resultado), 200
 
 @agendamentos_cirurgicos_bp.route('/<int:id>', methods=['GET'])
@@ -45,7 +108,7 @@ def listar_agendamentos_por_paciente(paciente_id):
     if not paciente:
         return jsonify({"msg": "Paciente não encontrado"}), 404
     
-    agendamentos = AgendamentoCirurgico.query.filter_by(paciente_id=paciente_id).all()
+    agendamentos = _com_relacionamentos(AgendamentoCirurgico.query.filter_by(paciente_id=paciente_id)).all()
     
     resultado = []
     for agendamento in agendamentos:
@@ -171,6 +234,13 @@ def criar_agendamento_cirurgico():
     if not valido:
         return jsonify({"msg": mensagem}), 400
     
+    # Verifica conflitos de local e equipe no horário
+    bloquear_recursos(local_atendimento_id, equipe_id)
+    conflitos = verificar_conflitos('cirurgia', novo_agendamento)
+    if conflitos:
+        db.session.rollback()
+        return jsonify({"msg": "Conflito de horário com outro agendamento no mesmo local ou equipe", "conflitos": conflitos}), 409
+    
     db.session.add(novo_agendamento)
     db.session.commit()
     
@@ -309,6 +379,13 @@ def atualizar_agendamento_cirurgico(id):
     if not valido:
         return jsonify({"msg": mensagem}), 400
     
+    # Verifica conflitos de local e equipe no horário
+    bloquear_recursos(agendamento.local_atendimento_id, agendamento.equipe_id)
+    conflitos = verificar_conflitos('cirurgia', agendamento)
+    if conflitos:
+        db.session.rollback()
+        return jsonify({"msg": "Conflito de horário com outro agendamento no mesmo local ou equipe", "conflitos": conflitos}), 409
+    
     db.session.commit()
     
     return jsonify({
@@ -4,22 +4,127 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.agendamento_sessao import AgendamentoSessao, db
 from src.models.paciente import Paciente
-from src.models.pacote_tratamento import PacoteTratamento
+from src.models.pacote_tratamento import PacoteTratamento, aplicar_delta_contadores
 from src.models.local_atendimento import LocalAtendimento
-from datetime import datetime, time
+from src.streaming import formato_streaming, resposta_streaming
+from src.paginacao import ParametroInvalido, paginar_keyset, paginacao_solicitada, obter_data, obter_inteiro
+from src.conflitos import bloquear_recursos, verificar_conflitos, conflitos_lote, intervalo
+from src.models.versao_semana_agenda import incrementar_versoes, inicio_semana
+from sqlalchemy import insert, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from datetime import datetime, time, timedelta
 
 agendamentos_sessao_bp = Blueprint('agendamentos_sessao', __name__)
 
+def _reservar_sessoes(pacote_id, quantidade):
+    """
+    Reserva sessões do pacote com um UPDATE condicional
+    (realizadas + quantidade <= contratadas). A checagem e o incremento são
+    atômicos no banco e a linha do pacote fica travada até o commit, então
+    requisições simultâneas não ultrapassam o total contratado.
+    Retorna False se não houver sessões suficientes.
+    """
+    realizadas = func.coalesce(PacoteTratamento.numero_sessoes_realizadas, 0)
+    resultado = db.session.execute(
+        update(PacoteTratamento)
+        .where(PacoteTratamento.id == pacote_id, realizadas + quantidade <= PacoteTratamento.numero_sessoes_contratadas)
+        .values(numero_sessoes_realizadas=realizadas + quantidade)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def _liberar_sessao(pacote_id):
+    """Devolve uma sessão reservada ao pacote (sem deixar o contador negativo)"""
+    db.session.execute(
+        update(PacoteTratamento)
+        .where(PacoteTratamento.id == pacote_id, PacoteTratamento.numero_sessoes_realizadas > 0)
+        .values(numero_sessoes_realizadas=PacoteTratamento.numero_sessoes_realizadas - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def _numeros_sessao_livres(pacote_id, quantidade):
+    """
+    Menores números de sessão ainda não usados no pacote (preenche lacunas
+    deixadas por exclusões). Deve ser chamado com a linha do pacote travada.
+    """
+    usados = {
+        numero for (numero,) in db.session.query(AgendamentoSessao.numero_sessao)
+        .filter(AgendamentoSessao.pacote_tratamento_id == pacote_id)
+    }
+    numeros = []
+    numero = 1
+    while len(numeros) < quantidade:
+        if numero not in usados:
+            numeros.append(numero)
+        numero += 1
+    return numeros
+
+def _com_relacionamentos(query):
+    """
+    Carrega junto (JOIN) tudo o que to_dict usa: paciente, local e pacote com
+    seu tipo de tratamento. Todas são relações muitos-para-um, então a
+    listagem inteira sai em uma única consulta, sem uma ida ao banco por sessão.
+    """
+    return query.options(
+        joinedload(AgendamentoSessao.paciente),
+        joinedload(AgendamentoSessao.local_atendimento),
+        joinedload(AgendamentoSessao.pacote_tratamento).joinedload(PacoteTratamento.tipo_tratamento)
+    )
+
+def _filtrar_agendamentos_sessao(args):
+    """Monta a query de sessões aplicando os filtros da query string"""
+    query = AgendamentoSessao.query
+
+    status = args.get('status')
+    if status:
+        query = query.filter(AgendamentoSessao.status_sessao == status)
+
+    for campo in ('paciente_id', 'local_atendimento_id', 'pacote_tratamento_id'):
+        valor = obter_inteiro(args, campo)
+        if valor is not None:
+            query = query.filter(getattr(AgendamentoSessao, campo) == valor)
+
+    data_inicio = obter_data(args, 'data_inicio')
+    if data_inicio:
+        query = query.filter(AgendamentoSessao.data_agendamento >= data_inicio)
+
+    data_fim = obter_data(args, 'data_fim')
+    if data_fim:
+        query = query.filter(AgendamentoSessao.data_agendamento <= data_fim)
+
+    return query
+
 @agendamentos_sessao_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_agendamentos_sessao():
-    """Endpoint para listar todos os agendamentos de sessão"""
-    agendamentos = AgendamentoSessao.query.all()
-    
-    resultado = []
-    for agendamento in agendamentos:
-        resultado.append(agendamento.to_dict())
-    
+    """
+    Endpoint para listar os agendamentos de sessão.
+    Filtros: status, paciente_id, local_atendimento_id, pacote_tratamento_id,
+    data_inicio e data_fim (YYYY-MM-DD). Ordenados por data, horário e id.
+    Com 'limite' e/ou 'cursor' a resposta é paginada por cursor e retorna
+    {"itens": [...], "proximo_cursor": ...}; sem eles retorna a lista completa.
+    Com ?formato=csv ou Accept: application/x-ndjson a lista é transmitida em streaming.
+    """
+    colunas = [AgendamentoSessao.data_agendamento, AgendamentoSessao.horario_inicio, AgendamentoSessao.id]
+    formato = formato_streaming(request)
+
+    try:
+        query = _com_relacionamentos(_filtrar_agendamentos_sessao(request.args))
+        if formato:
+            return resposta_streaming(query.order_by(*colunas), AgendamentoSessao.to_dict, formato, 'agendamentos_sessao')
+        if paginacao_solicitada(request.args):
+            agendamentos, proximo_cursor = paginar_keyset(query, colunas, request.args)
+        else:
+            agendamentos = query.order_by(*colunas).all()
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    resultado = [agendamento.to_dict() for agendamento in agendamentos]
+
+    if paginacao_solicitada(request.args):
+        return jsonify({"itens": resultado, "proximo_cursor": proximo_cursor}), 200
+
     return jsonify(resultado), 200
 
 @agendamentos_sessao_bp.route('/<int:id>', methods=['GET'])
@@ -42,7 +147,7 @@ def listar_agendamentos_por_paciente(paciente_id):
     if not paciente:
         return jsonify({"msg": "Paciente não encontrado"}), 404
     
-    agendamentos = AgendamentoSessao.query.filter_by(paciente_id=paciente_id).all()
+    agendamentos = _com_relacionamentos(AgendamentoSessao.query.filter_by(paciente_id=paciente_id)).all()
     
     resultado = []
     for agendamento in agendamentos:
@@ -59,7 +164,7 @@ def listar_agendamentos_por_pacote(pacote_id):
     if not pacote:
         return jsonify({"msg": "Pacote de tratamento não encontrado"}), 404
     
-    agendamentos = AgendamentoSessao.query.filter_by(pacote_tratamento_id=pacote_id).all()
+    agendamentos = _com_relacionamentos(AgendamentoSessao.query.filter_by(pacote_tratamento_id=pacote_id)).all()
     
     resultado = []
     for agendamento in agendamentos:
@@ -98,10 +203,6 @@ def criar_agendamento_sessao():
     if pacote.paciente_id != paciente_id:
         return jsonify({"msg": "Paciente do agendamento deve ser o mesmo do pacote de tratamento"}), 400
     
-    # Verifica se ainda há sessões disponíveis no pacote
-    if pacote.numero_sessoes_realizadas >= pacote.numero_sessoes_contratadas:
-        return jsonify({"msg": "Todas as sessões do pacote já foram agendadas/realizadas"}), 400
-    
     # Verifica se local de atendimento existe
     local = LocalAtendimento.query.get(local_atendimento_id)
     if not local:
@@ -119,9 +220,6 @@ def criar_agendamento_sessao():
     except ValueError:
         return jsonify({"msg": "Formato de horário inválido. Use HH:MM"}), 400
     
-    # Calcula o número da próxima sessão
-    proxima_sessao = pacote.numero_sessoes_realizadas + 1
-    
     # Processa horário de fim se fornecido
     horario_fim_obj = None
     if 'horario_fim' in request.json and request.json['horario_fim']:
@@ -130,6 +228,18 @@ def criar_agendamento_sessao():
         except ValueError:
             return jsonify({"msg": "Formato de horário de fim inválido. Use HH:MM"}), 400
     
+    # Reserva a sessão no pacote e calcula o número dela (pacote travado até o commit)
+    if not _reservar_sessoes(pacote.id, 1):
+        db.session.rollback()
+        return jsonify({"msg": "Todas as sessões do pacote já foram agendadas/realizadas"}), 400
+    db.session.expire(pacote, ['numero_sessoes_realizadas', 'numero_sessoes_contratadas'])
+    proxima_sessao = _numeros_sessao_livres(pacote.id, 1)[0]
+    # O contador pode estar defasado das sessões existentes: o número da sessão
+    # nunca passa do total contratado (lido da linha travada pela reserva)
+    if proxima_sessao > pacote.numero_sessoes_contratadas:
+        db.session.rollback()
+        return jsonify({"msg": "Todas as sessões do pacote já foram agendadas/realizadas"}), 400
+    
     # Cria novo agendamento de sessão
     novo_agendamento = AgendamentoSessao(
         paciente_id=paciente_id,
@@ -146,24 +256,177 @@ def criar_agendamento_sessao():
     # Valida regras de negócio
     valido, mensagem = novo_agendamento.validar()
     if not valido:
+        db.session.rollback()
         return jsonify({"msg": mensagem}), 400
     
-    db.session.add(novo_agendamento)
+    # Verifica conflitos de local no horário
+    bloquear_recursos(local_atendimento_id)
+    conflitos = verificar_conflitos('sessao', novo_agendamento)
+    if conflitos:
+        db.session.rollback()
+        return jsonify({"msg": "Conflito de horário com outro agendamento no mesmo local", "conflitos": conflitos}), 409
     
-    # Incrementa o número de sessões realizadas no pacote
-    pacote.numero_sessoes_realizadas += 1
+    db.session.add(novo_agendamento)
     
     # Se todas as sessões foram agendadas, pode marcar como concluído (opcional)
     # if pacote.numero_sessoes_realizadas >= pacote.numero_sessoes_contratadas:
     #     pacote.status_pacote = 'concluido'
     
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Garantia final: (pacote_tratamento_id, numero_sessao) é único
+        db.session.rollback()
+        return jsonify({"msg": "Número de sessão já utilizado neste pacote, tente novamente"}), 409
     
     return jsonify({
         "msg": "Agendamento de sessão criado com sucesso",
         "agendamento_sessao": novo_agendamento.to_dict()
     }), 201
 
+# Limite de sessões criadas por chamada em lote
+MAX_SESSOES_LOTE = 200
+
+def _datas_recorrencia(data_inicio, dias_semana, quantidade, intervalo_semanas):
+    """Próximas 'quantidade' datas a partir de data_inicio nos dias da semana (0 = segunda)"""
+    datas = []
+    semana = data_inicio - timedelta(days=data_inicio.weekday())
+    while len(datas) < quantidade:
+        for dia_semana in dias_semana:
+            data = semana + timedelta(days=dia_semana)
+            if data >= data_inicio and len(datas) < quantidade:
+                datas.append(data)
+        semana += timedelta(weeks=intervalo_semanas)
+    return datas
+
+@agendamentos_sessao_bp.route('/pacote/<int:pacote_id>/lote', methods=['POST'])
+@jwt_required()
+def criar_agendamentos_sessao_lote(pacote_id):
+    """
+    Endpoint para agendar várias sessões de um pacote por regra de recorrência
+    (ex.: toda terça às 10:00, N sessões). Valida pacote e local uma vez,
+    verifica conflitos do lote inteiro numa consulta e grava tudo numa única
+    transação (INSERT com executemany).
+    """
+    if not request.is_json:
+        return jsonify({"msg": "Requisição deve ser JSON"}), 400
+
+    local_atendimento_id = request.json.get('local_atendimento_id')
+    data_inicio = request.json.get('data_inicio')
+    horario_inicio = request.json.get('horario_inicio')
+    dias_semana = request.json.get('dias_semana')
+
+    if not all([local_atendimento_id, data_inicio, horario_inicio]) or not dias_semana:
+        return jsonify({"msg": "Campos 'local_atendimento_id', 'data_inicio', 'horario_inicio' e 'dias_semana' são obrigatórios"}), 400
+
+    if not isinstance(dias_semana, list) or not all(isinstance(dia, int) and 0 <= dia <= 6 for dia in dias_semana):
+        return jsonify({"msg": "'dias_semana' deve ser uma lista de inteiros de 0 (segunda) a 6 (domingo)"}), 400
+    dias_semana = sorted(set(dias_semana))
+
+    try:
+        data_inicial = datetime.fromisoformat(data_inicio.replace('Z', '+00:00')).date()
+    except ValueError:
+        return jsonify({"msg": "Formato de data inválido. Use ISO 8601 (YYYY-MM-DD)"}), 400
+
+    try:
+        horario = datetime.strptime(horario_inicio, '%H:%M').time()
+        horario_fim_obj = datetime.strptime(request.json['horario_fim'], '%H:%M').time() if request.json.get('horario_fim') else None
+    except ValueError:
+        return jsonify({"msg": "Formato de horário inválido. Use HH:MM"}), 400
+
+    try:
+        intervalo_semanas = int(request.json.get('intervalo_semanas', 1))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "'intervalo_semanas' deve ser um número inteiro"}), 400
+    if intervalo_semanas <= 0:
+        return jsonify({"msg": "'intervalo_semanas' deve ser maior que zero"}), 400
+
+    # Trava o pacote até o commit: numeração e saldo de sessões ficam consistentes
+    pacote = PacoteTratamento.query.filter_by(id=pacote_id).with_for_update().first()
+    if not pacote:
+        return jsonify({"msg": "Pacote de tratamento não encontrado"}), 404
+
+    local = LocalAtendimento.query.get(local_atendimento_id)
+    if not local:
+        return jsonify({"msg": "Local de atendimento não encontrado"}), 404
+
+    disponiveis = pacote.numero_sessoes_contratadas - pacote.numero_sessoes_realizadas
+    try:
+        quantidade = int(request.json.get('quantidade', disponiveis))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "'quantidade' deve ser um número inteiro"}), 400
+
+    if quantidade <= 0:
+        return jsonify({"msg": "Todas as sessões do pacote já foram agendadas/realizadas" if disponiveis <= 0 else "'quantidade' deve ser maior que zero"}), 400
+    if quantidade > disponiveis:
+        return jsonify({"msg": f"O pacote tem apenas {disponiveis} sessões disponíveis"}), 400
+    if quantidade > MAX_SESSOES_LOTE:
+        return jsonify({"msg": f"Máximo de {MAX_SESSOES_LOTE} sessões por lote"}), 400
+
+    # Sem horário de fim, usa a duração de sessão do tipo de tratamento
+    duracao = None
+    if horario_fim_obj is None and pacote.tipo_tratamento and pacote.tipo_tratamento.duracao_sessao_minutos:
+        duracao = timedelta(minutes=pacote.tipo_tratamento.duracao_sessao_minutos)
+
+    # Reserva as sessões e escolhe os números (pacote travado até o commit)
+    if not _reservar_sessoes(pacote.id, quantidade):
+        db.session.rollback()
+        return jsonify({"msg": "O pacote não tem sessões disponíveis suficientes"}), 400
+    numeros = _numeros_sessao_livres(pacote.id, quantidade)
+    if numeros[-1] > pacote.numero_sessoes_contratadas:
+        db.session.rollback()
+        return jsonify({"msg": "O pacote não tem sessões disponíveis suficientes"}), 400
+
+    datas = _datas_recorrencia(data_inicial, dias_semana, quantidade, intervalo_semanas)
+    linhas = []
+    intervalos = []
+    for numero, data in zip(numeros, datas):
+        fim = horario_fim_obj
+        if duracao is not None:
+            fim_completo = datetime.combine(data, horario) + duracao
+            fim = fim_completo.time() if fim_completo.date() == data else None
+        linhas.append({
+            'paciente_id': pacote.paciente_id,
+            'pacote_tratamento_id': pacote.id,
+            'data_agendamento': data,
+            'horario_inicio': horario,
+            'horario_fim': fim,
+            'local_atendimento_id': local.id,
+            'status_sessao': 'agendada',
+            'numero_sessao': numero,
+            'observacoes': request.json.get('observacoes'),
+        })
+        intervalos.append(intervalo('sessao', data, horario, fim))
+
+    bloquear_recursos(local.id)
+    conflitos = conflitos_lote(local.id, intervalos)
+    if conflitos:
+        db.session.rollback()
+        return jsonify({"msg": "Conflito de horário com outros agendamentos no mesmo local", "conflitos": conflitos}), 409
+
+    # Um único INSERT com executemany para todas as sessões
+    db.session.execute(insert(AgendamentoSessao), linhas)
+    # insert() em lote não dispara os eventos do modelo
+    aplicar_delta_contadores(db.session.connection(), pacote.id, 'agendada', len(linhas))
+    # O insert em lote não passa pelo flush da sessão: versiona as semanas aqui
+    incrementar_versoes(db.session.connection(), {inicio_semana(data) for data in datas})
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Número de sessão já utilizado neste pacote, tente novamente"}), 409
+
+    agendamentos = AgendamentoSessao.query.filter(
+        AgendamentoSessao.pacote_tratamento_id == pacote.id,
+        AgendamentoSessao.numero_sessao.in_(numeros)
+    ).order_by(AgendamentoSessao.numero_sessao).all()
+
+    return jsonify({
+        "msg": f"{quantidade} sessões agendadas com sucesso",
+        "agendamentos_sessao": [agendamento.to_dict() for agendamento in agendamentos]
+    }), 201
+
 @agendamentos_sessao_bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def atualizar_agendamento_sessao(id):
@@ -215,6 +478,13 @@ def atualizar_agendamento_sessao(id):
     if not valido:
         return jsonify({"msg": mensagem}), 400
     
+    # Verifica conflitos de local no horário
+    bloquear_recursos(agendamento.local_atendimento_id)
+    conflitos = verificar_conflitos('sessao', agendamento)
+    if conflitos:
+        db.session.rollback()
+        return jsonify({"msg": "Conflito de horário com outro agendamento no mesmo local", "conflitos": conflitos}), 409
+    
     db.session.commit()
     
     return jsonify({
@@ -231,10 +501,9 @@ def excluir_agendamento_sessao(id):
     if not agendamento:
         return jsonify({"msg": "Agendamento de sessão não encontrado"}), 404
     
-    # Decrementa o número de sessões realizadas no pacote
-    pacote = agendamento.pacote_tratamento
-    if pacote:
-        pacote.numero_sessoes_realizadas = max(0, pacote.numero_sessoes_realizadas - 1)
+    # Decrementa o número de sessões realizadas no pacote (no banco, sem corrida)
+    if agendamento.pacote_tratamento_id:
+        _liberar_sessao(agendamento.pacote_tratamento_id)
     
     db.session.delete(agendamento)
     db.session.commit()
@@ -252,14 +521,13 @@ def marcar_sessao_realizada(id):
     
     agendamento.status_sessao = 'realizada'
     
-    # Verifica se todas as sessões do pacote foram realizadas
+    # O flush atualiza total_sessoes_realizadas no pacote (eventos do modelo);
+    # basta reler o contador para saber se todas as sessões foram realizadas
+    db.session.flush()
     pacote = agendamento.pacote_tratamento
-    sessoes_realizadas = AgendamentoSessao.query.filter_by(
-        pacote_tratamento_id=pacote.id,
-        status_sessao='realizada'
-    ).count()
+    db.session.refresh(pacote, ['total_sessoes_realizadas'])
     
-    if sessoes_realizadas >= pacote.numero_sessoes_contratadas:
+    if pacote.total_sessoes_realizadas >= pacote.numero_sessoes_contratadas:
         pacote.status_pacote = 'concluido'
     
     db.session.commit()
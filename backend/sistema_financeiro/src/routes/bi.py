@@ -1,17 +1,71 @@
 import os
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, send_file, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import pandas as pd
 from src.models.user import User, db
-from src.bi_integration import get_lancamentos_data, get_contratos_data, get_fluxo_caixa_mensal
+from src.bi_integration import get_lancamentos_data, get_contratos_data, get_fluxo_caixa_mensal, get_metricas_pool, CONSULTAS_EXPORTACAO, iterar_csv, FORMATOS_COLUNARES, exportar_colunar, extrair_delta, MarcaForaDaRetencao
+from src.streaming import comprimir_gzip, aceita_gzip
+from src.services.relatorio_service import criar_job_relatorio, obter_job, caminho_relatorio, STATUS_CONCLUIDO
 
 bi_bp = Blueprint('bi', __name__)
 
+def _formato_solicitado():
+    """Lê ?format= (json, parquet ou arrow); devolve None para formato inválido"""
+    formato = request.args.get('format', 'json')
+    if formato == 'json' or formato in FORMATOS_COLUNARES:
+        return formato
+    return None
+
+def _resposta_delta(tipo):
+    """
+    Extração incremental (?since=<ISO 8601>): linhas alteradas, ids excluídos
+    e a próxima marca. Datas com fuso são convertidas para UTC.
+    """
+    try:
+        desde = datetime.fromisoformat(request.args['since'].replace('Z', '+00:00'))
+    except ValueError:
+        return jsonify({"msg": "Parâmetro 'since' inválido. Use ISO 8601 (YYYY-MM-DDTHH:MM:SS)"}), 400
+
+    if desde.tzinfo is not None:
+        desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+
+    if request.args.get('format', 'json') != 'json':
+        return jsonify({"msg": "A extração incremental só está disponível em JSON"}), 400
+
+    try:
+        return jsonify(extrair_delta(tipo, desde))
+    except MarcaForaDaRetencao as e:
+        return jsonify({"msg": str(e)}), 410
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
+
+def _resposta_exportacao(df, tipo, formato):
+    """Monta a resposta da exportação no formato pedido (JSON ou arquivo colunar)"""
+    if formato == 'json':
+        # Converte para formato JSON
+        result = df.to_dict(orient='records')
+        return jsonify(result)
+
+    try:
+        conteudo = exportar_colunar(df, CONSULTAS_EXPORTACAO[tipo][0](), formato)
+    except ImportError:
+        return jsonify({"msg": "Formato indisponível: instale o pacote pyarrow"}), 501
+
+    mimetype, extensao = FORMATOS_COLUNARES[formato]
+    nome_arquivo = CONSULTAS_EXPORTACAO[tipo][1]
+    return Response(
+        conteudo,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}.{extensao}'}
+    )
+
 @bi_bp.route('/export/lancamentos', methods=['GET'])
 @jwt_required()
 def export_lancamentos():
     """
     Endpoint para exportar dados de lançamentos financeiros para BI
+    Aceita ?format=json (padrão), parquet ou arrow
+    Com ?since=<data ISO> devolve só as alterações e exclusões desde a marca
     Requer autenticação JWT
     """
     current_user_id = get_jwt_identity()
@@ -19,20 +73,25 @@ def export_lancamentos():
     
     if not user:
         return jsonify({"msg": "Usuário não encontrado"}), 404
+
+    if 'since' in request.args:
+        return _resposta_delta('lancamentos')
     
     # Aqui poderia ter uma verificação adicional de permissões
     # if not user.has_permission('export_data'):
     #     return jsonify({"msg": "Sem permissão para exportar dados"}), 403
     
+    formato = _formato_solicitado()
+    if not formato:
+        return jsonify({"msg": "Formato inválido. Use json, parquet ou arrow"}), 400
+
     try:
         df = get_lancamentos_data()
         
         if df.empty:
             return jsonify({"msg": "Nenhum dado encontrado"}), 404
         
-        # Converte para formato JSON
-        result = df.to_dict(orient='records')
-        return jsonify(result)
+        return _resposta_exportacao(df, 'lancamentos', formato)
     
     except Exception as e:
         return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
@@ -42,6 +101,8 @@ def export_lancamentos():
 def export_contratos():
     """
     Endpoint para exportar dados de contratos para BI
+    Aceita ?format=json (padrão), parquet ou arrow
+    Com ?since=<data ISO> devolve só as alterações e exclusões desde a marca
     Requer autenticação JWT
     """
     current_user_id = get_jwt_identity()
@@ -49,16 +110,21 @@ def export_contratos():
     
     if not user:
         return jsonify({"msg": "Usuário não encontrado"}), 404
+
+    if 'since' in request.args:
+        return _resposta_delta('contratos')
     
+    formato = _formato_solicitado()
+    if not formato:
+        return jsonify({"msg": "Formato inválido. Use json, parquet ou arrow"}), 400
+
     try:
         df = get_contratos_data()
         
         if df.empty:
             return jsonify({"msg": "Nenhum dado encontrado"}), 404
         
-        # Converte para formato JSON
-        result = df.to_dict(orient='records')
-        return jsonify(result)
+        return _resposta_exportacao(df, 'contratos', formato)
     
     except Exception as e:
         return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
@@ -68,6 +134,7 @@ def export_contratos():
 def export_fluxo_caixa():
     """
     Endpoint para exportar dados de fluxo de caixa para BI
+    Aceita ?format=json (padrão), parquet ou arrow
     Requer autenticação JWT
     """
     current_user_id = get_jwt_identity()
@@ -79,15 +146,17 @@ def export_fluxo_caixa():
     if not user:
         return jsonify({"msg": "Usuário não encontrado"}), 404
     
+    formato = _formato_solicitado()
+    if not formato:
+        return jsonify({"msg": "Formato inválido. Use json, parquet ou arrow"}), 400
+
     try:
         df = get_fluxo_caixa_mensal()
         
         if df.empty:
             return jsonify({"msg": "Nenhum dado encontrado"}), 404
         
-        # Converte para formato JSON
-        result = df.to_dict(orient='records')
-        return jsonify(result)
+        return _resposta_exportacao(df, 'fluxo-caixa', formato)
     
     except Exception as e:
         return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
@@ -97,6 +166,8 @@ def export_fluxo_caixa():
 def export_csv(tipo):
     """
     Endpoint para exportar dados em formato CSV
+    O arquivo é gerado em streaming, lote a lote, direto na resposta
+    (comprimido com gzip quando o cliente aceita)
     Requer autenticação JWT
     """
     current_user_id = get_jwt_identity()
@@ -105,46 +176,34 @@ def export_csv(tipo):
     if not user:
         return jsonify({"msg": "Usuário não encontrado"}), 404
     
-    try:
-        if tipo == 'lancamentos':
-            df = get_lancamentos_data()
-            filename = "lancamentos_financeiros.csv"
-        elif tipo == 'contratos':
-            df = get_contratos_data()
-            filename = "contratos.csv"
-        elif tipo == 'fluxo-caixa':
-            df = get_fluxo_caixa_mensal()
-            filename = "fluxo_caixa_mensal.csv"
-        else:
-            return jsonify({"msg": "Tipo de exportação inválido"}), 400
-        
-        if df.empty:
-            return jsonify({"msg": "Nenhum dado encontrado"}), 404
-        
-        # Cria diretório de exportação se não existir
-        export_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exports')
-        os.makedirs(export_dir, exist_ok=True)
-        
-        # Salva o arquivo CSV
-        filepath = os.path.join(export_dir, filename)
-        df.to_csv(filepath, index=False)
-        
-        # Em um ambiente real, retornaria o arquivo para download
-        # Aqui apenas retornamos o caminho do arquivo
-        return jsonify({
-            "msg": "Arquivo CSV gerado com sucesso",
-            "filepath": filepath,
-            "rows": len(df)
-        })
-    
-    except Exception as e:
-        return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
+    if tipo not in CONSULTAS_EXPORTACAO:
+        return jsonify({"msg": "Tipo de exportação inválido"}), 400
 
-@bi_bp.route('/export/excel', methods=['GET'])
+    consulta, nome_arquivo = CONSULTAS_EXPORTACAO[tipo]
+    partes = iterar_csv(consulta())
+    headers = {
+        'Content-Disposition': f'attachment; filename={nome_arquivo}.csv',
+        'Vary': 'Accept-Encoding',
+    }
+
+    if aceita_gzip(request):
+        partes = comprimir_gzip(partes)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(partes), mimetype='text/csv', headers=headers)
+
+def _job_para_resposta(job):
+    resposta = dict(job)
+    if job['status'] == STATUS_CONCLUIDO:
+        resposta['download_url'] = url_for('bi.download_excel', job_id=job['id'])
+    return resposta
+
+@bi_bp.route('/export/excel', methods=['POST'])
 @jwt_required()
 def export_excel():
     """
-    Endpoint para exportar todos os dados em formato Excel
+    Endpoint que agenda a geração do relatório Excel (todas as abas)
+    A geração roda em segundo plano; acompanhe pelo status do job
     Requer autenticação JWT
     """
     current_user_id = get_jwt_identity()
@@ -154,41 +213,52 @@ def export_excel():
         return jsonify({"msg": "Usuário não encontrado"}), 404
     
     try:
-        # Obtém todos os dados
-        lancamentos_df = get_lancamentos_data()
-        contratos_df = get_contratos_data()
-        fluxo_caixa_df = get_fluxo_caixa_mensal()
-        
-        if lancamentos_df.empty and contratos_df.empty and fluxo_caixa_df.empty:
-            return jsonify({"msg": "Nenhum dado encontrado"}), 404
-        
-        # Cria diretório de exportação se não existir
-        export_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exports')
-        os.makedirs(export_dir, exist_ok=True)
-        
-        # Salva o arquivo Excel
-        filename = "relatorio_financeiro.xlsx"
-        filepath = os.path.join(export_dir, filename)
-        
-        with pd.ExcelWriter(filepath) as writer:
-            if not lancamentos_df.empty:
-                lancamentos_df.to_excel(writer, sheet_name="Lançamentos", index=False)
-            if not contratos_df.empty:
-                contratos_df.to_excel(writer, sheet_name="Contratos", index=False)
-            if not fluxo_caixa_df.empty:
-                fluxo_caixa_df.to_excel(writer, sheet_name="Fluxo de Caixa", index=False)
-        
-        # Em um ambiente real, retornaria o arquivo para download
-        # Aqui apenas retornamos o caminho do arquivo
-        return jsonify({
-            "msg": "Arquivo Excel gerado com sucesso",
-            "filepath": filepath,
-            "sheets": {
-                "lancamentos": 0 if lancamentos_df.empty else len(lancamentos_df),
-                "contratos": 0 if contratos_df.empty else len(contratos_df),
-                "fluxo_caixa": 0 if fluxo_caixa_df.empty else len(fluxo_caixa_df)
-            }
-        })
-    
+        job = criar_job_relatorio(current_app._get_current_object())
     except Exception as e:
-        return jsonify({"msg": f"Erro ao exportar dados: {str(e)}"}), 500
+        return jsonify({"msg": f"Erro ao agendar exportação: {str(e)}"}), 500
+
+    status_code = 200 if job['status'] == STATUS_CONCLUIDO else 202
+    return jsonify(_job_para_resposta(job)), status_code
+
+@bi_bp.route('/export/excel/<string:job_id>', methods=['GET'])
+@jwt_required()
+def status_excel(job_id):
+    """
+    Endpoint com o status de um job de relatório Excel
+    Requer autenticação JWT
+    """
+    job = obter_job(job_id)
+    if not job:
+        return jsonify({"msg": "Job não encontrado"}), 404
+
+    return jsonify(_job_para_resposta(job)), 200
+
+@bi_bp.route('/export/excel/<string:job_id>/download', methods=['GET'])
+@jwt_required()
+def download_excel(job_id):
+    """
+    Endpoint para baixar o relatório Excel de um job concluído
+    Requer autenticação JWT
+    """
+    job = obter_job(job_id)
+    if not job:
+        return jsonify({"msg": "Job não encontrado"}), 404
+
+    if job['status'] != STATUS_CONCLUIDO:
+        return jsonify({"msg": "Relatório ainda não está pronto", "status": job['status']}), 409
+
+    caminho = caminho_relatorio(job['versao'])
+    if not os.path.exists(caminho):
+        return jsonify({"msg": "Relatório expirado, solicite uma nova exportação"}), 410
+
+    return send_file(caminho, as_attachment=True, download_name="relatorio_financeiro.xlsx")
+
+@bi_bp.route('/metricas/pool', methods=['GET'])
+@jwt_required()
+def metricas_pool():
+    """
+    Endpoint com as métricas do pool de conexões usado pelo BI
+    (checkouts, esperas por conexão e ocupação atual)
+    Requer autenticação JWT
+    """
+    return jsonify(get_metricas_pool()), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.categoria_procedimento import CategoriaProcedimento, db
+from src.models.categoria_procedimento import CategoriaProcedimento, db, ESQUEMA_CATEGORIA_PROCEDIMENTO, CAMPOS_CATEGORIA_PROCEDIMENTO
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 categorias_procedimento_bp = Blueprint("categorias_procedimento", __name__)
@@ -9,18 +10,14 @@ categorias_procedimento_bp = Blueprint("categorias_procedimento", __name__)
 @jwt_required()
 def listar_categorias_procedimento():
     """Endpoint para listar todas as categorias de procedimento"""
-    categorias = CategoriaProcedimento.query.all()
-    
-    resultado = []
-    for categoria in categorias:
-        resultado.append({
-            "id": categoria.id,
-            "nome": categoria.nome,
-            "descricao": categoria.descricao,
-            "data_cadastro": categoria.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_CATEGORIA_PROCEDIMENTO.selecionar(request.args, CAMPOS_CATEGORIA_PROCEDIMENTO)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    categorias = ESQUEMA_CATEGORIA_PROCEDIMENTO.preparar(CategoriaProcedimento.query, campos).all()
+    
+    return jsonify(ESQUEMA_CATEGORIA_PROCEDIMENTO.serializar_lista(categorias, campos)), 200
 
 @categorias_procedimento_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -31,12 +28,7 @@ def obter_categoria_procedimento(id):
     if not categoria:
         return jsonify({"msg": "Categoria de procedimento não encontrada"}), 404
     
-    return jsonify({
-        "id": categoria.id,
-        "nome": categoria.nome,
-        "descricao": categoria.descricao,
-        "data_cadastro": categoria.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_CATEGORIA_PROCEDIMENTO.serializar(categoria, CAMPOS_CATEGORIA_PROCEDIMENTO)), 200
 
 @categorias_procedimento_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -63,12 +55,7 @@ def criar_categoria_procedimento():
     db.session.add(nova_categoria)
     db.session.commit()
     
-    return jsonify({
-        "id": nova_categoria.id,
-        "nome": nova_categoria.nome,
-        "descricao": nova_categoria.descricao,
-        "data_cadastro": nova_categoria.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_CATEGORIA_PROCEDIMENTO.serializar(nova_categoria, CAMPOS_CATEGORIA_PROCEDIMENTO)), 201
 
 @categorias_procedimento_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -95,12 +82,7 @@ def atualizar_categoria_procedimento(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": categoria.id,
-        "nome": categoria.nome,
-        "descricao": categoria.descricao,
-        "data_cadastro": categoria.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_CATEGORIA_PROCEDIMENTO.serializar(categoria, CAMPOS_CATEGORIA_PROCEDIMENTO)), 200
 
 @categorias_procedimento_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
@@ -1,36 +1,93 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from datetime import datetime
+from sqlalchemy.orm import selectinload
 from src.models.paciente import db
 from src.models.entrada_estoque import EntradaEstoque
 from src.models.item_entrada_estoque import ItemEntradaEstoque
 from src.models.itens import Item
+from src.paginacao import ParametroInvalido, paginar_keyset, paginacao_solicitada, obter_data, obter_inteiro
+from src.movimentos_estoque import linhas_do_payload, itens_inexistentes, inserir_linhas, aplicar_diferenca
 
 entradas_estoque_bp = Blueprint("entradas_estoque", __name__)
 
+def _com_relacionamentos(query):
+    """
+    Fornecedor e linhas (com o item de cada uma) carregados com selectinload:
+    uma consulta IN (...) por relação para a página inteira, então o número de
+    consultas não cresce com a quantidade de entradas ou de linhas.
+    """
+    return query.options(
+        selectinload(EntradaEstoque.fornecedor),
+        selectinload(EntradaEstoque.itens).joinedload(ItemEntradaEstoque.item)
+    )
+
+def _filtrar_entradas_estoque(args):
+    """Monta a query de entradas aplicando os filtros da query string"""
+    query = EntradaEstoque.query
+
+    fornecedor_id = obter_inteiro(args, "fornecedor_id")
+    if fornecedor_id is not None:
+        query = query.filter(EntradaEstoque.fornecedor_id == fornecedor_id)
+
+    item_id = obter_inteiro(args, "item_id")
+    if item_id is not None:
+        query = query.filter(EntradaEstoque.itens.any(ItemEntradaEstoque.item_id == item_id))
+
+    data_inicio = obter_data(args, "data_inicio")
+    if data_inicio:
+        query = query.filter(EntradaEstoque.data_entrada >= data_inicio)
+
+    data_fim = obter_data(args, "data_fim")
+    if data_fim:
+        query = query.filter(EntradaEstoque.data_entrada <= data_fim)
+
+    return query
+
+def _entrada_dict(entrada):
+    return {
+        "id": entrada.id,
+        "fornecedor_id": entrada.fornecedor_id,
+        "fornecedor": entrada.fornecedor.nome if entrada.fornecedor else None,
+        "data_entrada": entrada.data_entrada.isoformat(),
+        "observacoes": entrada.observacoes,
+        "itens": [
+            {
+                "id": item.id,
+                "item_id": item.item_id,
+                "nome_item": item.item.nome if item.item else None,
+                "quantidade": item.quantidade,
+                "preco_unitario": item.preco_unitario
+            } for item in entrada.itens
+        ]
+    }
+
 @entradas_estoque_bp.route("/", methods=["GET"])
 @jwt_required()
 def listar_entradas_estoque():
-    entradas = EntradaEstoque.query.all()
-    resultado = []
-
-    for entrada in entradas:
-        resultado.append({
-            "id": entrada.id,
-            "fornecedor_id": entrada.fornecedor_id,
-            "fornecedor": entrada.fornecedor.nome,
-            "data_entrada": entrada.data_entrada.isoformat(),
-            "observacoes": entrada.observacoes,
-            "itens": [
-                {
-                    "id": item.id,
-                    "item_id": item.item_id,
-                    "nome_item": item.item.nome,
-                    "quantidade": item.quantidade,
-                    "preco_unitario": item.preco_unitario
-                } for item in entrada.itens
-            ]
-        })
+    """
+    Lista as entradas de estoque ordenadas por data e id.
+    Filtros: fornecedor_id, item_id (entradas com alguma linha do item),
+    data_inicio e data_fim (YYYY-MM-DD).
+    Com 'limite' e/ou 'cursor' a resposta é paginada por cursor e retorna
+    {"itens": [...], "proximo_cursor": ...}; sem eles retorna a lista completa.
+    """
+    colunas = [EntradaEstoque.data_entrada, EntradaEstoque.id]
+
+    try:
+        query = _com_relacionamentos(_filtrar_entradas_estoque(request.args))
+        if paginacao_solicitada(request.args):
+            entradas, proximo_cursor = paginar_keyset(query, colunas, request.args)
+        else:
+            entradas = query.order_by(*colunas).all()
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    resultado = [_entrada_dict(entrada) for entrada in entradas]
+
+    if paginacao_solicitada(request.args):
+        return jsonify({"itens": resultado, "proximo_cursor": proximo_cursor}), 200
+
     return jsonify(resultado), 200
 
 @entradas_estoque_bp.route("/", methods=["POST"])
@@ -49,6 +106,11 @@ def criar_entrada_estoque():
     if not fornecedor_id or not data_entrada or not itens:
         return jsonify({"msg": "Campos obrigatórios: fornecedor, data_entrada, itens"}), 400
     
+    linhas = linhas_do_payload(itens, com_preco=True)
+    inexistentes = itens_inexistentes(linhas)
+    if inexistentes:
+        return jsonify({"msg": "Itens não encontrados", "itens": inexistentes}), 400
+
     nova_entrada = EntradaEstoque(
         fornecedor_id=fornecedor_id,
         observacoes=observacoes,
@@ -57,22 +119,7 @@ def criar_entrada_estoque():
     db.session.add(nova_entrada)
     db.session.flush()  # para obter ID
 
-    for item in itens:
-        item_id = item.get("item_id")
-        quantidade = item.get("quantidade")
-        preco_unitario = item.get("valor_unitario", 0)
-
-        if not item_id or not quantidade:
-            continue
-
-        entrada_item = ItemEntradaEstoque(
-            entrada_estoque_id=nova_entrada.id,
-            item_id=item_id,
-            quantidade=quantidade,
-            preco_unitario=preco_unitario
-        )
-        db.session.add(entrada_item)
-
+    inserir_linhas(ItemEntradaEstoque, "entrada_estoque_id", nova_entrada.id, linhas)
     db.session.commit()
 
     return jsonify({"msg": "Entrada de estoque registrada com sucesso", "id": nova_entrada.id}), 201
@@ -127,31 +174,23 @@ def atualizar_entrada_estoque(id):
     if not fornecedor_id or not data_entrada or not itens:
         return jsonify({"msg": "Campos obrigatórios: fornecedor_id, data_entrada, itens"}), 400
 
-    # Atualiza dados da entrada
-    entrada.fornecedor_id = fornecedor_id
-    entrada.observacoes = observacoes
-    entrada.data_entrada = datetime.strptime(data_entrada, "%Y-%m-%d")
-
-    # Remove os itens antigos
-    ItemEntradaEstoque.query.filter_by(entrada_estoque_id=entrada.id).delete()
-
-    # Adiciona os itens novos
-    for item in itens:
-        item_id = item.get("item_id")
-        quantidade = item.get("quantidade")
-        preco_unitario = item.get("valor_unitario", 0)
-
-        if not item_id or not quantidade:
-            continue
-
-        novo_item = ItemEntradaEstoque(
-            entrada_estoque_id=entrada.id,
-            item_id=item_id,
-            quantidade=quantidade,
-            preco_unitario=preco_unitario
-        )
-        db.session.add(novo_item)
-
+    linhas = linhas_do_payload(itens, com_preco=True)
+    inexistentes = itens_inexistentes(linhas)
+    if inexistentes:
+        return jsonify({"msg": "Itens não encontrados", "itens": inexistentes}), 400
+
+    # Atualiza dados da entrada (só o que mudou, para não invalidar custos à toa)
+    data_entrada = datetime.strptime(data_entrada, "%Y-%m-%d").date()
+    if entrada.fornecedor_id != fornecedor_id:
+        entrada.fornecedor_id = fornecedor_id
+    if entrada.observacoes != observacoes:
+        entrada.observacoes = observacoes
+    if entrada.data_entrada != data_entrada:
+        entrada.data_entrada = data_entrada
+
+    # Altera/remove só as linhas que mudaram e insere as novas em lote
+    novas, mantidas = aplicar_diferenca(list(entrada.itens), linhas, ("item_id", "quantidade", "preco_unitario"))
+    inserir_linhas(ItemEntradaEstoque, "entrada_estoque_id", entrada.id, novas, ids_existentes=mantidas)
     db.session.commit()
 
     return jsonify({"msg": "Entrada de estoque atualizada com sucesso"}), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.equipe import Equipe, db
+from src.models.equipe import Equipe, db, ESQUEMA_EQUIPE, CAMPOS_EQUIPE
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 equipes_bp = Blueprint("equipes", __name__)
@@ -9,18 +10,14 @@ equipes_bp = Blueprint("equipes", __name__)
 @jwt_required()
 def listar_equipes():
     """Endpoint para listar todas as equipes"""
-    equipes = Equipe.query.all()
-    
-    resultado = []
-    for equipe in equipes:
-        resultado.append({
-            "id": equipe.id,
-            "nome": equipe.nome,
-            "descricao": equipe.descricao,
-            "data_cadastro": equipe.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_EQUIPE.selecionar(request.args, CAMPOS_EQUIPE)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    equipes = ESQUEMA_EQUIPE.preparar(Equipe.query, campos).all()
+    
+    return jsonify(ESQUEMA_EQUIPE.serializar_lista(equipes, campos)), 200
 
 @equipes_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -31,12 +28,7 @@ def obter_equipe(id):
     if not equipe:
         return jsonify({"msg": "Equipe não encontrada"}), 404
     
-    return jsonify({
-        "id": equipe.id,
-        "nome": equipe.nome,
-        "descricao": equipe.descricao,
-        "data_cadastro": equipe.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_EQUIPE.serializar(equipe, CAMPOS_EQUIPE)), 200
 
 @equipes_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -63,12 +55,7 @@ def criar_equipe():
     db.session.add(nova_equipe)
     db.session.commit()
     
-    return jsonify({
-        "id": nova_equipe.id,
-        "nome": nova_equipe.nome,
-        "descricao": nova_equipe.descricao,
-        "data_cadastro": nova_equipe.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_EQUIPE.serializar(nova_equipe, CAMPOS_EQUIPE)), 201
 
 @equipes_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -95,12 +82,7 @@ def atualizar_equipe(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": equipe.id,
-        "nome": equipe.nome,
-        "descricao": equipe.descricao,
-        "data_cadastro": equipe.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_EQUIPE.serializar(equipe, CAMPOS_EQUIPE)), 200
 
 @equipes_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
@@ -1,48 +1,156 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
+from datetime import date
+from sqlalchemy import func
 from src.models.paciente import db
 from src.models.itens import Item
-from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.saldo_estoque import SaldoEstoque
+from src.models.saida_estoque import SaidaEstoque
 from src.models.item_saida_estoque import ItemSaidaEstoque
-from sqlalchemy import func
+from src.models.agendamento import Agendamento
+from src.estoque_historico import saldos_em, movimentos_item
+from src.paginacao import ParametroInvalido, obter_data
 
 estoque_bp = Blueprint("estoque", __name__)
 
 @estoque_bp.route("/", methods=["GET"])
 @jwt_required()
 def obter_estoque_atual():
-    # Soma das entradas por item
-    entradas = db.session.query(
-        ItemEntradaEstoque.item_id,
-        func.coalesce(func.sum(ItemEntradaEstoque.quantidade), 0).label("total_entrada")
-    ).group_by(ItemEntradaEstoque.item_id).all()
-
-    # Soma das saídas por item
-    saidas = db.session.query(
-        ItemSaidaEstoque.item_id,
-        func.coalesce(func.sum(ItemSaidaEstoque.quantidade), 0).label("total_saida")
-    ).group_by(ItemSaidaEstoque.item_id).all()
-
-    # Transformar em dicionários para acesso rápido
-    entradas_dict = {item_id: total for item_id, total in entradas}
-    saidas_dict = {item_id: total for item_id, total in saidas}
-
-    # Pegar todos os itens e calcular saldo
-    itens = Item.query.all()
-    resultado = []
+    """
+    Saldo de cada item. Sem parâmetros lê os saldos mantidos em saldos_estoque;
+    com ?em=YYYY-MM-DD calcula o saldo ao fim daquele dia a partir do
+    fechamento mensal anterior mais os movimentos seguintes.
+    """
+    try:
+        em = obter_data(request.args, "em")
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
 
-    for item in itens:
-        total_entrada = entradas_dict.get(item.id, 0)
-        total_saida = saidas_dict.get(item.id, 0)
-        saldo = total_entrada - total_saida
+    if em:
+        # A valorização só existe para o saldo atual
+        saldos = saldos_em(em)
+        linhas = [
+            (item, saldos.get(item.id, [0, 0]), None, None)
+            for item in Item.query.order_by(Item.id)
+        ]
+    else:
+        # Saldos mantidos em saldos_estoque: uma única leitura (junção pela chave primária)
+        linhas = [
+            (item, [saldo.total_entrada, saldo.total_saida], saldo.valor_total, saldo.custo_medio)
+            if saldo else (item, [0, 0], 0, None)
+            for item, saldo in db.session.query(Item, SaldoEstoque).outerjoin(
+                SaldoEstoque, SaldoEstoque.item_id == Item.id
+            ).order_by(Item.id)
+        ]
 
+    resultado = []
+    for item, (total_entrada, total_saida), valor_total, custo_medio in linhas:
         resultado.append({
             "item_id": item.id,
             "nome": item.nome,
             "descricao": item.descricao,
-            "quantidade_atual": saldo,
+            "quantidade_atual": total_entrada - total_saida,
             "total_entrada": total_entrada,
-            "total_saida": total_saida
+            "total_saida": total_saida,
+            "valor_total": valor_total,
+            "custo_medio": custo_medio
         })
     
     return jsonify(resultado), 200
+
+@estoque_bp.route("/item/<int:item_id>/movimentos", methods=["GET"])
+@jwt_required()
+def obter_movimentos_item(item_id):
+    """
+    Extrato do item com saldo acumulado.
+    Parâmetros: inicio e fim (YYYY-MM-DD); padrão: do primeiro dia do mês de
+    'fim' até 'fim' (hoje, se omitido).
+    """
+    item = Item.query.get(item_id)
+    if not item:
+        return jsonify({"msg": "Item não encontrado"}), 404
+
+    try:
+        fim = obter_data(request.args, "fim") or date.today()
+        inicio = obter_data(request.args, "inicio") or fim.replace(day=1)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    if inicio > fim:
+        return jsonify({"msg": "'inicio' deve ser anterior ou igual a 'fim'"}), 400
+
+    extrato = movimentos_item(item.id, inicio, fim)
+    extrato["nome"] = item.nome
+    return jsonify(extrato), 200
+
+@estoque_bp.route("/custos/agendamentos", methods=["GET"])
+@jwt_required()
+def listar_custos_por_agendamento():
+    """
+    Custo de materiais consumidos por agendamento (soma do custo das saídas),
+    com o valor de venda e a margem. Filtros: inicio e fim (data da saída).
+    """
+    try:
+        inicio = obter_data(request.args, "inicio")
+        fim = obter_data(request.args, "fim")
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = db.session.query(
+        SaidaEstoque.agendamento_id,
+        func.coalesce(func.sum(ItemSaidaEstoque.custo_total), 0),
+        func.count(ItemSaidaEstoque.id)
+    ).join(ItemSaidaEstoque, ItemSaidaEstoque.saida_estoque_id == SaidaEstoque.id).filter(
+        SaidaEstoque.agendamento_id.isnot(None)
+    )
+    if inicio:
+        query = query.filter(SaidaEstoque.data_saida >= inicio)
+    if fim:
+        query = query.filter(SaidaEstoque.data_saida <= fim)
+    custos = query.group_by(SaidaEstoque.agendamento_id).all()
+
+    vendas = dict(db.session.query(Agendamento.id, Agendamento.valor_geral_venda).filter(
+        Agendamento.id.in_([agendamento_id for agendamento_id, _, _ in custos])
+    ).all()) if custos else {}
+
+    resultado = []
+    for agendamento_id, custo, linhas in custos:
+        venda = vendas.get(agendamento_id)
+        resultado.append({
+            "agendamento_id": agendamento_id,
+            "custo_materiais": float(custo),
+            "itens_consumidos": linhas,
+            "valor_geral_venda": venda,
+            "margem": venda - float(custo) if venda is not None else None
+        })
+
+    return jsonify(resultado), 200
+
+@estoque_bp.route("/custos/agendamento/<int:agendamento_id>", methods=["GET"])
+@jwt_required()
+def obter_custo_agendamento(agendamento_id):
+    """Materiais consumidos por um agendamento, com o custo de cada saída"""
+    linhas = db.session.query(ItemSaidaEstoque, SaidaEstoque.data_saida, Item.nome).join(
+        SaidaEstoque, SaidaEstoque.id == ItemSaidaEstoque.saida_estoque_id
+    ).outerjoin(Item, Item.id == ItemSaidaEstoque.item_id).filter(
+        SaidaEstoque.agendamento_id == agendamento_id
+    ).order_by(SaidaEstoque.data_saida, ItemSaidaEstoque.id).all()
+
+    itens = [
+        {
+            "id": linha.id,
+            "item_id": linha.item_id,
+            "nome_item": nome,
+            "data_saida": data_saida.isoformat(),
+            "quantidade": linha.quantidade,
+            "custo_unitario": linha.custo_unitario,
+            "custo_total": linha.custo_total
+        }
+        for linha, data_saida, nome in linhas
+    ]
+
+    return jsonify({
+        "agendamento_id": agendamento_id,
+        "custo_materiais": sum(item["custo_total"] or 0 for item in itens),
+        "itens": itens
+    }), 200
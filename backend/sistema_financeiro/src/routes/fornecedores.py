@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.fornecedor import Fornecedor, db
+from src.models.fornecedor import Fornecedor, db, ESQUEMA_FORNECEDOR, CAMPOS_FORNECEDOR
+from src.paginacao import ParametroInvalido
+from src.streaming import formato_streaming, resposta_streaming
 from datetime import datetime
 
 fornecedores_bp = Blueprint('fornecedores', __name__)
@@ -9,22 +11,22 @@ fornecedores_bp = Blueprint('fornecedores', __name__)
 @jwt_required()
 def listar_fornecedores():
     """Endpoint para listar todos os fornecedores"""
-    fornecedores = Fornecedor.query.all()
-    
-    resultado = []
-    for fornecedor in fornecedores:
-        resultado.append({
-            "id": fornecedor.id,
-            "nome": fornecedor.nome,
-            "cpf_cnpj": fornecedor.cpf_cnpj,
-            "identificador": fornecedor.identificador,
-            "telefone": fornecedor.telefone,
-            "email": fornecedor.email,
-            "endereco": fornecedor.endereco,
-            "data_cadastro": fornecedor.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_FORNECEDOR.selecionar(request.args, CAMPOS_FORNECEDOR)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = ESQUEMA_FORNECEDOR.preparar(Fornecedor.query, campos)
+
+    formato = formato_streaming(request)
+    if formato:
+        return resposta_streaming(
+            query.order_by(Fornecedor.id), ESQUEMA_FORNECEDOR.compilar(campos), formato, 'fornecedores'
+        )
+
+    fornecedores = query.all()
+    
+    return jsonify(ESQUEMA_FORNECEDOR.serializar_lista(fornecedores, campos)), 200
 
 @fornecedores_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
@@ -35,16 +37,7 @@ def obter_fornecedor(id):
     if not fornecedor:
         return jsonify({"msg": "Fornecedor não encontrado"}), 404
     
-    return jsonify({
-        "id": fornecedor.id,
-        "nome": fornecedor.nome,
-        "cpf_cnpj": fornecedor.cpf_cnpj,
-        "identificador": fornecedor.identificador,
-        "telefone": fornecedor.telefone,
-        "email": fornecedor.email,
-        "endereco": fornecedor.endereco,
-        "data_cadastro": fornecedor.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_FORNECEDOR.serializar(fornecedor, CAMPOS_FORNECEDOR)), 200
 
 @fornecedores_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -88,16 +81,7 @@ def criar_fornecedor():
     
     return jsonify({
         "msg": "Fornecedor criado com sucesso",
-        "fornecedor": {
-            "id": novo_fornecedor.id,
-            "nome": novo_fornecedor.nome,
-            "cpf_cnpj": novo_fornecedor.cpf_cnpj,
-            "identificador": novo_fornecedor.identificador,
-            "telefone": novo_fornecedor.telefone,
-            "email": novo_fornecedor.email,
-            "endereco": novo_fornecedor.endereco,
-            "data_cadastro": novo_fornecedor.data_cadastro.isoformat()
-        }
+        "fornecedor": ESQUEMA_FORNECEDOR.serializar(novo_fornecedor, CAMPOS_FORNECEDOR)
     }), 201
 
 @fornecedores_bp.route('/<int:id>', methods=['PUT'])
@@ -136,16 +120,7 @@ def atualizar_fornecedor(id):
     
     return jsonify({
         "msg": "Fornecedor atualizado com sucesso",
-        "fornecedor": {
-            "id": fornecedor.id,
-            "nome": fornecedor.nome,
-            "cpf_cnpj": fornecedor.cpf_cnpj,
-            "identificador": fornecedor.identificador,
-            "telefone": fornecedor.telefone,
-            "email": fornecedor.email,
-            "endereco": fornecedor.endereco,
-            "data_cadastro": fornecedor.data_cadastro.isoformat()
-        }
+        "fornecedor": ESQUEMA_FORNECEDOR.serializar(fornecedor, CAMPOS_FORNECEDOR)
     }), 200
 
 @fornecedores_bp.route('/<int:id>', methods=['DELETE'])
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.itens import Item, db
+from src.models.itens import Item, db, ESQUEMA_ITEM, CAMPOS_ITEM
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 itens_bp = Blueprint("itens", __name__)
@@ -9,19 +10,14 @@ itens_bp = Blueprint("itens", __name__)
 @jwt_required()
 def listar_itens():
     """Endpoint para listar todos os itens"""
-    itens = Item.query.all()
-    
-    resultado = []
-    for item in itens:
-        resultado.append({
-            "id": item.id,
-            "nome": item.nome,
-            "descricao": item.descricao,
-            "quantidade_estoque": item.quantidade_estoque,
-            "data_cadastro": item.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_ITEM.selecionar(request.args, CAMPOS_ITEM)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    itens = ESQUEMA_ITEM.preparar(Item.query, campos).all()
+    
+    return jsonify(ESQUEMA_ITEM.serializar_lista(itens, campos)), 200
 
 @itens_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -32,13 +28,7 @@ def obter_item(id):
     if not item:
         return jsonify({"msg": "Item não encontrado"}), 404
     
-    return jsonify({
-        "id": item.id,
-        "nome": item.nome,
-        "descricao": item.descricao,
-        "quantidade_estoque": item.quantidade_estoque,
-        "data_cadastro": item.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_ITEM.serializar(item, CAMPOS_ITEM)), 200
 
 @itens_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -67,13 +57,7 @@ def criar_item():
     db.session.add(novo_item)
     db.session.commit()
     
-    return jsonify({
-        "id": novo_item.id,
-        "nome": novo_item.nome,
-        "descricao": novo_item.descricao,
-        "quantidade_estoque": novo_item.quantidade_estoque,
-        "data_cadastro": novo_item.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_ITEM.serializar(novo_item, CAMPOS_ITEM)), 201
 
 @itens_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -103,13 +87,7 @@ def atualizar_item(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": item.id,
-        "nome": item.nome,
-        "descricao": item.descricao,
-        "quantidade_estoque": item.quantidade_estoque,
-        "data_cadastro": item.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_ITEM.serializar(item, CAMPOS_ITEM)), 200
 
 @itens_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
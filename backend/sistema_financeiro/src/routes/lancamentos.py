@@ -1,77 +1,214 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.lancamento_financeiro import LancamentoFinanceiro, db
+from src.models.lancamento_financeiro import (
+    LancamentoFinanceiro, db, ESQUEMA_LANCAMENTO, CAMPOS_LANCAMENTO_LISTAGEM, CAMPOS_LANCAMENTO_GRAVACAO,
+    CAMPOS_LANCAMENTO_POR_CONTRATO, CAMPOS_LANCAMENTO_POR_FORNECEDOR
+)
 from src.models.contrato import Contrato
 from src.models.fornecedor import Fornecedor
 from src.models.natureza_orcamentaria import Natureza
-from datetime import datetime
+from src.models.paciente import Paciente
+from src.models.pacote_tratamento import PacoteTratamento
+from src.streaming import formato_streaming, resposta_streaming
+from src.paginacao import ParametroInvalido, paginar_keyset, paginacao_solicitada, obter_data, obter_inteiro
+from sqlalchemy import func, case, or_
+from datetime import datetime, date, timedelta
 
 lancamentos_bp = Blueprint('lancamentos', __name__)
 
+# Colunas aceitas em ?ordenar_por=; o id sempre desempata a chave do cursor
+ORDENACOES_LANCAMENTO = {
+    'data_vencimento': LancamentoFinanceiro.data_vencimento,
+    'valor': LancamentoFinanceiro.valor,
+}
+
+def _filtrar_lancamentos(args):
+    """Monta a query de lançamentos aplicando os filtros da query string"""
+    query = LancamentoFinanceiro.query
+
+    tipo = args.get('tipo')
+    if tipo:
+        query = query.filter(LancamentoFinanceiro.tipo == tipo)
+
+    status = args.get('status')
+    if status:
+        query = query.filter(LancamentoFinanceiro.status == status)
+
+    for campo in ('natureza_id', 'fornecedor_id', 'contrato_id', 'pacote_tratamento_id'):
+        valor = obter_inteiro(args, campo)
+        if valor is not None:
+            query = query.filter(getattr(LancamentoFinanceiro, campo) == valor)
+
+    vencimento_inicio = obter_data(args, 'vencimento_inicio')
+    if vencimento_inicio:
+        query = query.filter(LancamentoFinanceiro.data_vencimento >= vencimento_inicio)
+
+    vencimento_fim = obter_data(args, 'vencimento_fim')
+    if vencimento_fim:
+        query = query.filter(LancamentoFinanceiro.data_vencimento <= vencimento_fim)
+
+    busca = args.get('busca')
+    if busca:
+        termo = f"%{busca}%"
+        query = query.filter(or_(
+            LancamentoFinanceiro.numero_nota_fiscal.ilike(termo),
+            LancamentoFinanceiro.observacoes.ilike(termo),
+            LancamentoFinanceiro.fornecedor.has(Fornecedor.nome.ilike(termo)),
+            LancamentoFinanceiro.contrato.has(Contrato.identificador_contrato.ilike(termo)),
+            LancamentoFinanceiro.contrato.has(Contrato.paciente.has(Paciente.nome.ilike(termo))),
+            LancamentoFinanceiro.pacote_tratamento.has(PacoteTratamento.paciente.has(Paciente.nome.ilike(termo)))
+        ))
+
+    return query
+
 @lancamentos_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_lancamentos():
-    """Endpoint para listar todos os lançamentos financeiros"""
-    lancamentos = LancamentoFinanceiro.query.all()
-    
-    resultado = []
-    for lancamento in lancamentos:
-        resultado.append({
-            "id": lancamento.id,
-            "tipo": lancamento.tipo,
-            "contrato_id": lancamento.contrato_id,
-            "contrato_identificador": lancamento.contrato.identificador_contrato if lancamento.contrato else None,
-            "paciente_nome": lancamento.contrato.paciente.nome if lancamento.contrato else (
-      lancamento.pacote_tratamento.paciente.nome if lancamento.pacote_tratamento else None),
-            "fornecedor_id": lancamento.fornecedor_id,
-            "fornecedor_nome": lancamento.fornecedor.nome if lancamento.fornecedor else None,
-            "data_vencimento": lancamento.data_vencimento.isoformat() if lancamento.data_vencimento else None,
-            "data_pagamento": lancamento.data_pagamento.isoformat() if lancamento.data_pagamento else None,
-            "valor": float(lancamento.valor),
-            "status": lancamento.status,
-            "numero_nota_fiscal": lancamento.numero_nota_fiscal,
-            "observacoes": lancamento.observacoes,
-            "forma_pagamento": lancamento.forma_pagamento,
-            "natureza_id": lancamento.natureza_id,
-            "natureza_nome": lancamento.natureza.nome if lancamento.natureza else None,
-            "data_criacao": lancamento.data_criacao.isoformat(),
-            "data_atualizacao": lancamento.data_atualizacao.isoformat(),
-            "pacote_tratamento_id": lancamento.pacote_tratamento_id
-        })
+    """
+    Endpoint para listar os lançamentos financeiros.
+    Filtros: tipo, status, natureza_id, fornecedor_id, contrato_id, pacote_tratamento_id,
+    vencimento_inicio, vencimento_fim (YYYY-MM-DD) e busca (texto livre).
+    Ordenação: ordenar_por (data_vencimento|valor) e ordem (asc|desc).
+    Com 'limite' e/ou 'cursor' a resposta é paginada por cursor e retorna
+    {"itens": [...], "proximo_cursor": ...}; sem eles retorna a lista completa.
+    Com ?formato=csv ou Accept: application/x-ndjson a lista é transmitida em streaming.
+    """
+    ordenar_por = request.args.get('ordenar_por', 'data_vencimento')
+    if ordenar_por not in ORDENACOES_LANCAMENTO:
+        return jsonify({"msg": f"Parâmetro 'ordenar_por' inválido. Valores aceitos: {list(ORDENACOES_LANCAMENTO.keys())}"}), 400
+
+    ordem = request.args.get('ordem', 'asc')
+    if ordem not in ('asc', 'desc'):
+        return jsonify({"msg": "Parâmetro 'ordem' deve ser 'asc' ou 'desc'"}), 400
+
+    colunas = [ORDENACOES_LANCAMENTO[ordenar_por], LancamentoFinanceiro.id]
+    descendente = ordem == 'desc'
+    ordenacao = [coluna.desc() if descendente else coluna.asc() for coluna in colunas]
+    formato = formato_streaming(request)
+
+    try:
+        campos = ESQUEMA_LANCAMENTO.selecionar(request.args, CAMPOS_LANCAMENTO_LISTAGEM)
+        query = ESQUEMA_LANCAMENTO.preparar(_filtrar_lancamentos(request.args), campos, extras=colunas)
+        if formato:
+            return resposta_streaming(
+                query.order_by(*ordenacao), ESQUEMA_LANCAMENTO.compilar(campos), formato, 'lancamentos'
+            )
+        if paginacao_solicitada(request.args):
+            lancamentos, proximo_cursor = paginar_keyset(query, colunas, request.args, descendente)
+        else:
+            lancamentos = query.order_by(*ordenacao).all()
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
     
+    resultado = ESQUEMA_LANCAMENTO.serializar_lista(lancamentos, campos)
+    
+    if paginacao_solicitada(request.args):
+        return jsonify({"itens": resultado, "proximo_cursor": proximo_cursor}), 200
+
     return jsonify(resultado), 200
 
+@lancamentos_bp.route('/resumo', methods=['GET'])
+@jwt_required()
+def resumo_lancamentos():
+    """Endpoint para obter o resumo financeiro (totais por tipo, status, vencimento e natureza)"""
+    hoje = date.today()
+
+    # Totais por tipo e status
+    por_tipo_status = db.session.query(
+        LancamentoFinanceiro.tipo,
+        LancamentoFinanceiro.status,
+        func.count(LancamentoFinanceiro.id),
+        func.coalesce(func.sum(LancamentoFinanceiro.valor), 0)
+    ).group_by(LancamentoFinanceiro.tipo, LancamentoFinanceiro.status).all()
+
+    por_tipo = {}
+    for tipo, status, quantidade, total in por_tipo_status:
+        por_tipo.setdefault(tipo, {})[status] = {
+            "quantidade": quantidade,
+            "total": float(total)
+        }
+
+    # Lançamentos pendentes agrupados por faixa de vencimento
+    faixa = case(
+        (LancamentoFinanceiro.data_vencimento >= hoje, 'a_vencer'),
+        (LancamentoFinanceiro.data_vencimento >= hoje - timedelta(days=30), 'vencido_1_30'),
+        (LancamentoFinanceiro.data_vencimento >= hoje - timedelta(days=60), 'vencido_31_60'),
+        (LancamentoFinanceiro.data_vencimento >= hoje - timedelta(days=90), 'vencido_61_90'),
+        else_='vencido_90_mais'
+    ).label('faixa')
+
+    por_faixa = db.session.query(
+        LancamentoFinanceiro.tipo,
+        faixa,
+        func.count(LancamentoFinanceiro.id),
+        func.coalesce(func.sum(LancamentoFinanceiro.valor), 0)
+    ).filter(
+        LancamentoFinanceiro.status == 'pendente'
+    ).group_by(LancamentoFinanceiro.tipo, faixa).all()
+
+    vencimentos = {}
+    lancamentos_vencidos = 0
+    for tipo, nome_faixa, quantidade, total in por_faixa:
+        vencimentos.setdefault(tipo, {})[nome_faixa] = {
+            "quantidade": quantidade,
+            "total": float(total)
+        }
+        if nome_faixa != 'a_vencer':
+            lancamentos_vencidos += quantidade
+
+    # Totais por natureza orçamentária
+    por_natureza_query = db.session.query(
+        LancamentoFinanceiro.natureza_id,
+        Natureza.nome,
+        LancamentoFinanceiro.tipo,
+        func.count(LancamentoFinanceiro.id),
+        func.coalesce(func.sum(LancamentoFinanceiro.valor), 0)
+    ).outerjoin(
+        Natureza, Natureza.id == LancamentoFinanceiro.natureza_id
+    ).filter(
+        LancamentoFinanceiro.status != 'cancelado'
+    ).group_by(
+        LancamentoFinanceiro.natureza_id, Natureza.nome, LancamentoFinanceiro.tipo
+    ).all()
+
+    por_natureza = []
+    for natureza_id, natureza_nome, tipo, quantidade, total in por_natureza_query:
+        por_natureza.append({
+            "natureza_id": natureza_id,
+            "natureza_nome": natureza_nome,
+            "tipo": tipo,
+            "quantidade": quantidade,
+            "total": float(total)
+        })
+
+    def total_pendente(tipo):
+        return por_tipo.get(tipo, {}).get('pendente', {}).get('total', 0.0)
+
+    return jsonify({
+        "data_referencia": hoje.isoformat(),
+        "total_a_receber": total_pendente('a_receber'),
+        "total_a_pagar": total_pendente('a_pagar'),
+        "lancamentos_vencidos": lancamentos_vencidos,
+        "por_tipo": por_tipo,
+        "vencimentos": vencimentos,
+        "por_natureza": por_natureza
+    }), 200
+
 @lancamentos_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def obter_lancamento(id):
     """Endpoint para obter um lançamento financeiro específico"""
-    lancamento = LancamentoFinanceiro.query.get(id)
+    try:
+        campos = ESQUEMA_LANCAMENTO.selecionar(request.args, CAMPOS_LANCAMENTO_LISTAGEM)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    lancamento = LancamentoFinanceiro.query.options(*LancamentoFinanceiro.opcoes_carregamento()).get(id)
     
     if not lancamento:
         return jsonify({"msg": "Lançamento não encontrado"}), 404
     
-    return jsonify({
-        "id": lancamento.id,
-        "tipo": lancamento.tipo,
-        "contrato_id": lancamento.contrato_id,
-        "contrato_identificador": lancamento.contrato.identificador_contrato if lancamento.contrato else None,
-        "paciente_nome": lancamento.contrato.paciente.nome if lancamento.contrato else (
-      lancamento.pacote_tratamento.paciente.nome if lancamento.pacote_tratamento else None),
-        "fornecedor_id": lancamento.fornecedor_id,
-        "fornecedor_nome": lancamento.fornecedor.nome if lancamento.fornecedor else None,
-        "data_vencimento": lancamento.data_vencimento.isoformat() if lancamento.data_vencimento else None,
-        "data_pagamento": lancamento.data_pagamento.isoformat() if lancamento.data_pagamento else None,
-        "valor": float(lancamento.valor),
-        "status": lancamento.status,
-        "numero_nota_fiscal": lancamento.numero_nota_fiscal,
-        "observacoes": lancamento.observacoes,
-        "forma_pagamento": lancamento.forma_pagamento,
-        "natureza_id": lancamento.natureza_id,
-        "natureza_nome": lancamento.natureza.nome if lancamento.natureza else None,
-        "data_criacao": lancamento.data_criacao.isoformat(),
-        "data_atualizacao": lancamento.data_atualizacao.isoformat(),
-        "pacote_tratamento_id": lancamento.pacote_tratamento_id
-    }), 200
+    return jsonify(ESQUEMA_LANCAMENTO.serializar(lancamento, campos)), 200
 
 @lancamentos_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -175,23 +312,7 @@ def criar_lancamento():
     
     return jsonify({
         "msg": "Lançamento criado com sucesso",
-        "lancamento": {
-            "id": novo_lancamento.id,
-            "tipo": novo_lancamento.tipo,
-            "contrato_id": novo_lancamento.contrato_id,
-            "fornecedor_id": novo_lancamento.fornecedor_id,
-            "data_vencimento": novo_lancamento.data_vencimento.isoformat(),
-            "data_pagamento": novo_lancamento.data_pagamento.isoformat() if novo_lancamento.data_pagamento else None,
-            "valor": float(novo_lancamento.valor),
-            "status": novo_lancamento.status,
-            "numero_nota_fiscal": novo_lancamento.numero_nota_fiscal,
-            "observacoes": novo_lancamento.observacoes,
-            "forma_pagamento": novo_lancamento.forma_pagamento,
-            "data_criacao": novo_lancamento.data_criacao.isoformat(),
-            "data_atualizacao": novo_lancamento.data_atualizacao.isoformat(),
-            "natureza_id": novo_lancamento.natureza_id,
-            "natureza_nome": novo_lancamento.natureza.nome if novo_lancamento.natureza else None
-        }
+        "lancamento": ESQUEMA_LANCAMENTO.serializar(novo_lancamento, CAMPOS_LANCAMENTO_GRAVACAO)
     }), 201
 
 @lancamentos_bp.route('/<int:id>', methods=['PUT'])
@@ -271,23 +392,7 @@ def atualizar_lancamento(id):
     
     return jsonify({
         "msg": "Lançamento atualizado com sucesso",
-        "lancamento": {
-            "id": lancamento.id,
-            "tipo": lancamento.tipo,
-            "contrato_id": lancamento.contrato_id,
-            "fornecedor_id": lancamento.fornecedor_id,
-            "data_vencimento": lancamento.data_vencimento.isoformat() if lancamento.data_vencimento else None,
-            "data_pagamento": lancamento.data_pagamento.isoformat() if lancamento.data_pagamento else None,
-            "valor": float(lancamento.valor),
-            "status": lancamento.status,
-            "numero_nota_fiscal": lancamento.numero_nota_fiscal,
-            "observacoes": lancamento.observacoes,
-            "forma_pagamento": lancamento.forma_pagamento,
-            "data_criacao": lancamento.data_criacao.isoformat(),
-            "data_atualizacao": lancamento.data_atualizacao.isoformat(),
-            "natureza_id": lancamento.natureza_id,
-            "natureza_nome": lancamento.natureza.nome if lancamento.natureza else None
-        }
+        "lancamento": ESQUEMA_LANCAMENTO.serializar(lancamento, CAMPOS_LANCAMENTO_GRAVACAO)
     }), 200
 
 @lancamentos_bp.route('/<int:id>', methods=['DELETE'])
@@ -313,28 +418,15 @@ def listar_lancamentos_por_contrato(contrato_id):
     if not contrato:
         return jsonify({"msg": "Contrato não encontrado"}), 404
     
-    lancamentos = LancamentoFinanceiro.query.filter_by(contrato_id=contrato_id).all()
-    
-    resultado = []
-    for lancamento in lancamentos:
-        resultado.append({
-            "id": lancamento.id,
-            "tipo": lancamento.tipo,
-            "contrato_id": lancamento.contrato_id,
-            "data_vencimento": lancamento.data_vencimento.isoformat() if lancamento.data_vencimento else None,
-            "data_pagamento": lancamento.data_pagamento.isoformat() if lancamento.data_pagamento else None,
-            "valor": float(lancamento.valor),
-            "status": lancamento.status,
-            "numero_nota_fiscal": lancamento.numero_nota_fiscal,
-            "observacoes": lancamento.observacoes,
-            "forma_pagamento": lancamento.forma_pagamento,
-            "data_criacao": lancamento.data_criacao.isoformat(),
-            "data_atualizacao": lancamento.data_atualizacao.isoformat(),
-            "natureza_id": lancamento.natureza_id,
-            "natureza_nome": lancamento.natureza.nome if lancamento.natureza else None
-        })
+    try:
+        campos = ESQUEMA_LANCAMENTO.selecionar(request.args, CAMPOS_LANCAMENTO_POR_CONTRATO)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = LancamentoFinanceiro.query.filter_by(contrato_id=contrato_id)
+    lancamentos = ESQUEMA_LANCAMENTO.preparar(query, campos).all()
     
-    return jsonify(resultado), 200
+    return jsonify(ESQUEMA_LANCAMENTO.serializar_lista(lancamentos, campos)), 200
 
 @lancamentos_bp.route('/fornecedor/<int:fornecedor_id>', methods=['GET'])
 @jwt_required()
@@ -345,23 +437,12 @@ def listar_lancamentos_por_fornecedor(fornecedor_id):
     if not fornecedor:
         return jsonify({"msg": "Fornecedor não encontrado"}), 404
     
-    lancamentos = LancamentoFinanceiro.query.filter_by(fornecedor_id=fornecedor_id).all()
-    
-    resultado = []
-    for lancamento in lancamentos:
-        resultado.append({
-            "id": lancamento.id,
-            "tipo": lancamento.tipo,
-            "fornecedor_id": lancamento.fornecedor_id,
-            "data_vencimento": lancamento.data_vencimento.isoformat() if lancamento.data_vencimento else None,
-            "data_pagamento": lancamento.data_pagamento.isoformat() if lancamento.data_pagamento else None,
-            "valor": float(lancamento.valor),
-            "status": lancamento.status,
-            "numero_nota_fiscal": lancamento.numero_nota_fiscal,
-            "observacoes": lancamento.observacoes,
-            "forma_pagamento": lancamento.forma_pagamento,
-            "data_criacao": lancamento.data_criacao.isoformat(),
-            "data_atualizacao": lancamento.data_atualizacao.isoformat()
-        })
+    try:
+        campos = ESQUEMA_LANCAMENTO.selecionar(request.args, CAMPOS_LANCAMENTO_POR_FORNECEDOR)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = LancamentoFinanceiro.query.filter_by(fornecedor_id=fornecedor_id)
+    lancamentos = ESQUEMA_LANCAMENTO.preparar(query, campos).all()
     
-    return jsonify(resultado), 200
+    return jsonify(ESQUEMA_LANCAMENTO.serializar_lista(lancamentos, campos)), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.local_atendimento import LocalAtendimento, db
+from src.models.local_atendimento import LocalAtendimento, db, ESQUEMA_LOCAL_ATENDIMENTO, CAMPOS_LOCAL_ATENDIMENTO
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 locais_atendimento_bp = Blueprint("locais_atendimento", __name__)
@@ -9,18 +10,14 @@ locais_atendimento_bp = Blueprint("locais_atendimento", __name__)
 @jwt_required()
 def listar_locais_atendimento():
     """Endpoint para listar todos os locais de atendimento"""
-    locais = LocalAtendimento.query.all()
-    
-    resultado = []
-    for local in locais:
-        resultado.append({
-            "id": local.id,
-            "nome": local.nome,
-            "endereco": local.endereco,
-            "data_cadastro": local.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_LOCAL_ATENDIMENTO.selecionar(request.args, CAMPOS_LOCAL_ATENDIMENTO)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    locais = ESQUEMA_LOCAL_ATENDIMENTO.preparar(LocalAtendimento.query, campos).all()
+    
+    return jsonify(ESQUEMA_LOCAL_ATENDIMENTO.serializar_lista(locais, campos)), 200
 
 @locais_atendimento_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -31,12 +28,7 @@ def obter_local_atendimento(id):
     if not local:
         return jsonify({"msg": "Local de atendimento não encontrado"}), 404
     
-    return jsonify({
-        "id": local.id,
-        "nome": local.nome,
-        "endereco": local.endereco,
-        "data_cadastro": local.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_LOCAL_ATENDIMENTO.serializar(local, CAMPOS_LOCAL_ATENDIMENTO)), 200
 
 @locais_atendimento_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -63,12 +55,7 @@ def criar_local_atendimento():
     db.session.add(novo_local)
     db.session.commit()
     
-    return jsonify({
-        "id": novo_local.id,
-        "nome": novo_local.nome,
-        "endereco": novo_local.endereco,
-        "data_cadastro": novo_local.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_LOCAL_ATENDIMENTO.serializar(novo_local, CAMPOS_LOCAL_ATENDIMENTO)), 201
 
 @locais_atendimento_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -95,12 +82,7 @@ def atualizar_local_atendimento(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": local.id,
-        "nome": local.nome,
-        "endereco": local.endereco,
-        "data_cadastro": local.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_LOCAL_ATENDIMENTO.serializar(local, CAMPOS_LOCAL_ATENDIMENTO)), 200
 
 @locais_atendimento_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.natureza_orcamentaria import Natureza, db
+from src.models.natureza_orcamentaria import Natureza, db, ESQUEMA_NATUREZA, CAMPOS_NATUREZA
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 naturezas_bp = Blueprint("naturezas", __name__)
@@ -9,18 +10,14 @@ naturezas_bp = Blueprint("naturezas", __name__)
 @jwt_required()
 def listar_naturezas():
     """Endpoint para listar todas as naturezas"""
-    refeicoes = Natureza.query.all()
-    
-    resultado = []
-    for natureza in refeicoes:
-        resultado.append({
-            "id": natureza.id,
-            "nome": natureza.nome,
-            "descricao": natureza.descricao,
-            "data_cadastro": natureza.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_NATUREZA.selecionar(request.args, CAMPOS_NATUREZA)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    naturezas = ESQUEMA_NATUREZA.preparar(Natureza.query, campos).all()
+    
+    return jsonify(ESQUEMA_NATUREZA.serializar_lista(naturezas, campos)), 200
 
 @naturezas_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -31,12 +28,7 @@ def obter_natureza(id):
     if not natureza:
         return jsonify({"msg": "Refeição não encontrada"}), 404
     
-    return jsonify({
-        "id": natureza.id,
-        "nome": natureza.nome,
-        "descricao": natureza.descricao,
-        "data_cadastro": natureza.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_NATUREZA.serializar(natureza, CAMPOS_NATUREZA)), 200
 
 @naturezas_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -63,12 +55,7 @@ def criar_natureza():
     db.session.add(nova_natureza)
     db.session.commit()
     
-    return jsonify({
-        "id": nova_natureza.id,
-        "nome": nova_natureza.nome,
-        "descricao": nova_natureza.descricao,
-        "data_cadastro": nova_natureza.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_NATUREZA.serializar(nova_natureza, CAMPOS_NATUREZA)), 201
 
 @naturezas_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -95,12 +82,7 @@ def atualizar_natureza(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": natureza.id,
-        "nome": natureza.nome,
-        "descricao": natureza.descricao,
-        "data_cadastro": natureza.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_NATUREZA.serializar(natureza, CAMPOS_NATUREZA)), 200
 
 @naturezas_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.paciente import Paciente, db
+from src.models.paciente import Paciente, db, ESQUEMA_PACIENTE, CAMPOS_PACIENTE
+from src.paginacao import ParametroInvalido
+from src.streaming import formato_streaming, resposta_streaming
 from datetime import datetime
 
 pacientes_bp = Blueprint('pacientes', __name__)
@@ -9,31 +11,22 @@ pacientes_bp = Blueprint('pacientes', __name__)
 @jwt_required()
 def listar_pacientes():
     """Endpoint para listar todos os pacientes"""
-    pacientes = Paciente.query.all()
-    
-    resultado = []
-    for paciente in pacientes:
-        resultado.append({
-            "id": paciente.id,
-            "nome": paciente.nome,
-            "cpf": paciente.cpf,
-            "data_nascimento": paciente.data_nascimento.isoformat() if paciente.data_nascimento else None,
-            "identificador": paciente.identificador,
-            "telefone": paciente.telefone,
-            "email": paciente.email,
-            "endereco": paciente.endereco,
-            "data_cadastro": paciente.data_cadastro.isoformat(),
-            "nacionalidade": paciente.nacionalidade,
-            "logradouro": paciente.logradouro,
-            "numero": paciente.numero,
-            "bairro": paciente.bairro,
-            "cidade": paciente.cidade,
-            "estado": paciente.estado,
-            "cep": paciente.cep,
-            "complemento": paciente.complemento
-        })
+    try:
+        campos = ESQUEMA_PACIENTE.selecionar(request.args, CAMPOS_PACIENTE)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = ESQUEMA_PACIENTE.preparar(Paciente.query, campos)
+
+    formato = formato_streaming(request)
+    if formato:
+        return resposta_streaming(
+            query.order_by(Paciente.id), ESQUEMA_PACIENTE.compilar(campos), formato, 'pacientes'
+        )
+
+    pacientes = query.all()
     
-    return jsonify(resultado), 200
+    return jsonify(ESQUEMA_PACIENTE.serializar_lista(pacientes, campos)), 200
 
 @pacientes_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
@@ -44,25 +37,7 @@ def obter_paciente(id):
     if not paciente:
         return jsonify({"msg": "Paciente não encontrado"}), 404
     
-    return jsonify({
-        "id": paciente.id,
-        "nome": paciente.nome,
-        "cpf": paciente.cpf,
-        "data_nascimento": paciente.data_nascimento.isoformat() if paciente.data_nascimento else None,
-        "identificador": paciente.identificador,
-        "telefone": paciente.telefone,
-        "email": paciente.email,
-        "endereco": paciente.endereco,
-        "data_cadastro": paciente.data_cadastro.isoformat(),
-        "nacionalidade": paciente.nacionalidade,
-        "logradouro": paciente.logradouro,
-        "numero": paciente.numero,
-        "bairro": paciente.bairro,
-        "cidade": paciente.cidade,
-        "estado": paciente.estado,
-        "cep": paciente.cep,
-        "complemento": paciente.complemento
-    }), 200
+    return jsonify(ESQUEMA_PACIENTE.serializar(paciente, CAMPOS_PACIENTE)), 200
 
 @pacientes_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -132,25 +107,7 @@ def criar_paciente():
     
     return jsonify({
         "msg": "Paciente criado com sucesso",
-        "paciente": {
-            "id": novo_paciente.id,
-            "nome": novo_paciente.nome,
-            "cpf": novo_paciente.cpf,
-            "data_nascimento": novo_paciente.data_nascimento.isoformat(),
-            "identificador": novo_paciente.identificador,
-            "telefone": novo_paciente.telefone,
-            "email": novo_paciente.email,
-            "endereco": novo_paciente.endereco,
-            "data_cadastro": novo_paciente.data_cadastro.isoformat(),
-            "nacionalidade": novo_paciente.nacionalidade,
-            "logradouro": novo_paciente.logradouro,
-            "numero": novo_paciente.numero,
-            "bairro": novo_paciente.bairro,
-            "cidade": novo_paciente.cidade,
-            "estado": novo_paciente.estado,
-            "cep": novo_paciente.cep,
-            "complemento": novo_paciente.complemento
-        }
+        "paciente": ESQUEMA_PACIENTE.serializar(novo_paciente, CAMPOS_PACIENTE)
     }), 201
 
 @pacientes_bp.route('/<int:id>', methods=['PUT'])
@@ -219,25 +176,7 @@ def atualizar_paciente(id):
     
     return jsonify({
         "msg": "Paciente atualizado com sucesso",
-        "paciente": {
-            "id": paciente.id,
-            "nome": paciente.nome,
-            "cpf": paciente.cpf,
-            "data_nascimento": paciente.data_nascimento.isoformat(),
-            "identificador": paciente.identificador,
-            "telefone": paciente.telefone,
-            "email": paciente.email,
-            "endereco": paciente.endereco,
-            "data_cadastro": paciente.data_cadastro.isoformat(),
-            "nacionalidade": paciente.nacionalidade,
-            "logradouro": paciente.logradouro,
-            "numero": paciente.numero,
-            "bairro": paciente.bairro,
-            "cidade": paciente.cidade,
-            "estado": paciente.estado,
-            "cep": paciente.cep,
-            "complemento": paciente.complemento
-        }
+        "paciente": ESQUEMA_PACIENTE.serializar(paciente, CAMPOS_PACIENTE)
     }), 200
 
 @pacientes_bp.route('/<int:id>', methods=['DELETE'])
@@ -6,6 +6,7 @@ from src.models.pacote_tratamento import PacoteTratamento, db
 from src.models.paciente import Paciente
 from src.models.tipo_tratamento import TipoTratamento
 from datetime import datetime
+from sqlalchemy import update
 
 pacotes_tratamento_bp = Blueprint('pacotes_tratamento', __name__)
 
@@ -233,10 +234,19 @@ def incrementar_sessao_realizada(id):
     if not pacote:
         return jsonify({"msg": "Pacote de tratamento não encontrado"}), 404
     
-    if pacote.numero_sessoes_realizadas >= pacote.numero_sessoes_contratadas:
+    # Checagem e incremento no mesmo UPDATE condicional: duas requisições
+    # simultâneas não passam do total contratado
+    resultado = db.session.execute(
+        update(PacoteTratamento)
+        .where(PacoteTratamento.id == id,
+               PacoteTratamento.numero_sessoes_realizadas < PacoteTratamento.numero_sessoes_contratadas)
+        .values(numero_sessoes_realizadas=PacoteTratamento.numero_sessoes_realizadas + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        db.session.rollback()
         return jsonify({"msg": "Todas as sessões já foram realizadas"}), 400
-    
-    pacote.numero_sessoes_realizadas += 1
+    db.session.refresh(pacote)
     
     # Se todas as sessões foram realizadas, marca como concluído
     if pacote.numero_sessoes_realizadas >= pacote.numero_sessoes_contratadas:
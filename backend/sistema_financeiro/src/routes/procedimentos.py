@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.procedimento import Procedimento, db
+from src.models.procedimento import Procedimento, db, ESQUEMA_PROCEDIMENTO, CAMPOS_PROCEDIMENTO
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 procedimentos_bp = Blueprint("procedimentos", __name__)
@@ -9,19 +10,14 @@ procedimentos_bp = Blueprint("procedimentos", __name__)
 @jwt_required()
 def listar_procedimentos():
     """Endpoint para listar todos os procedimentos"""
-    procedimentos = Procedimento.query.all()
-    
-    resultado = []
-    for procedimento in procedimentos:
-        resultado.append({
-            "id": procedimento.id,
-            "nome": procedimento.nome,
-            "descricao": procedimento.descricao,
-            "valor_sugerido": procedimento.valor_sugerido,
-            "data_cadastro": procedimento.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_PROCEDIMENTO.selecionar(request.args, CAMPOS_PROCEDIMENTO)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    procedimentos = ESQUEMA_PROCEDIMENTO.preparar(Procedimento.query, campos).all()
+    
+    return jsonify(ESQUEMA_PROCEDIMENTO.serializar_lista(procedimentos, campos)), 200
 
 @procedimentos_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -32,13 +28,7 @@ def obter_procedimento(id):
     if not procedimento:
         return jsonify({"msg": "Procedimento não encontrado"}), 404
     
-    return jsonify({
-        "id": procedimento.id,
-        "nome": procedimento.nome,
-        "descricao": procedimento.descricao,
-        "valor_sugerido": procedimento.valor_sugerido,
-        "data_cadastro": procedimento.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_PROCEDIMENTO.serializar(procedimento, CAMPOS_PROCEDIMENTO)), 200
 
 @procedimentos_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -67,13 +57,7 @@ def criar_procedimento():
     db.session.add(novo_procedimento)
     db.session.commit()
     
-    return jsonify({
-        "id": novo_procedimento.id,
-        "nome": novo_procedimento.nome,
-        "descricao": novo_procedimento.descricao,
-        "valor_sugerido": novo_procedimento.valor_sugerido,
-        "data_cadastro": novo_procedimento.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_PROCEDIMENTO.serializar(novo_procedimento, CAMPOS_PROCEDIMENTO)), 201
 
 @procedimentos_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -103,13 +87,7 @@ def atualizar_procedimento(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": procedimento.id,
-        "nome": procedimento.nome,
-        "descricao": procedimento.descricao,
-        "valor_sugerido": procedimento.valor_sugerido,
-        "data_cadastro": procedimento.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_PROCEDIMENTO.serializar(procedimento, CAMPOS_PROCEDIMENTO)), 200
 
 @procedimentos_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
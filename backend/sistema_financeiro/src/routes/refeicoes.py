@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from src.models.refeicao import Refeicao, db
+from src.models.refeicao import Refeicao, db, ESQUEMA_REFEICAO, CAMPOS_REFEICAO
+from src.paginacao import ParametroInvalido
 from datetime import datetime
 
 refeicoes_bp = Blueprint("refeicoes", __name__)
@@ -9,18 +10,14 @@ refeicoes_bp = Blueprint("refeicoes", __name__)
 @jwt_required()
 def listar_refeicoes():
     """Endpoint para listar todas as refeições"""
-    refeicoes = Refeicao.query.all()
-    
-    resultado = []
-    for refeicao in refeicoes:
-        resultado.append({
-            "id": refeicao.id,
-            "nome": refeicao.nome,
-            "descricao": refeicao.descricao,
-            "data_cadastro": refeicao.data_cadastro.isoformat()
-        })
-    
-    return jsonify(resultado), 200
+    try:
+        campos = ESQUEMA_REFEICAO.selecionar(request.args, CAMPOS_REFEICAO)
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    refeicoes = ESQUEMA_REFEICAO.preparar(Refeicao.query, campos).all()
+    
+    return jsonify(ESQUEMA_REFEICAO.serializar_lista(refeicoes, campos)), 200
 
 @refeicoes_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
@@ -31,12 +28,7 @@ def obter_refeicao(id):
     if not refeicao:
         return jsonify({"msg": "Refeição não encontrada"}), 404
     
-    return jsonify({
-        "id": refeicao.id,
-        "nome": refeicao.nome,
-        "descricao": refeicao.descricao,
-        "data_cadastro": refeicao.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_REFEICAO.serializar(refeicao, CAMPOS_REFEICAO)), 200
 
 @refeicoes_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -63,12 +55,7 @@ def criar_refeicao():
     db.session.add(nova_refeicao)
     db.session.commit()
     
-    return jsonify({
-        "id": nova_refeicao.id,
-        "nome": nova_refeicao.nome,
-        "descricao": nova_refeicao.descricao,
-        "data_cadastro": nova_refeicao.data_cadastro.isoformat()
-    }), 201
+    return jsonify(ESQUEMA_REFEICAO.serializar(nova_refeicao, CAMPOS_REFEICAO)), 201
 
 @refeicoes_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -95,12 +82,7 @@ def atualizar_refeicao(id):
         
     db.session.commit()
     
-    return jsonify({
-        "id": refeicao.id,
-        "nome": refeicao.nome,
-        "descricao": refeicao.descricao,
-        "data_cadastro": refeicao.data_cadastro.isoformat()
-    }), 200
+    return jsonify(ESQUEMA_REFEICAO.serializar(refeicao, CAMPOS_REFEICAO)), 200
 
 @refeicoes_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
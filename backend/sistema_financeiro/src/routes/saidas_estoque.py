@@ -1,37 +1,105 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from datetime import datetime
+from sqlalchemy.orm import selectinload, joinedload
 from src.models.paciente import db
 from src.models.saida_estoque import SaidaEstoque
 from src.models.item_saida_estoque import ItemSaidaEstoque
 from src.models.itens import Item
 from src.models.agendamento import Agendamento
+from src.paginacao import ParametroInvalido, paginar_keyset, paginacao_solicitada, obter_data, obter_inteiro
+from src.movimentos_estoque import linhas_do_payload, itens_inexistentes, inserir_linhas
 
 saidas_estoque_bp = Blueprint("saidas_estoque", __name__)
 
+def _com_relacionamentos(query):
+    """
+    Agendamento (com procedimento e paciente) e linhas (com o item de cada uma)
+    carregados com selectinload: o número de consultas é constante por página,
+    independente da quantidade de saídas ou de linhas.
+    """
+    return query.options(
+        selectinload(SaidaEstoque.agendamento).options(
+            joinedload(Agendamento.procedimento),
+            joinedload(Agendamento.paciente)
+        ),
+        selectinload(SaidaEstoque.itens_saida).joinedload(ItemSaidaEstoque.item)
+    )
+
+def _filtrar_saidas_estoque(args):
+    """Monta a query de saídas aplicando os filtros da query string"""
+    query = SaidaEstoque.query
+
+    agendamento_id = obter_inteiro(args, "agendamento_id")
+    if agendamento_id is not None:
+        query = query.filter(SaidaEstoque.agendamento_id == agendamento_id)
+
+    item_id = obter_inteiro(args, "item_id")
+    if item_id is not None:
+        query = query.filter(SaidaEstoque.itens_saida.any(ItemSaidaEstoque.item_id == item_id))
+
+    data_inicio = obter_data(args, "data_inicio")
+    if data_inicio:
+        query = query.filter(SaidaEstoque.data_saida >= data_inicio)
+
+    data_fim = obter_data(args, "data_fim")
+    if data_fim:
+        query = query.filter(SaidaEstoque.data_saida <= data_fim)
+
+    return query
+
+def _agendamento_dados(agendamento):
+    if not agendamento:
+        return None
+    procedimento = agendamento.procedimento.nome if agendamento.procedimento else ''
+    paciente = agendamento.paciente.nome if agendamento.paciente else ''
+    return procedimento + ' - ' + paciente
+
+def _saida_dict(saida):
+    return {
+        "id": saida.id,
+        "agendamento_id": saida.agendamento_id,
+        "agendamento_dados": _agendamento_dados(saida.agendamento),
+        "data_saida": saida.data_saida.isoformat(),
+        "observacoes": saida.observacoes,
+        "itens": [
+            {
+                "id": item.id,
+                "item_id": item.item_id,
+                "nome_item": item.item.nome if item.item else None,
+                "quantidade": item.quantidade,
+                "custo_unitario": item.custo_unitario,
+                "custo_total": item.custo_total
+            } for item in saida.itens_saida
+        ]
+    }
+
 @saidas_estoque_bp.route("/", methods=["GET"])
 @jwt_required()
 def listar_saidas_estoque():
-    saidas = SaidaEstoque.query.all()
-    resultado = []
-
-    for saida in saidas:
-        resultado.append({
-            "id": saida.id,
-            "agendamento_id": saida.agendamento_id,
-            "agendamento_dados": saida.agendamento.procedimento.nome + ' - ' + saida.agendamento.paciente.nome ,
-            "data_saida": saida.data_saida.isoformat(),
-            "observacoes": saida.observacoes,
-            "itens": [
-                {
-                    "id": item.id,
-                    "item_id": item.item_id,
-                    "nome_item": item.item.nome,
-                    "quantidade": item.quantidade
-                } for item in saida.itens_saida
-            ]
-        })
-    
+    """
+    Lista as saídas de estoque ordenadas por data e id.
+    Filtros: agendamento_id, item_id (saídas com alguma linha do item),
+    data_inicio e data_fim (YYYY-MM-DD).
+    Com 'limite' e/ou 'cursor' a resposta é paginada por cursor e retorna
+    {"itens": [...], "proximo_cursor": ...}; sem eles retorna a lista completa.
+    """
+    colunas = [SaidaEstoque.data_saida, SaidaEstoque.id]
+
+    try:
+        query = _com_relacionamentos(_filtrar_saidas_estoque(request.args))
+        if paginacao_solicitada(request.args):
+            saidas, proximo_cursor = paginar_keyset(query, colunas, request.args)
+        else:
+            saidas = query.order_by(*colunas).all()
+    except ParametroInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
+    resultado = [_saida_dict(saida) for saida in saidas]
+
+    if paginacao_solicitada(request.args):
+        return jsonify({"itens": resultado, "proximo_cursor": proximo_cursor}), 200
+
     return jsonify(resultado), 200
 
 @saidas_estoque_bp.route("/", methods=["POST"])
@@ -49,6 +117,11 @@ def registrar_saida_estoque():
     if not agendamento_id or not data_saida or not itens:
         return jsonify({"msg": "Campos obrigatórios: agendamento_id, data_saida, itens"}), 400
 
+    linhas = linhas_do_payload(itens)
+    inexistentes = itens_inexistentes(linhas)
+    if inexistentes:
+        return jsonify({"msg": "Itens não encontrados", "itens": inexistentes}), 400
+
     nova_saida = SaidaEstoque(
         agendamento_id=agendamento_id,
         observacoes=observacoes,
@@ -57,20 +130,7 @@ def registrar_saida_estoque():
     db.session.add(nova_saida)
     db.session.flush()  # garante o ID
 
-    for item in itens:
-        item_id = item.get("item_id")
-        quantidade = item.get("quantidade")
-
-        if not item_id or not quantidade:
-            continue
-
-        saida_item = ItemSaidaEstoque(
-            saida_estoque_id=nova_saida.id,
-            item_id=item_id,
-            quantidade=quantidade
-        )
-        db.session.add(saida_item)
-
+    inserir_linhas(ItemSaidaEstoque, "saida_estoque_id", nova_saida.id, linhas)
     db.session.commit()
 
     return jsonify({"msg": "Saída de estoque registrada com sucesso", "id": nova_saida.id}), 201
@@ -0,0 +1,131 @@
+from functools import lru_cache
+from src.paginacao import ParametroInvalido
+
+# Funções de serialização geradas mantidas por esquema (as menos usadas saem)
+MAX_COMPILADOS = 64
+
+
+def data_iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+def decimal_float(valor):
+    return float(valor) if valor is not None else None
+
+
+def horario(valor):
+    return valor.strftime('%H:%M') if valor is not None else None
+
+
+class Campo:
+    """
+    Campo de um esquema de serialização.
+    Campos de coluna leem um atributo mapeado (opcionalmente convertido);
+    campos derivados recebem o objeto inteiro e podem acessar relacionamentos.
+    """
+
+    def __init__(self, atributo=None, conversor=None, derivado=None):
+        self.atributo = atributo
+        self.conversor = conversor
+        self.derivado = derivado
+
+    @property
+    def de_coluna(self):
+        return self.derivado is None
+
+
+def coluna(atributo=None, conversor=None):
+    return Campo(atributo=atributo, conversor=conversor)
+
+
+def derivado(funcao):
+    return Campo(derivado=funcao)
+
+
+class Esquema:
+    """
+    Descreve como um modelo vira dict.
+    Para cada combinação de campos é gerada uma função que monta o dict com
+    acessos diretos aos atributos, sem laços nem dicts intermediários por
+    registro. As funções ficam num cache LRU de MAX_COMPILADOS por esquema.
+    """
+
+    def __init__(self, modelo, campos, carregamento=None):
+        self.modelo = modelo
+        self.campos = {}
+        for nome, campo in campos.items():
+            if campo.de_coluna and campo.atributo is None:
+                campo.atributo = nome
+            self.campos[nome] = campo
+        self.carregamento = carregamento
+        self._compilar = lru_cache(maxsize=MAX_COMPILADOS)(self._gerar)
+
+    def selecionar(self, args, padrao):
+        """Lê ?campos=id,valor,... validando contra o esquema; sem o parâmetro usa o padrão"""
+        valor = args.get('campos')
+        if not valor:
+            return tuple(padrao)
+
+        pedidos = {nome.strip() for nome in valor.split(',') if nome.strip()}
+        invalidos = sorted(pedidos - self.campos.keys())
+        if invalidos:
+            raise ParametroInvalido(f"Campos inválidos: {', '.join(invalidos)}")
+        # Sem repetições e na ordem do esquema: permutações do mesmo conjunto
+        # usam a mesma função compilada
+        return tuple(nome for nome in self.campos if nome in pedidos)
+
+    def somente_colunas(self, nomes):
+        return all(self.campos[nome].de_coluna for nome in nomes)
+
+    def colunas(self, nomes, extras=()):
+        """Atributos mapeados necessários para serializar os campos (sem repetição)"""
+        colunas = []
+        for nome in nomes:
+            coluna_modelo = getattr(self.modelo, self.campos[nome].atributo)
+            if coluna_modelo not in colunas:
+                colunas.append(coluna_modelo)
+        for extra in extras:
+            if extra not in colunas:
+                colunas.append(extra)
+        return colunas
+
+    def preparar(self, query, nomes, extras=()):
+        """
+        Ajusta a query aos campos pedidos: se todos forem colunas, busca só
+        essas colunas (linhas simples, sem instanciar o modelo nem tocar em
+        relacionamentos); caso contrário aplica o carregamento antecipado.
+        'extras' são colunas que precisam vir junto (ex.: chave do cursor).
+        """
+        if self.somente_colunas(nomes):
+            return query.with_entities(*self.colunas(nomes, extras))
+        if self.carregamento:
+            return query.options(*self.carregamento())
+        return query
+
+    def compilar(self, nomes):
+        return self._compilar(tuple(nomes))
+
+    def _gerar(self, nomes):
+        namespace = {}
+        partes = []
+        for posicao, nome in enumerate(nomes):
+            campo = self.campos[nome]
+            if campo.de_coluna:
+                expressao = f"o.{campo.atributo}"
+                if campo.conversor:
+                    namespace[f"_c{posicao}"] = campo.conversor
+                    expressao = f"_c{posicao}({expressao})"
+            else:
+                namespace[f"_d{posicao}"] = campo.derivado
+                expressao = f"_d{posicao}(o)"
+            partes.append(f"{nome!r}: {expressao}")
+
+        codigo = "def serializar(o):\n    return {" + ", ".join(partes) + "}\n"
+        exec(codigo, namespace)
+        return namespace['serializar']
+
+    def serializar(self, objeto, nomes):
+        return self.compilar(nomes)(objeto)
+
+    def serializar_lista(self, objetos, nomes):
+        return list(map(self.compilar(nomes), objetos))
@@ -0,0 +1,226 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sqlalchemy import select, func, literal
+from src.models.paciente import db, Paciente
+from src.models.fornecedor import Fornecedor
+from src.models.contrato import Contrato
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.lancamento_financeiro import LancamentoFinanceiro
+from src.models.fluxo_caixa_mensal import FluxoCaixaMensal
+from src.models.agendamento_cirurgico import AgendamentoCirurgico
+from src.models.procedimento import Procedimento
+from src.models.local_atendimento import LocalAtendimento
+from src.models.natureza_orcamentaria import Natureza
+from src.bi_integration import get_lancamentos_data, get_contratos_data, get_fluxo_caixa_mensal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIRETORIO_RELATORIOS = os.path.join(BASE_DIR, 'exports', 'relatorios')
+
+# Relatórios gerados em paralelo por processo; os demais aguardam na fila
+WORKERS_RELATORIO = int(os.getenv('RELATORIO_WORKERS', '2'))
+# Quantos arquivos de versões anteriores são mantidos em disco
+MAX_RELATORIOS_EM_CACHE = 5
+# Tempo que o status de um job finalizado fica disponível
+VALIDADE_JOB_SEGUNDOS = 24 * 60 * 60
+# Idade máxima de um relatório reaproveitado do cache: nomes de paciente e
+# fornecedor não têm data de atualização, então uma edição neles só aparece
+# depois deste prazo (ou de qualquer outra alteração nos dados)
+VALIDADE_CACHE_SEGUNDOS = int(os.getenv('RELATORIO_VALIDADE_CACHE', str(60 * 60)))
+
+STATUS_PENDENTE = 'pendente'
+STATUS_PROCESSANDO = 'processando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS_RELATORIO, thread_name_prefix='relatorio')
+_lock = threading.Lock()
+# versão dos dados -> job_id em andamento neste processo
+_jobs_em_andamento = {}
+
+
+def _caminho_job(job_id):
+    return os.path.join(DIRETORIO_RELATORIOS, f'job_{job_id}.json')
+
+
+def caminho_relatorio(versao):
+    return os.path.join(DIRETORIO_RELATORIOS, f'relatorio_financeiro_{versao}.xlsx')
+
+
+def _salvar_job(job):
+    """Grava o estado do job em disco (substituição atômica), visível a todos os workers"""
+    os.makedirs(DIRETORIO_RELATORIOS, exist_ok=True)
+    temporario = _caminho_job(job['id']) + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(job, arquivo, ensure_ascii=False)
+    os.replace(temporario, _caminho_job(job['id']))
+
+
+def obter_job(job_id):
+    """Retorna o estado do job ou None se não existir"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+
+    try:
+        with open(_caminho_job(job_id), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+
+def versao_dados():
+    """
+    Chave que muda sempre que os dados do relatório mudam e identifica o
+    arquivo em cache:
+    - tabelas com data de atualização: quantidade, maior id e última atualização
+      (agregações sobre chaves indexadas);
+    - paciente e fornecedor: quantidade, maior id e último cadastro (edições de
+      nome são cobertas pela validade do cache, VALIDADE_CACHE_SEGUNDOS);
+    - cadastros pequenos cujo nome vai para o relatório (procedimento, local,
+      natureza): hash de todos os ids e nomes.
+    """
+    partes = []
+    for modelo, atualizacao in (
+        (LancamentoFinanceiro, LancamentoFinanceiro.data_atualizacao),
+        (Contrato, Contrato.data_atualizacao),
+        (PacoteTratamento, PacoteTratamento.data_atualizacao),
+        (AgendamentoCirurgico, AgendamentoCirurgico.data_atualizacao),
+        (Paciente, Paciente.data_cadastro),
+        (Fornecedor, Fornecedor.data_cadastro),
+    ):
+        linha = db.session.execute(
+            select(func.count(modelo.id), func.max(modelo.id), func.max(atualizacao))
+        ).one()
+        partes.append(f'{modelo.__tablename__}:{linha[0]}:{linha[1]}:{linha[2]}')
+
+    for modelo in (Procedimento, LocalAtendimento, Natureza):
+        nomes = db.session.execute(select(modelo.id, modelo.nome).order_by(modelo.id)).all()
+        partes.append(f'{modelo.__tablename__}:' + ','.join(f'{id_}={nome}' for id_, nome in nomes))
+
+    linha = db.session.execute(
+        select(func.count(literal(1)), func.max(FluxoCaixaMensal.data_atualizacao))
+    ).one()
+    partes.append(f'{FluxoCaixaMensal.__tablename__}:{linha[0]}:{linha[1]}')
+
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:16]
+
+
+def _relatorio_em_cache(versao):
+    """Indica se o arquivo da versão existe e ainda está dentro da validade do cache"""
+    try:
+        idade = time.time() - os.path.getmtime(caminho_relatorio(versao))
+    except OSError:
+        return False
+    return idade < VALIDADE_CACHE_SEGUNDOS
+
+
+def _gerar_relatorio(versao):
+    """Extrai os dados e grava o Excel da versão; retorna as linhas por aba"""
+    lancamentos_df = get_lancamentos_data()
+    contratos_df = get_contratos_data()
+    fluxo_caixa_df = get_fluxo_caixa_mensal()
+
+    destino = caminho_relatorio(versao)
+    temporario = os.path.join(DIRETORIO_RELATORIOS, f'.tmp_{uuid.uuid4().hex}.xlsx')
+    with pd.ExcelWriter(temporario, engine='openpyxl') as writer:
+        lancamentos_df.to_excel(writer, sheet_name="Lançamentos", index=False)
+        contratos_df.to_excel(writer, sheet_name="Contratos", index=False)
+        fluxo_caixa_df.to_excel(writer, sheet_name="Fluxo de Caixa", index=False)
+    os.replace(temporario, destino)
+
+    return {
+        "lancamentos": len(lancamentos_df),
+        "contratos": len(contratos_df),
+        "fluxo_caixa": len(fluxo_caixa_df)
+    }
+
+
+def _limpar_cache():
+    """Remove os relatórios mais antigos além do limite do cache e jobs expirados"""
+    limite_job = time.time() - VALIDADE_JOB_SEGUNDOS
+    for nome in os.listdir(DIRETORIO_RELATORIOS):
+        caminho = os.path.join(DIRETORIO_RELATORIOS, nome)
+        try:
+            if nome.startswith('job_') and os.path.getmtime(caminho) < limite_job:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+    arquivos = [
+        os.path.join(DIRETORIO_RELATORIOS, nome)
+        for nome in os.listdir(DIRETORIO_RELATORIOS)
+        if nome.startswith('relatorio_financeiro_') and nome.endswith('.xlsx')
+    ]
+    arquivos.sort(key=os.path.getmtime, reverse=True)
+    for antigo in arquivos[MAX_RELATORIOS_EM_CACHE:]:
+        try:
+            os.remove(antigo)
+        except OSError:
+            pass
+
+
+def _executar_job(app, job):
+    with app.app_context():
+        job['status'] = STATUS_PROCESSANDO
+        job['iniciado_em'] = datetime.utcnow().isoformat()
+        _salvar_job(job)
+
+        try:
+            job['linhas'] = _gerar_relatorio(job['versao'])
+            job['status'] = STATUS_CONCLUIDO
+            _limpar_cache()
+        except Exception as e:
+            job['status'] = STATUS_ERRO
+            job['erro'] = str(e)
+        finally:
+            job['finalizado_em'] = datetime.utcnow().isoformat()
+            _salvar_job(job)
+            db.session.remove()
+            with _lock:
+                _jobs_em_andamento.pop(job['versao'], None)
+
+
+def criar_job_relatorio(app):
+    """
+    Cria um job de geração do relatório Excel.
+    Se o arquivo da versão atual dos dados já existe e está dentro da validade,
+    o job nasce concluído (reaproveita o cache); se já há um job gerando a mesma versão neste
+    processo, ele é devolvido em vez de criar outro.
+    """
+    versao = versao_dados()
+
+    with _lock:
+        em_andamento = _jobs_em_andamento.get(versao)
+        if em_andamento:
+            job = obter_job(em_andamento)
+            if job:
+                return job
+
+        job = {
+            'id': str(uuid.uuid4()),
+            'versao': versao,
+            'status': STATUS_PENDENTE,
+            'criado_em': datetime.utcnow().isoformat(),
+            'cache': False,
+        }
+
+        if _relatorio_em_cache(versao):
+            job['status'] = STATUS_CONCLUIDO
+            job['cache'] = True
+            job['finalizado_em'] = job['criado_em']
+            _salvar_job(job)
+            return job
+
+        _jobs_em_andamento[versao] = job['id']
+        _salvar_job(job)
+
+    _executor.submit(_executar_job, app, dict(job))
+    return job
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import zlib
+from flask import Response, stream_with_context
+
+# Registros lidos do cursor do banco (e enviados ao cliente) por vez
+TAMANHO_LOTE = 1000
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
+
+
+def formato_streaming(request):
+    """
+    Retorna 'csv' (?formato=csv), 'ndjson' (?formato=ndjson ou
+    Accept: application/x-ndjson) ou None para a resposta JSON padrão
+    """
+    formato = request.args.get('formato')
+    if formato in ('csv', 'ndjson'):
+        return formato
+
+    melhor = request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON])
+    if melhor == MIMETYPE_NDJSON:
+        return 'ndjson'
+
+    return None
+
+
+def _linhas_ndjson(registros):
+    buffer = []
+    for registro in registros:
+        buffer.append(json.dumps(registro, ensure_ascii=False, default=str))
+        if len(buffer) >= TAMANHO_LOTE:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def _linhas_csv(registros):
+    saida = io.StringIO()
+    escritor = None
+    pendentes = 0
+
+    for registro in registros:
+        if escritor is None:
+            escritor = csv.DictWriter(saida, fieldnames=list(registro.keys()), extrasaction='ignore')
+            escritor.writeheader()
+        escritor.writerow(registro)
+        pendentes += 1
+
+        if pendentes >= TAMANHO_LOTE:
+            yield saida.getvalue()
+            saida.seek(0)
+            saida.truncate(0)
+            pendentes = 0
+
+    if saida.tell():
+        yield saida.getvalue()
+
+
+def comprimir_gzip(partes, nivel=6):
+    """
+    Comprime em gzip um fluxo de textos, parte a parte.
+    O compressor guarda apenas sua janela interna, então a memória não cresce
+    com o tamanho total da resposta.
+    """
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for parte in partes:
+        dados = compressor.compress(parte.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def aceita_gzip(request):
+    return 'gzip' in request.accept_encodings
+
+
+def resposta_streaming(query, serializar, formato, nome_arquivo):
+    """
+    Envia o resultado da query registro a registro.
+    As linhas são lidas com yield_per (cursor no servidor), então a memória
+    usada fica limitada a um lote, independente do tamanho da tabela.
+    """
+    def registros():
+        for linha in query.yield_per(TAMANHO_LOTE):
+            yield serializar(linha)
+
+    if formato == 'csv':
+        return Response(
+            stream_with_context(_linhas_csv(registros())),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={nome_arquivo}.csv'}
+        )
+
+    return Response(stream_with_context(_linhas_ndjson(registros())), mimetype=MIMETYPE_NDJSON)
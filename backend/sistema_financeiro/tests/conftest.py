@@ -0,0 +1,164 @@
+import importlib
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, time
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+
+# Os testes importam o pacote 'src' a partir de backend/sistema_financeiro
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.paciente import db
+
+# Todos os modelos precisam estar registrados antes do create_all
+PASTA_MODELOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'models')
+for arquivo in sorted(os.listdir(PASTA_MODELOS)):
+    if arquivo.endswith('.py'):
+        importlib.import_module('src.models.' + arquivo[:-3])
+
+from src.models.paciente import Paciente
+from src.models.fornecedor import Fornecedor
+from src.models.itens import Item
+from src.models.procedimento import Procedimento
+from src.models.equipe import Equipe
+from src.models.local_atendimento import LocalAtendimento
+from src.models.categoria_procedimento import CategoriaProcedimento
+from src.models.agendamento import Agendamento
+from src.routes.lancamentos import lancamentos_bp
+from src.routes.bi import bi_bp
+from src.routes.pacotes_tratamento import pacotes_tratamento_bp
+from src.routes.agendamentos_sessao import agendamentos_sessao_bp
+from src.routes.agendamentos_cirurgicos import agendamentos_cirurgicos_bp
+from src.routes.entradas_estoque import entradas_estoque_bp
+from src.routes.saidas_estoque import saidas_estoque_bp
+from src.routes.estoque import estoque_bp
+
+# Mesmos prefixos de src/main.py
+BLUEPRINTS = [
+    (lancamentos_bp, '/api/lancamentos'),
+    (bi_bp, '/api/bi'),
+    (pacotes_tratamento_bp, '/api/pacotes-tratamento'),
+    (agendamentos_sessao_bp, '/api/agendamentos-sessao'),
+    (agendamentos_cirurgicos_bp, '/api/agendamentos-cirurgicos'),
+    (entradas_estoque_bp, '/api/entradas_estoque'),
+    (saidas_estoque_bp, '/api/saidas_estoque'),
+    (estoque_bp, '/api/estoque_atual'),
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Aplicação com os blueprints da API sobre um banco SQLite em arquivo (as
+    requisições concorrentes usam conexões próprias). TEST_DATABASE_URL
+    permite rodar contra outro banco, p.ex. MySQL.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+        'TEST_DATABASE_URL', f"sqlite:///{tmp_path / 'testes.db'}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'chave-jwt-dos-testes-do-sistema-financeiro'
+    app.config['TESTING'] = True
+
+    JWTManager(app)
+    db.init_app(app)
+    for blueprint, prefixo in BLUEPRINTS:
+        app.register_blueprint(blueprint, url_prefix=prefixo)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def headers(app):
+    """Cabeçalho de autorização com um token JWT válido"""
+    return {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+
+@pytest.fixture
+def contar_consultas(app):
+    """
+    Context manager que conta os comandos SQL executados no banco dentro do
+    bloco: `with contar_consultas() as comandos: ...`
+    """
+    @contextmanager
+    def contador():
+        comandos = []
+
+        def registrar(conexao, cursor, comando, parametros, contexto, executemany):
+            comandos.append(comando)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            yield comandos
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+    return contador
+
+
+class MovimentosEstoque:
+    """Cadastros mínimos de estoque e atalhos para registrar entradas e saídas pela API"""
+
+    def __init__(self, client, headers):
+        self.client = client
+        self.headers = headers
+
+        paciente = Paciente(nome='Paciente', cpf='0', data_nascimento=date(1990, 1, 1), identificador='p0')
+        fornecedor = Fornecedor(nome='Fornecedor', cpf_cnpj='0', identificador='f0')
+        itens = [Item(nome='Item A'), Item(nome='Item B')]
+        procedimento = Procedimento(nome='Procedimento')
+        equipe = Equipe(nome='Equipe')
+        local = LocalAtendimento(nome='Sala')
+        categoria = CategoriaProcedimento(nome='Categoria')
+        db.session.add_all([paciente, fornecedor, procedimento, equipe, local, categoria] + itens)
+        db.session.flush()
+        agendamento = Agendamento(
+            paciente_id=paciente.id, data_agendamento=date(2026, 1, 1), procedimento_id=procedimento.id,
+            equipe_id=equipe.id, local_atendimento_id=local.id, horario_inicio=time(8), categoria_id=categoria.id
+        )
+        db.session.add(agendamento)
+        db.session.commit()
+
+        self.fornecedor_id = fornecedor.id
+        self.agendamento_id = agendamento.id
+        self.itens = [item.id for item in itens]
+
+    def entrada(self, data, *linhas, fornecedor_id=None):
+        """linhas: (item_id, quantidade, preco_unitario)"""
+        resposta = self.client.post('/api/entradas_estoque/', json={
+            'fornecedor_id': fornecedor_id or self.fornecedor_id,
+            'data_entrada': data,
+            'itens': [{'item_id': item_id, 'quantidade': quantidade, 'valor_unitario': preco}
+                      for item_id, quantidade, preco in linhas],
+        }, headers=self.headers)
+        assert resposta.status_code == 201, resposta.get_json()
+        return resposta.get_json()['id']
+
+    def saida(self, data, *linhas, agendamento_id=None):
+        """linhas: (item_id, quantidade)"""
+        resposta = self.client.post('/api/saidas_estoque/', json={
+            'agendamento_id': agendamento_id or self.agendamento_id,
+            'data_saida': data,
+            'itens': [{'item_id': item_id, 'quantidade': quantidade} for item_id, quantidade in linhas],
+        }, headers=self.headers)
+        assert resposta.status_code == 201, resposta.get_json()
+        return resposta.get_json()['id']
+
+
+@pytest.fixture
+def estoque(client, headers):
+    return MovimentosEstoque(client, headers)
@@ -0,0 +1,86 @@
+from datetime import date, datetime
+
+import pytest
+
+from src.bi_integration import (
+    consulta_contratos,
+    consulta_excluidos,
+    consulta_lancamentos,
+    explicar_consulta,
+)
+from src.models.paciente import db, Paciente
+from src.models.contrato import Contrato
+from src.models.fornecedor import Fornecedor
+from src.models.natureza_orcamentaria import Natureza
+from src.models.tipo_tratamento import TipoTratamento
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.lancamento_financeiro import LancamentoFinanceiro
+from src.models.fluxo_caixa_mensal import consulta_totais_pagos
+
+MARCA = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def dados(app):
+    natureza = Natureza(nome='Natureza')
+    fornecedor = Fornecedor(nome='Fornecedor', cpf_cnpj='1', identificador='f1')
+    tipo = TipoTratamento(nome='Tipo')
+    db.session.add_all([natureza, fornecedor, tipo])
+    db.session.flush()
+
+    for i in range(20):
+        paciente = Paciente(nome=f'Paciente {i}', cpf=str(i), data_nascimento=date(1990, 1, 1), identificador=f'p{i}')
+        db.session.add(paciente)
+        db.session.flush()
+        contrato = Contrato(identificador_contrato=f'C{i}', paciente_id=paciente.id)
+        pacote = PacoteTratamento(
+            paciente_id=paciente.id, tipo_tratamento_id=tipo.id, descricao='Pacote',
+            data_inicio_tratamento=date(2026, 1, 1), numero_sessoes_contratadas=3, valor_total_pacote=10
+        )
+        db.session.add_all([contrato, pacote])
+        db.session.flush()
+        db.session.add_all([
+            LancamentoFinanceiro(tipo='a_receber', contrato_id=contrato.id, natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+            LancamentoFinanceiro(tipo='a_receber', pacote_tratamento_id=pacote.id, natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1), status='pago',
+                                 data_pagamento=date(2026, 2, 1)),
+            LancamentoFinanceiro(tipo='a_pagar', fornecedor_id=fornecedor.id, natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+        ])
+    db.session.commit()
+
+
+def varreduras_completas(plano):
+    """
+    Tabelas lidas por inteiro no plano: 'SCAN <tabela>' no SQLite, type ALL
+    no MySQL. Tabelas derivadas (subconsultas e uniões) não contam.
+    """
+    tabelas = []
+    for passo in plano:
+        if 'detail' in passo:
+            detalhe = passo['detail']
+            if detalhe.startswith('SCAN ') and not detalhe.startswith('SCAN anon_'):
+                tabelas.append(detalhe.split()[1])
+        elif passo.get('type') == 'ALL' and not str(passo.get('table', '')).startswith('<'):
+            tabelas.append(passo['table'])
+    return tabelas
+
+
+@pytest.mark.parametrize('nome, montar', [
+    ('lancamentos alterados', lambda: consulta_lancamentos(MARCA)),
+    ('contratos alterados', lambda: consulta_contratos(MARCA)),
+    ('lancamentos excluidos', lambda: consulta_excluidos('lancamentos_financeiros', MARCA)),
+    ('totais pagos', consulta_totais_pagos),
+])
+def test_consultas_filtradas_usam_indices(dados, nome, montar):
+    plano = explicar_consulta(montar())
+
+    assert varreduras_completas(plano) == [], f'{nome}: {plano}'
+
+
+def test_extracao_completa_le_a_tabela_inteira(dados):
+    # Garante que a verificação acima enxerga uma varredura completa
+    plano = explicar_consulta(consulta_lancamentos())
+
+    assert 'lancamentos_financeiros' in varreduras_completas(plano)
@@ -0,0 +1,88 @@
+import pytest
+
+from src.models import custo_estoque
+from src.models.paciente import db
+from src.models.itens import Item
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.item_saida_estoque import ItemSaidaEstoque
+from src.models.saldo_estoque import SaldoEstoque
+from src.models.custo_estoque import CamadaCustoEstoque, recalcular_custos_item
+
+
+@pytest.fixture(params=['media', 'fifo'])
+def metodo(request, monkeypatch):
+    monkeypatch.setattr(custo_estoque, 'METODO_CUSTO', request.param)
+    return request.param
+
+
+def _arredondar(valor):
+    return None if valor is None else round(valor, 6)
+
+
+def estado_custos():
+    """Custeio gravado: saldos valorizados, custo de cada linha de saída e camadas FIFO"""
+    db.session.expire_all()
+    return {
+        'saldos': {
+            saldo.item_id: (_arredondar(saldo.quantidade), _arredondar(saldo.valor_total), _arredondar(saldo.custo_medio))
+            for saldo in SaldoEstoque.query
+        },
+        'saidas': {linha.id: _arredondar(linha.custo_total) for linha in ItemSaidaEstoque.query},
+        'camadas': sorted(
+            (camada.item_id, camada.item_entrada_id, _arredondar(camada.quantidade_restante), camada.preco_unitario)
+            for camada in CamadaCustoEstoque.query
+        ),
+    }
+
+
+def estado_recalculado():
+    """Custeio refeito do zero (percorrendo todos os movimentos), sem gravar"""
+    conexao = db.session.connection()
+    for (item_id,) in db.session.query(Item.id):
+        recalcular_custos_item(conexao, item_id)
+    estado = estado_custos()
+    db.session.rollback()
+    return estado
+
+
+def test_custeio_incremental_igual_ao_recalculo(estoque, client, headers, metodo):
+    item_a, item_b = estoque.itens
+
+    estoque.entrada('2026-03-01', (item_a, 10, 2.0), (item_b, 5, 1.0))
+    saida_inicial = estoque.saida('2026-03-05', (item_a, 4), (item_b, 2))
+    entrada_recente = estoque.entrada('2026-03-10', (item_a, 10, 3.0))
+    estoque.saida('2026-03-12', (item_a, 8))
+    assert estado_custos() == estado_recalculado()
+
+    # Custo esperado da última saída: média (6 * 2 + 10 * 3) / 16; FIFO 6 @ 2 + 2 @ 3
+    ultima = ItemSaidaEstoque.query.order_by(ItemSaidaEstoque.id.desc()).first()
+    assert ultima.custo_total == pytest.approx(8 * 42 / 16 if metodo == 'media' else 6 * 2 + 2 * 3)
+
+    # Entrada retroativa: anterior aos movimentos já custeados
+    estoque.entrada('2026-03-03', (item_a, 5, 1.0))
+    assert estado_custos() == estado_recalculado()
+
+    # Alteração de preço e quantidade de uma entrada
+    linha = ItemEntradaEstoque.query.filter_by(entrada_estoque_id=entrada_recente).one()
+    resposta = client.put(f'/api/entradas_estoque/{entrada_recente}', json={
+        'fornecedor_id': estoque.fornecedor_id,
+        'data_entrada': '2026-03-10',
+        'itens': [{'id': linha.id, 'item_id': item_a, 'quantidade': 12, 'valor_unitario': 4.0}],
+    }, headers=headers)
+    assert resposta.status_code == 200
+    assert estado_custos() == estado_recalculado()
+
+    # Alteração da quantidade de uma linha de saída
+    linha_saida = ItemSaidaEstoque.query.filter_by(saida_estoque_id=saida_inicial, item_id=item_a).one()
+    linha_saida.quantidade = 6
+    db.session.commit()
+    assert estado_custos() == estado_recalculado()
+
+    # Exclusão de uma saída já custeada
+    resposta = client.delete(f'/api/saidas_estoque/{saida_inicial}', headers=headers)
+    assert resposta.status_code == 200
+    assert estado_custos() == estado_recalculado()
+
+    # Novo movimento depois das correções volta ao caminho incremental
+    estoque.saida('2026-03-20', (item_a, 3), (item_b, 1))
+    assert estado_custos() == estado_recalculado()
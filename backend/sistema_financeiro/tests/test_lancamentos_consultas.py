@@ -0,0 +1,82 @@
+from datetime import date
+
+import pytest
+
+from src.models.paciente import db, Paciente
+from src.models.contrato import Contrato
+from src.models.fornecedor import Fornecedor
+from src.models.natureza_orcamentaria import Natureza
+from src.models.tipo_tratamento import TipoTratamento
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.lancamento_financeiro import LancamentoFinanceiro
+
+
+@pytest.fixture
+def cadastros(app):
+    """Fornecedor e contrato que recebem os lançamentos das listagens filtradas"""
+    paciente = Paciente(nome='Paciente', cpf='0', data_nascimento=date(1990, 1, 1), identificador='p0')
+    fornecedor = Fornecedor(nome='Fornecedor', cpf_cnpj='1', identificador='f1')
+    tipo = TipoTratamento(nome='Tipo')
+    db.session.add_all([paciente, fornecedor, tipo])
+    db.session.flush()
+    contrato = Contrato(identificador_contrato='C0', paciente_id=paciente.id)
+    db.session.add(contrato)
+    db.session.commit()
+    return {'contrato_id': contrato.id, 'fornecedor_id': fornecedor.id, 'tipo_id': tipo.id}
+
+
+def adicionar_lancamentos(cadastros, quantidade):
+    """
+    Cria 'quantidade' lançamentos de cada tipo, cada um com natureza, contrato,
+    pacote e paciente próprios: qualquer carga preguiçosa vira uma consulta
+    a mais por linha.
+    """
+    inicio = Natureza.query.count()
+    for i in range(inicio, inicio + quantidade):
+        natureza = Natureza(nome=f'Natureza {i}')
+        paciente = Paciente(nome=f'Paciente {i}', cpf=f'c{i}', data_nascimento=date(1990, 1, 1), identificador=f'p{i + 1}')
+        db.session.add_all([natureza, paciente])
+        db.session.flush()
+        contrato = Contrato(identificador_contrato=f'C{i + 1}', paciente_id=paciente.id)
+        pacote = PacoteTratamento(
+            paciente_id=paciente.id, tipo_tratamento_id=cadastros['tipo_id'], descricao='Pacote',
+            data_inicio_tratamento=date(2026, 1, 1), numero_sessoes_contratadas=3, valor_total_pacote=10
+        )
+        db.session.add_all([contrato, pacote])
+        db.session.flush()
+        db.session.add_all([
+            LancamentoFinanceiro(tipo='a_receber', contrato_id=contrato.id, natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+            LancamentoFinanceiro(tipo='a_receber', pacote_tratamento_id=pacote.id, natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+            LancamentoFinanceiro(tipo='a_receber', contrato_id=cadastros['contrato_id'], natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+            LancamentoFinanceiro(tipo='a_pagar', fornecedor_id=cadastros['fornecedor_id'], natureza_id=natureza.id,
+                                 valor=1, data_vencimento=date(2026, 2, 1)),
+        ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url', [
+    '/api/lancamentos/',
+    '/api/lancamentos/?limite=1000',
+    '/api/lancamentos/contrato/{contrato_id}',
+    '/api/lancamentos/fornecedor/{fornecedor_id}',
+])
+def test_listagem_nao_cresce_com_o_numero_de_linhas(client, headers, cadastros, contar_consultas, url):
+    url = url.format(**cadastros)
+
+    def consultas_da_listagem():
+        db.session.expire_all()
+        with contar_consultas() as comandos:
+            resposta = client.get(url, headers=headers)
+        assert resposta.status_code == 200
+        return len(comandos)
+
+    adicionar_lancamentos(cadastros, 2)
+    poucas_linhas = consultas_da_listagem()
+    adicionar_lancamentos(cadastros, 30)
+    muitas_linhas = consultas_da_listagem()
+
+    assert muitas_linhas == poucas_linhas
+    assert poucas_linhas <= 8
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from src.bi_integration import QueuePoolMedido, LIMIAR_ESPERA_SEGUNDOS, _metricas_pool
+
+ATRASO = 0.3
+
+
+def _engine(tmp_path, abrir=sqlite3.connect):
+    caminho = str(tmp_path / 'pool.db')
+    return create_engine(
+        'sqlite://', creator=lambda: abrir(caminho, check_same_thread=False),
+        poolclass=QueuePoolMedido, pool_size=1, max_overflow=0, pool_timeout=5, pool_pre_ping=True
+    )
+
+
+def _metricas_durante(acao):
+    antes = dict(_metricas_pool)
+    acao()
+    return {nome: _metricas_pool[nome] - antes[nome] for nome in ('checkouts', 'esperas', 'tempo_espera_total')}
+
+
+def test_conta_espera_por_conexao_livre(tmp_path):
+    engine = _engine(tmp_path)
+    engine.connect().close()  # conexão já aberta no pool
+
+    def segurar_e_pegar():
+        ocupada = engine.connect()
+        threading.Timer(ATRASO, ocupada.close).start()
+        engine.connect().close()
+
+    metricas = _metricas_durante(segurar_e_pegar)
+    assert metricas['checkouts'] == 2
+    assert metricas['esperas'] == 1
+    assert metricas['tempo_espera_total'] >= ATRASO * 0.9
+
+
+def test_abrir_conexao_nova_nao_conta_como_espera(tmp_path):
+    def abrir_devagar(*args, **kwargs):
+        time.sleep(ATRASO)
+        return sqlite3.connect(*args, **kwargs)
+
+    engine = _engine(tmp_path, abrir_devagar)
+    metricas = _metricas_durante(lambda: engine.connect().close())
+    assert metricas['checkouts'] == 1
+    assert metricas['esperas'] == 0
+    assert metricas['tempo_espera_total'] < LIMIAR_ESPERA_SEGUNDOS
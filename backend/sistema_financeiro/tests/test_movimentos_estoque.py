@@ -0,0 +1,50 @@
+from src.models.paciente import db
+from src.models.item_entrada_estoque import ItemEntradaEstoque
+from src.models.saldo_estoque import SaldoEstoque
+
+
+def linhas_da_entrada(entrada_id):
+    db.session.expire_all()
+    return {
+        linha.id: (linha.item_id, linha.quantidade, linha.preco_unitario)
+        for linha in ItemEntradaEstoque.query.filter_by(entrada_estoque_id=entrada_id)
+    }
+
+
+def test_itens_inexistentes_nao_gravam_nada(estoque, client, headers):
+    resposta = client.post('/api/entradas_estoque/', json={
+        'fornecedor_id': estoque.fornecedor_id,
+        'data_entrada': '2026-03-01',
+        'itens': [{'item_id': estoque.itens[0], 'quantidade': 1}, {'item_id': 999, 'quantidade': 1},
+                  {'item_id': 'x', 'quantidade': 1}],
+    }, headers=headers)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()['itens'] == [999, 'x']
+    assert ItemEntradaEstoque.query.count() == 0
+
+
+def test_atualizacao_altera_so_as_linhas_que_mudaram(estoque, client, headers):
+    item_a, item_b = estoque.itens
+    entrada = estoque.entrada('2026-03-01', (item_a, 10, 2.0), (item_b, 5, 1.0), (item_a, 1, 1.0))
+    ids = list(linhas_da_entrada(entrada))
+
+    resposta = client.put(f'/api/entradas_estoque/{entrada}', json={
+        'fornecedor_id': estoque.fornecedor_id,
+        'data_entrada': '2026-03-01',
+        'itens': [
+            {'id': ids[0], 'item_id': item_a, 'quantidade': 10, 'valor_unitario': 2.0},  # igual
+            {'item_id': item_b, 'quantidade': 8, 'valor_unitario': 1.0},  # casa pelo item
+            {'item_id': item_b, 'quantidade': 2, 'valor_unitario': 3.0},  # nova
+        ],
+    }, headers=headers)
+    assert resposta.status_code == 200
+
+    linhas = linhas_da_entrada(entrada)
+    assert linhas[ids[0]] == (item_a, 10, 2.0)
+    assert linhas[ids[1]] == (item_b, 8, 1.0)
+    assert ids[2] not in linhas or linhas[ids[2]] == (item_b, 2, 3.0)
+    assert sorted(linhas.values()) == sorted([(item_a, 10, 2.0), (item_b, 8, 1.0), (item_b, 2, 3.0)])
+
+    saldos = {saldo.item_id: saldo.quantidade for saldo in SaldoEstoque.query}
+    assert saldos == {item_a: 10, item_b: 10}
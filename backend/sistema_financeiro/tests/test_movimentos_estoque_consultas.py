@@ -0,0 +1,60 @@
+from datetime import date, time
+
+import pytest
+
+from src.models.paciente import db, Paciente
+from src.models.fornecedor import Fornecedor
+from src.models.itens import Item
+from src.models.procedimento import Procedimento
+from src.models.agendamento import Agendamento
+
+
+def adicionar_movimentos(estoque, quantidade):
+    """
+    Cria 'quantidade' entradas e saídas, cada uma com fornecedor ou agendamento
+    (paciente e procedimento) e itens próprios: qualquer carga preguiçosa vira
+    uma consulta a mais por linha.
+    """
+    referencia = db.session.get(Agendamento, estoque.agendamento_id)
+    inicio = Item.query.count()
+    for i in range(inicio, inicio + quantidade):
+        fornecedor = Fornecedor(nome=f'Fornecedor {i}', cpf_cnpj=f'c{i}', identificador=f'f{i}')
+        paciente = Paciente(nome=f'Paciente {i}', cpf=f'c{i}', data_nascimento=date(1990, 1, 1), identificador=f'p{i}')
+        procedimento = Procedimento(nome=f'Procedimento {i}')
+        itens = [Item(nome=f'Item {i}-1'), Item(nome=f'Item {i}-2')]
+        db.session.add_all([fornecedor, paciente, procedimento] + itens)
+        db.session.flush()
+        agendamento = Agendamento(
+            paciente_id=paciente.id, data_agendamento=date(2026, 1, 1), procedimento_id=procedimento.id,
+            equipe_id=referencia.equipe_id, local_atendimento_id=referencia.local_atendimento_id,
+            horario_inicio=time(8), categoria_id=referencia.categoria_id
+        )
+        db.session.add(agendamento)
+        db.session.commit()
+
+        dia = date(2026, 3, 1 + i % 28).isoformat()
+        estoque.entrada(dia, *((item.id, 5, 1.0) for item in itens), fornecedor_id=fornecedor.id)
+        estoque.saida(dia, *((item.id, 2) for item in itens), agendamento_id=agendamento.id)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/entradas_estoque/',
+    '/api/entradas_estoque/?limite=1000',
+    '/api/saidas_estoque/',
+    '/api/saidas_estoque/?limite=1000',
+])
+def test_listagem_nao_cresce_com_o_numero_de_movimentos(estoque, client, headers, contar_consultas, url):
+    def consultas_da_listagem():
+        db.session.expire_all()
+        with contar_consultas() as comandos:
+            resposta = client.get(url, headers=headers)
+        assert resposta.status_code == 200
+        return len(comandos)
+
+    adicionar_movimentos(estoque, 2)
+    poucas_linhas = consultas_da_listagem()
+    adicionar_movimentos(estoque, 20)
+    muitas_linhas = consultas_da_listagem()
+
+    assert muitas_linhas == poucas_linhas
+    assert poucas_linhas <= 5
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from src.bi_integration import get_excluidos
+from src.models.paciente import db
+from src.models.user import User
+from src.models.registro_excluido import (
+    RegistroExcluido,
+    RETENCAO_EXCLUIDOS_DIAS,
+    limite_retencao_excluidos,
+    purgar_registros_excluidos,
+)
+
+
+def _lapide(registro_id, dias_atras):
+    db.session.add(RegistroExcluido(
+        tabela='lancamentos_financeiros', registro_id=registro_id,
+        data_exclusao=datetime.utcnow() - timedelta(days=dias_atras)
+    ))
+
+
+def test_purga_apaga_so_as_lapides_fora_da_retencao(app):
+    _lapide(1, RETENCAO_EXCLUIDOS_DIAS + 30)
+    _lapide(2, RETENCAO_EXCLUIDOS_DIAS + 1)
+    _lapide(3, RETENCAO_EXCLUIDOS_DIAS - 1)
+    _lapide(4, 0)
+    db.session.commit()
+
+    assert purgar_registros_excluidos() == 2
+    assert get_excluidos('lancamentos_financeiros', limite_retencao_excluidos()) == [3, 4]
+    assert purgar_registros_excluidos() == 0
+
+
+def test_delta_com_marca_fora_da_retencao_exige_carga_completa(app, client, headers):
+    db.session.add(User(id=1, email='bi@teste', password='x', name='BI'))
+    _lapide(1, 1)
+    db.session.commit()
+
+    marca_antiga = (limite_retencao_excluidos() - timedelta(days=1)).isoformat()
+    resposta = client.get(f'/api/bi/export/lancamentos?since={marca_antiga}', headers=headers)
+    assert resposta.status_code == 410
+    assert 'carga completa' in resposta.get_json()['msg']
+
+    marca_recente = (datetime.utcnow() - timedelta(days=2)).isoformat()
+    resposta = client.get(f'/api/bi/export/lancamentos?since={marca_recente}', headers=headers)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['excluidos'] == [1]
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+
+import pytest
+
+from src.models.paciente import db, Paciente
+from src.models.tipo_tratamento import TipoTratamento
+from src.models.local_atendimento import LocalAtendimento
+from src.models.pacote_tratamento import PacoteTratamento
+from src.models.agendamento_sessao import AgendamentoSessao
+
+SESSOES_CONTRATADAS = 5
+SESSOES_JA_AGENDADAS = 2
+REQUISICOES = 8
+
+
+@pytest.fixture
+def pacote(app):
+    paciente = Paciente(nome='Paciente', cpf='1', data_nascimento=date(1990, 1, 1), identificador='p1')
+    tipo = TipoTratamento(nome='Tipo')
+    local = LocalAtendimento(nome='Sala')
+    db.session.add_all([paciente, tipo, local])
+    db.session.flush()
+
+    pacote = PacoteTratamento(
+        paciente_id=paciente.id, tipo_tratamento_id=tipo.id, descricao='Pacote',
+        data_inicio_tratamento=date(2026, 3, 2), numero_sessoes_contratadas=SESSOES_CONTRATADAS,
+        numero_sessoes_realizadas=SESSOES_JA_AGENDADAS, valor_total_pacote=100
+    )
+    db.session.add(pacote)
+    db.session.flush()
+    for numero in range(1, SESSOES_JA_AGENDADAS + 1):
+        db.session.add(AgendamentoSessao(
+            paciente_id=paciente.id, pacote_tratamento_id=pacote.id, data_agendamento=date(2026, 3, numero),
+            horario_inicio=time(10), horario_fim=time(11), local_atendimento_id=local.id, numero_sessao=numero
+        ))
+    db.session.commit()
+
+    return {'id': pacote.id, 'paciente_id': paciente.id, 'local_id': local.id}
+
+
+def _reservar_em_paralelo(app, headers, pacote):
+    def reservar(indice):
+        # Um cliente por thread: cada requisição usa sua própria conexão
+        resposta = app.test_client().post('/api/agendamentos-sessao/', json={
+            'paciente_id': pacote['paciente_id'],
+            'pacote_tratamento_id': pacote['id'],
+            'local_atendimento_id': pacote['local_id'],
+            'data_agendamento': date(2026, 4, indice + 1).isoformat(),
+            'horario_inicio': '10:00',
+            'horario_fim': '11:00',
+        }, headers=headers)
+        return resposta.status_code, resposta.get_json()
+
+    with ThreadPoolExecutor(max_workers=REQUISICOES) as executor:
+        return list(executor.map(reservar, range(REQUISICOES)))
+
+
+def _numeros_sessao(pacote_id):
+    db.session.expire_all()
+    return [sessao.numero_sessao for sessao in AgendamentoSessao.query.filter_by(pacote_tratamento_id=pacote_id)]
+
+
+def test_reservas_concorrentes_nao_excedem_o_pacote(app, headers, pacote):
+    existentes = AgendamentoSessao.query.filter_by(pacote_tratamento_id=pacote['id']).count()
+    livres = SESSOES_CONTRATADAS - existentes
+    assert 0 < livres < REQUISICOES
+
+    respostas = _reservar_em_paralelo(app, headers, pacote)
+
+    criadas = [corpo for status, corpo in respostas if status == 201]
+    assert len(criadas) == livres
+    assert {status for status, _ in respostas if status != 201} <= {400, 409}
+
+    numeros = _numeros_sessao(pacote['id'])
+    assert len(numeros) == len(set(numeros)) == existentes + livres
+    assert len(numeros) <= SESSOES_CONTRATADAS
+    assert max(numeros) <= SESSOES_CONTRATADAS
+    assert db.session.get(PacoteTratamento, pacote['id']).numero_sessoes_realizadas <= SESSOES_CONTRATADAS
+
+
+def test_contador_defasado_nao_libera_sessoes_alem_do_contratado(app, headers, pacote):
+    # Contador zerado com sessões já existentes (p.ex. base anterior ao contador)
+    db.session.get(PacoteTratamento, pacote['id']).numero_sessoes_realizadas = 0
+    db.session.commit()
+
+    respostas = _reservar_em_paralelo(app, headers, pacote)
+
+    numeros = _numeros_sessao(pacote['id'])
+    assert len([status for status, _ in respostas if status == 201]) == SESSOES_CONTRATADAS - SESSOES_JA_AGENDADAS
+    assert len(numeros) == len(set(numeros)) == SESSOES_CONTRATADAS
+    assert max(numeros) == SESSOES_CONTRATADAS
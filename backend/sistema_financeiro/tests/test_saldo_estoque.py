@@ -0,0 +1,70 @@
+from src.models.paciente import db
+from src.models.saldo_estoque import (
+    SaldoEstoque, SaldoEstoqueMensal, gerar_fechamentos_estoque, reconstruir_saldos_estoque
+)
+
+
+def saldos_mantidos():
+    db.session.expire_all()
+    return {
+        saldo.item_id: (saldo.total_entrada, saldo.total_saida, saldo.quantidade,
+                        round(saldo.valor_total, 6), None if saldo.custo_medio is None else round(saldo.custo_medio, 6))
+        for saldo in SaldoEstoque.query
+    }
+
+
+def test_reconstrucao_igual_aos_saldos_mantidos(estoque, client, headers):
+    item_a, item_b = estoque.itens
+
+    estoque.entrada('2026-03-01', (item_a, 10, 2.0), (item_b, 5, 1.0))
+    saida = estoque.saida('2026-03-05', (item_a, 4), (item_b, 7))
+    estoque.entrada('2026-03-02', (item_a, 3, 5.0))
+    estoque.saida('2026-03-08', (item_a, 1))
+    assert client.delete(f'/api/saidas_estoque/{saida}', headers=headers).status_code == 200
+    estoque.saida('2026-03-09', (item_b, 2))
+
+    mantidos = saldos_mantidos()
+    assert mantidos[item_a][:3] == (13, 1, 12)
+    assert mantidos[item_b][:3] == (5, 2, 3)
+
+    reconstruir_saldos_estoque()
+
+    assert saldos_mantidos() == mantidos
+
+
+def quantidades_em(client, headers, dia):
+    resposta = client.get(f'/api/estoque_atual/?em={dia}', headers=headers)
+    assert resposta.status_code == 200
+    return {linha['item_id']: linha['quantidade_atual'] for linha in resposta.get_json()}
+
+
+def test_saldo_em_data_apos_invalidar_fechamento(estoque, client, headers):
+    item_a, item_b = estoque.itens
+
+    estoque.entrada('2025-12-05', (item_a, 2, 1.0))
+    estoque.entrada('2026-01-10', (item_a, 10, 1.0), (item_b, 4, 1.0))
+    estoque.entrada('2026-02-10', (item_a, 5, 1.0))
+    estoque.saida('2026-02-20', (item_a, 3))
+
+    assert gerar_fechamentos_estoque(ate='2026-02') == 3
+    assert quantidades_em(client, headers, '2026-02-28') == {item_a: 14, item_b: 4}
+
+    # Saída retroativa em janeiro: fechamentos de janeiro em diante deixam de valer
+    estoque.saida('2026-01-15', (item_a, 4), (item_b, 1))
+    db.session.expire_all()
+    assert {fechamento.mes for fechamento in SaldoEstoqueMensal.query} == {'2025-12'}
+
+    esperado = {
+        '2025-12-31': {item_a: 2, item_b: 0},
+        '2026-01-14': {item_a: 12, item_b: 4},
+        '2026-01-31': {item_a: 8, item_b: 3},
+        '2026-02-15': {item_a: 13, item_b: 3},
+        '2026-02-28': {item_a: 10, item_b: 3},
+    }
+    for dia, quantidades in esperado.items():
+        assert quantidades_em(client, headers, dia) == quantidades, dia
+
+    # Fechamentos gerados de novo dão o mesmo resultado
+    assert gerar_fechamentos_estoque(ate='2026-02') == 2
+    for dia, quantidades in esperado.items():
+        assert quantidades_em(client, headers, dia) == quantidades, dia
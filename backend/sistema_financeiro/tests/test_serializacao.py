@@ -0,0 +1,32 @@
+import pytest
+
+from src import serializacao
+from src.paginacao import ParametroInvalido
+from src.models.itens import Item, ESQUEMA_ITEM
+
+
+def test_campos_pedidos_normalizados_na_ordem_do_esquema():
+    ordem = tuple(ESQUEMA_ITEM.campos)
+    pedidos = ','.join(reversed(ordem[:3])) + ',' + ordem[0]
+
+    assert ESQUEMA_ITEM.selecionar({'campos': pedidos}, ()) == ordem[:3]
+    assert ESQUEMA_ITEM.compilar(ESQUEMA_ITEM.selecionar({'campos': pedidos}, ())) is ESQUEMA_ITEM.compilar(ordem[:3])
+
+
+def test_campos_invalidos_sao_rejeitados():
+    with pytest.raises(ParametroInvalido):
+        ESQUEMA_ITEM.selecionar({'campos': 'id,inexistente'}, ())
+
+
+def test_cache_de_funcoes_compiladas_e_limitado(monkeypatch):
+    monkeypatch.setattr(serializacao, 'MAX_COMPILADOS', 4)
+    esquema = serializacao.Esquema(Item, {
+        nome: serializacao.coluna() for nome in ('id', 'nome', 'descricao', 'quantidade_estoque')
+    })
+    combinacoes = [('id',), ('nome',), ('descricao',), ('quantidade_estoque',), ('id', 'nome'), ('id', 'descricao')]
+    for nomes in combinacoes:
+        esquema.compilar(nomes)
+
+    assert esquema._compilar.cache_info().currsize == 4
+    item = Item(id=1, nome='Gaze')
+    assert esquema.serializar(item, ('id', 'nome')) == {'id': 1, 'nome': 'Gaze'}
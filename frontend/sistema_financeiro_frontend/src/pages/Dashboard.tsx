@@ -21,27 +21,17 @@ const Dashboard: React.FC = () => {
         setLoading(true);
         
         // Busca dados em paralelo para melhor performance
-        const [pacientes, contratos, fornecedores, lancamentos] = await Promise.all([
+        const [pacientes, contratos, fornecedores, resumo] = await Promise.all([
           pacienteService.getAll(),
           contratoService.getAll(),
           fornecedorService.getAll(),
-          lancamentoService.getAll()
+          lancamentoService.getResumo()
         ]);
         
-        // Calcula estatísticas
-        const totalAReceber = lancamentos
-          .filter((l: any) => l.tipo === 'a_receber' && l.status === 'pendente')
-          .reduce((sum: number, l: any) => sum + parseFloat(l.valor), 0);
-          
-        const totalAPagar = lancamentos
-          .filter((l: any) => l.tipo === 'a_pagar' && l.status === 'pendente')
-          .reduce((sum: number, l: any) => sum + parseFloat(l.valor), 0);
-          
-        const hoje = new Date();
-        const lancamentosVencidos = lancamentos.filter((l: any) => {
-          const dataVencimento = new Date(l.data_vencimento);
-          return l.status === 'pendente' && dataVencimento < hoje;
-        }).length;
+        // Totais calculados no servidor
+        const totalAReceber = resumo.total_a_receber;
+        const totalAPagar = resumo.total_a_pagar;
+        const lancamentosVencidos = resumo.lancamentos_vencidos;
         
         setStats({
           totalPacientes: pacientes.length,
@@ -184,6 +184,11 @@ export const lancamentoService = {
     return response.data;
   },
   
+  getResumo: async () => {
+    const response = await api.get('/lancamentos/resumo');
+    return response.data;
+  },
+  
   getById: async (id: number) => {
     const response = await api.get(`/lancamentos/${id}`);
     return response.data;